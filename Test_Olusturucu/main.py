@@ -10,6 +10,9 @@ from src.core.gemini_service import GeminiService
 from src.db.db_manager import DBManager
 from src.core.test_generator import TestGenerator
 
+# Başarısız bir parçanın (ör. bağlantı kopması) kaç kez yeniden gönderileceği
+CHUNK_RETRIES = 2
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -181,6 +184,7 @@ class MainWindow(QMainWindow):
             
             # Yeni bir Gemini oturumu başlat
             self.gemini_service.start_new_session()
+            failed_pages = []
             
             for i, chunk in enumerate(chunks):
                 if progress.wasCanceled():
@@ -188,14 +192,18 @@ class MainWindow(QMainWindow):
                     
                 progress.setLabelText(f"{i+1}/{total_chunks}. parça işleniyor...\n(Sayfa {i*chunk_size + 1} - {min((i+1)*chunk_size, len(images))})")
                 
-                # Tekrar deneme mantığı
-                max_retries = 2
-                questions_data = []
-                for attempt in range(max_retries + 1):
+                # Boş liste parçada soru olmadığı anlamına gelir; yalnızca
+                # başarısız (None) parçalar yeniden gönderilir
+                questions_data = None
+                for attempt in range(CHUNK_RETRIES + 1):
                     questions_data = self.gemini_service.analyze_chunk(chunk)
-                    if questions_data or attempt == max_retries:
+                    if questions_data is not None:
                         break
                     print(f"Parça {i+1} başarısız oldu, yeniden deneniyor... (Deneme {attempt + 1})")
+                if questions_data is None:
+                    failed_pages.append(f"{i*chunk_size + 1}-{min((i+1)*chunk_size, len(images))}")
+                    progress.setValue(i + 1)
+                    continue
                 
                 # Soruları işle
                 for idx, q_data in enumerate(questions_data):
@@ -213,13 +221,21 @@ class MainWindow(QMainWindow):
                     out_path = os.path.join('assets', 'questions', f"{q_id}.png")
                     
                     if 'coordinates' in q_data:
-                        self.pdf_processor.crop_question(img_to_crop, q_data['coordinates'], out_path, padding=25)
-                        self.db_manager.add_question(q_data.get('text', 'Metin bulunamadı'), out_path)
+                        out_path = self.pdf_processor.crop_question(
+                            img_to_crop, q_data['coordinates'], out_path, padding=25)
+                        if out_path:
+                            self.db_manager.add_question(q_data.get('text', 'Metin bulunamadı'), out_path,
+                                                         skip_duplicates=True)
                 
                 progress.setValue(i + 1)
 
             progress.close()
-            QMessageBox.information(self, "Başarılı", "Sorular başarıyla ayıklandı.")
+            if failed_pages:
+                QMessageBox.warning(self, "Eksik Analiz",
+                                    "Şu sayfalar analiz edilemedi: " + ", ".join(failed_pages) +
+                                    "\nBu sayfaların soruları eklenmedi; PDF'i yeniden yükleyebilirsiniz.")
+            else:
+                QMessageBox.information(self, "Başarılı", "Sorular başarıyla ayıklandı.")
             self.load_questions_to_list()
         except Exception as e:
             import traceback
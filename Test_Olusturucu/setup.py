@@ -7,7 +7,7 @@ from cx_Freeze import setup, Executable
 build_exe_options = {
     "packages": [
         "os", "sys", "PyQt6", "pdf2image", "PIL", 
-        "google.generativeai", "dotenv", "reportlab",
+        "google.generativeai", "dotenv", "reportlab", "pypdf", "numpy",
         "src.core", "src.db"
     ],
     "include_files": [
@@ -0,0 +1,89 @@
+# src-python/boxes.py'nin kopyası: masaüstü uygulaması ile motor ayrı
+# paketlendiği için ortak kod yok. Bir tarafta yapılan düzeltme diğerine de
+# işlenmeli; tests/unit/core/test_engine_parity.py ikisini karşılaştırır.
+
+import numpy as np
+
+# Bu oranda örtüşen kutular aynı sorudur
+MERGE_IOU = 0.5
+# Alanının bu kadarı başka bir kutunun içinde kalan kutu onun parçasıdır
+CONTAIN_RATIO = 0.85
+# En küçük kutu kenarı (sayfa kenarına oranla)
+MIN_SIDE = 0.01
+# Birden çok kutu içeren kutu, bunlar alanının bu oranını kaplıyorsa ya da
+# kendisi sayfanın bu oranını kaplıyorsa onların yerine atılır
+WRAPPER_COVER = 0.6
+WRAPPER_PAGE = 0.9
+
+
+def clean_boxes(boxes, width, height, iou_threshold=MERGE_IOU,
+                contain_ratio=CONTAIN_RATIO, min_side=MIN_SIDE,
+                wrapper_cover=WRAPPER_COVER, wrapper_page=WRAPPER_PAGE):
+    """xyxy kutuları düzeltir, sayfaya sığdırır, eler ve birleştirir.
+
+    (merged, keep) döner: merged (M, 4) dizisi, keep[i] ise merged[i]'nin
+    temsil ettiği (grubundaki ilk) girdi kutusunun indeksidir; böylece
+    kutuya ait diğer alanlar taşınabilir. Sıra girdi sırasıdır.
+
+    Çift kutular (IoU >= iou_threshold) ve bir kutunun içinde kalan parçalar
+    birleşimleriyle değiştirilir. Birden çok kutuyu kapsayan kutu, bu kutular
+    alanının çoğunu kaplıyorsa (wrapper_cover) veya kendisi sayfanın çoğunu
+    kaplıyorsa (wrapper_page, ör. tüm sayfa) atılır.
+    """
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    index = np.arange(len(b))
+
+    valid = np.isfinite(b).all(axis=1)
+    b, index = b[valid], index[valid]
+
+    # Ters köşeler, ardından sayfa sınırları
+    b = np.concatenate([np.minimum(b[:, :2], b[:, 2:]),
+                        np.maximum(b[:, :2], b[:, 2:])], axis=1)
+    limits = np.array([width, height, width, height], dtype=np.float64)
+    b = np.clip(b, 0, limits)
+
+    size = b[:, 2:] - b[:, :2]
+    valid = (size >= min_side * limits[:2]).all(axis=1)
+    b, index = b[valid], index[valid]
+    if len(b) < 2:
+        return b, index
+
+    lt = np.maximum(b[:, None, :2], b[None, :, :2])
+    rb = np.minimum(b[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    iou = inter / (area[:, None] + area[None, :] - inter)
+
+    # inside[i, j]: j kutusu (büyük ölçüde) i kutusunun içinde
+    inside = inter / area[None, :] >= contain_ratio
+    np.fill_diagonal(inside, False)
+    children = inside.sum(axis=1)
+
+    # Birden çok kutu içeren kutu, ancak onlar alanının çoğunu dolduruyorsa
+    # (birlikte kutulanmış sorular) veya sayfa boyutundaysa atılır; ayrı
+    # kutulanmış iki şekli olan soru metnini korur ve onları içine alır
+    covered = np.where(inside, inter, 0).sum(axis=1) / area
+    page_sized = area >= wrapper_page * width * height
+    wrapper = (children >= 2) & ((covered >= wrapper_cover) | page_sized)
+    linked = (iou >= iou_threshold) | (inside & ~wrapper[:, None])
+    linked |= linked.T
+    linked[wrapper, :] = False
+    linked[:, wrapper] = False
+    np.fill_diagonal(linked, True)
+
+    # Bağlı bileşenler: her kutu ulaşabildiği en küçük indeksi alır
+    labels = np.arange(len(b))
+    while True:
+        reached = np.where(linked, labels[None, :], len(b)).min(axis=1)
+        if (reached == labels).all():
+            break
+        labels = reached
+
+    labels, b = labels[~wrapper], b[~wrapper]
+    groups = np.unique(labels)
+    slot = np.searchsorted(groups, labels)
+    merged = np.concatenate([np.full((len(groups), 2), np.inf),
+                             np.full((len(groups), 2), -np.inf)], axis=1)
+    np.minimum.at(merged[:, :2], slot, b[:, :2])
+    np.maximum.at(merged[:, 2:], slot, b[:, 2:])
+    return merged, index[groups]
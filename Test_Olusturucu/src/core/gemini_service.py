@@ -1,13 +1,89 @@
 import google.generativeai as genai
 import os
-import json
 import time
+from io import BytesIO
 from dotenv import load_dotenv
+from PIL import Image
+
+from .boxes import clean_boxes
+from .model_json import generation_config, parse_model_json
+from .request_scheduler import get_scheduler
+from .response_cache import ResponseCache
 
 load_dotenv()
 
+# Gömülü (inline) görseller bu boyutu aşarsa File API'ye geçilir
+INLINE_MAX_BYTES = 18 * 1024 * 1024
+INLINE_MAX_SIDE = 2048
+INLINE_QUALITY = 85
+
+# Yapılandırılmış çıktı şeması; analyze_chunk istemindeki FORMAT ile aynı
+CHUNK_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'summary': {
+            'type': 'object',
+            'properties': {'total_questions_on_pages': {'type': 'integer'}},
+        },
+        'questions': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'page_index': {'type': 'integer'},
+                    'text': {'type': 'string'},
+                    'subject': {'type': 'string'},
+                    'grade_level': {'type': 'string'},
+                    'difficulty': {'type': 'integer'},
+                    'coordinates': {'type': 'array', 'items': {'type': 'number'}},
+                },
+                'required': ['page_index', 'text', 'coordinates'],
+            },
+        },
+    },
+    'required': ['questions'],
+}
+
+
+def clean_detections(detected_list):
+    """Her sayfanın kutularını tek geçişte temizler (bkz. boxes.clean_boxes).
+
+    Koordinatlar [ymin, xmin, ymax, xmax] biçiminde 0-1000 aralığındadır;
+    bozuk, çift veya iç içe kutular ayrı bir soru olarak dönmez.
+    """
+    by_page = {}
+    for q in detected_list:
+        if isinstance(q, dict):
+            by_page.setdefault(q.get('page_index', 0), []).append(q)
+
+    cleaned = []
+    for page_questions in by_page.values():
+        raw = []
+        for q in page_questions:
+            try:
+                ymin, xmin, ymax, xmax = (float(v) for v in q['coordinates'])
+                raw.append((xmin, ymin, xmax, ymax))
+            except (KeyError, TypeError, ValueError):
+                raw.append((float('nan'),) * 4)
+
+        boxes, keep = clean_boxes(raw, 1000, 1000)
+        for i, (xmin, ymin, xmax, ymax) in zip(keep.tolist(), boxes.tolist()):
+            cleaned.append(dict(page_questions[i], coordinates=[ymin, xmin, ymax, xmax]))
+    return cleaned
+
+
+def encode_inline_jpeg(image_path, max_side=INLINE_MAX_SIDE, quality=INLINE_QUALITY):
+    """Görseli istek içinde gönderilecek boyutta JPEG baytlarına dönüştürür."""
+    with Image.open(image_path) as img:
+        img = img.convert("RGB") if img.mode not in ("RGB", "L") else img.copy()
+        img.thumbnail((max_side, max_side))
+        buffered = BytesIO()
+        img.save(buffered, format="JPEG", quality=quality)
+        return buffered.getvalue()
+
+
 class GeminiService:
-    def __init__(self):
+    def __init__(self, cache=None, scheduler=None, transport='inline'):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             print("Uyarı: GEMINI_API_KEY bulunamadı!")
@@ -15,13 +91,52 @@ class GeminiService:
         # Kullanıcının listesinde bulunan en güçlü modeli seçiyoruz
         self.model = genai.GenerativeModel('gemini-2.5-pro')
         self.chat = None
+        # Aynı sayfalar tekrar yüklendiğinde API çağrısı yapılmaz
+        self.cache = cache if cache is not None else ResponseCache()
+        # 429/503 hatalarında yeniden deneme ve hız sınırı
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+        # 'inline': görseller istekle birlikte gider, 'file': upload_file kullanılır
+        self.transport = transport
+
+    def _build_image_parts(self, image_paths):
+        """İstek parçalarını ve sonradan silinecek yüklenmiş dosyaları döndürür."""
+        parts, uploaded = [], []
+        inline_bytes = 0
+        for path in image_paths:
+            data = None
+            if self.transport == 'inline':
+                try:
+                    data = encode_inline_jpeg(path)
+                except OSError:
+                    data = None  # Okunamayan görsel File API'ye bırakılır
+
+            if data is not None and inline_bytes + len(data) <= INLINE_MAX_BYTES:
+                inline_bytes += len(data)
+                parts.append({"mime_type": "image/jpeg", "data": data})
+            else:
+                img = self.scheduler.call(genai.upload_file, path, label="Upload")
+                uploaded.append(img)
+                parts.append(img)
+        return parts, uploaded
+
+    def _delete_uploaded(self, uploaded):
+        for f in uploaded:
+            try:
+                genai.delete_file(f.name)
+            except Exception as e:
+                print(f"Dosya silme hatası: {e}")
 
     def start_new_session(self):
         """Yeni bir analiz oturumu başlatır."""
         self.chat = self.model.start_chat(history=[])
 
     def analyze_chunk(self, image_paths):
-        """Gemini 2.5 Pro ile Gelişmiş 2 Aşamalı Analiz ve Doğrulama."""
+        """Gemini 2.5 Pro ile Gelişmiş 2 Aşamalı Analiz ve Doğrulama.
+
+        Soru listesini döner; boş liste parçada soru olmadığı anlamına gelir.
+        İstek veya yanıt başarısız olursa (zamanlayıcının yeniden denemediği
+        bağlantı hataları, tükenen deneme hakkı, okunamayan yanıt) None döner.
+        """
         prompt = """
         Görevin: Gönderilen sayfa görüntülerindeki soruları %100 hassasiyetle ayıklamak ve sınıflandırmak.
         
@@ -54,41 +169,54 @@ class GeminiService:
         }
         """
         
+        cache_key = ResponseCache.make_key(image_paths, prompt, getattr(self.model, 'model_name', ''))
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"Önbellekten yüklendi: {len(cached)} soru.")
+                return clean_detections(cached)
+
+        uploaded = []
         try:
-            content_parts = [prompt]
-            for path in image_paths:
-                img = genai.upload_file(path)
-                content_parts.append(img)
+            image_parts, uploaded = self._build_image_parts(image_paths)
+            content_parts = [prompt] + image_parts
             
+            # Yanıt şemaya uyan düz JSON olarak istenir; serbest metin ayrıştırılmaz
+            config = generation_config(CHUNK_SCHEMA)
             # 2.5 Pro için chat veya doğrudan generate_content kullanabiliriz
             if self.chat:
-                response = self.chat.send_message(content_parts)
+                response = self.scheduler.call(self.chat.send_message, content_parts,
+                                               label="Gemini", generation_config=config)
             else:
-                response = self.model.generate_content(content_parts)
-            
-            content = response.text
-            
-            # JSON Temizleme (Markdown bloklarını kaldır)
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+                response = self.scheduler.call(self.model.generate_content, content_parts,
+                                               label="Gemini", generation_config=config)
             
-            data = json.loads(content)
+            # Şemasız/kesilmiş yanıtlar için toleranslı ayrıştırıcı
+            data = parse_model_json(response.text)
+            if isinstance(data, list):
+                data = {"questions": data}
             
             # Doğrulama ve loglama
-            detected_list = data.get("questions", [])
-            summary_count = data.get("summary", {}).get("total_questions_on_pages", 0)
+            detected_list = clean_detections(data.get("questions", []))
+            summary = data.get("summary")
+            summary_count = summary.get("total_questions_on_pages", 0) if isinstance(summary, dict) else 0
             
             print(f"Gemini 2.5 Pro: {summary_count} soru tespit edildi, {len(detected_list)} veri döndü.")
             
+            if cache_key:
+                self.cache.put(cache_key, detected_list)
             return detected_list
                 
         except Exception as e:
             print(f"Gemini 2.5 Pro API hatası: {e}")
-            return []
+            return None
+        finally:
+            self._delete_uploaded(uploaded)
 
     def analyze_page(self, image_path):
-        """Geriye dönük uyumluluk için tek sayfa analizi (analyze_chunk kullanır)."""
+        """Geriye dönük uyumluluk için tek sayfa analizi (analyze_chunk kullanır).
+
+        Hata durumunda analyze_chunk gibi None döner.
+        """
         return self.analyze_chunk([image_path])
 
@@ -0,0 +1,89 @@
+# Motordaki src-python/model_json.py'nin uygulamadaki kopyası (akış
+# ayrıştırıcısı ArrayStream hariç). İki paket birbirini içe aktarmadığından
+# değişiklikler iki dosyaya da yapılmalı; test_engine_parity.py karşılaştırır.
+
+import json
+import re
+
+_FENCE = re.compile(r'```(?:json)?\s*(.*?)(?:```|$)', re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+_DECODER = json.JSONDecoder()
+
+
+def generation_config(schema):
+    """Yanıtın schema'ya uyan JSON olmasını isteyen generation_config."""
+    return {'response_mime_type': 'application/json', 'response_schema': schema}
+
+
+def _first_value(text):
+    """Metinde bulunan ilk JSON nesnesi veya dizisi; yoksa None."""
+    for match in re.finditer(r'[{\[]', text):
+        try:
+            value, _ = _DECODER.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        if isinstance(value, (dict, list)):
+            return value
+    return None
+
+
+def iter_array_items(text, start):
+    """text[start]'ta açılan dizinin tamamlanmış öğelerini (öğe, bitiş) olarak verir.
+
+    Henüz çözülemeyen ilk öğede sessizce durur; yarıda kesilmiş dizilerden
+    yalnızca tamamlanmış öğeler döner.
+    """
+    pos = start + 1
+    length = len(text)
+    while True:
+        while pos < length and text[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= length or text[pos] == ']':
+            return
+        try:
+            item, pos = _DECODER.raw_decode(text, pos)
+        except ValueError:
+            return
+        yield item, pos
+
+
+def _salvage_array(text, key):
+    match = re.search(r'"%s"\s*:\s*\[' % re.escape(key), text)
+    if match is None:
+        return None
+    items = [item for item, _ in iter_array_items(text, match.end() - 1)]
+    return {key: items} if items else None
+
+
+def parse_model_json(text, array_key='questions'):
+    """Model yanıtını dict/list olarak çözer; hiç JSON yoksa ValueError.
+
+    Şema modunda yanıt zaten düz JSON'dur. Önbellekten gelen veya şemasız
+    yanıtlar için ```json blokları, JSON çevresindeki açıklamalar ve sondaki
+    virgüller tolere edilir. Yalnızca yarıda kesilmiş bir array_key dizisi
+    bulunursa {array_key: [tamamlanmış öğeler]} döner.
+    """
+    text = (text or '').strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    salvaged = None
+    if array_key:
+        salvaged = _salvage_array(_TRAILING_COMMA.sub(r'\1', text), array_key)
+
+    candidates = [m.group(1) for m in _FENCE.finditer(text)] + [text]
+    for candidate in candidates:
+        for variant in (candidate, _TRAILING_COMMA.sub(r'\1', candidate)):
+            value = _first_value(variant)
+            if value is None:
+                continue
+            # Kesilmiş yanıtta ilk tam nesne dizinin bir öğesidir, yanıtın kendisi değil
+            if salvaged and not (isinstance(value, dict) and array_key in value):
+                continue
+            return value
+
+    if salvaged is not None:
+        return salvaged
+    raise ValueError(f"Model yanıtı JSON olarak okunamadı: {text[:80]!r}")
@@ -2,32 +2,103 @@ import os
 from pdf2image import convert_from_path
 from PIL import Image
 
+from src.core.embedded_images import extract_page_image
+from src.core.storage_encoder import STORAGE_QUALITY, save_crop
+from src.core.trim import TRIM_MARGIN, trim_to_ink
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # pypdf yoksa tüm sayfalar rasterize edilir
+    PdfReader = None
+
 class PDFProcessor:
     def __init__(self, output_dir='data/temp_pages'):
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
 
     def convert_pdf_to_images(self, pdf_path, dpi=300):
-        """PDF dosyasını sayfa sayfa görsellere dönüştürür."""
+        """PDF dosyasını sayfa sayfa görsellere dönüştürür.
+
+        Tek bir tam sayfa görselden oluşan taranmış sayfalarda gömülü görsel
+        doğrudan çıkarılır (JPEG'ler yeniden kodlanmadan yazılır); yalnızca
+        karışık içerikli sayfalar poppler ile rasterize edilir. Ardışık
+        rasterize edilecek sayfalar tek bir pdftoppm çağrısıyla işlenir.
+        """
         print(f"PDF dönüştürülüyor: {pdf_path}")
         try:
-            pages = convert_from_path(pdf_path, dpi=dpi)
+            reader = self._open_reader(pdf_path)
+            if reader is None:
+                pages = convert_from_path(pdf_path, dpi=dpi)
+                return [self._save_page(i + 1, page) for i, page in enumerate(pages)]
+
             image_paths = []
-            
-            for i, page in enumerate(pages):
-                image_name = f"page_{i+1}.png"
-                image_path = os.path.join(self.output_dir, image_name)
-                page.save(image_path, 'PNG')
+            run = []  # Rasterize edilmeyi bekleyen ardışık sayfa numaraları
+            for i, page in enumerate(reader.pages):
+                image_path = self._save_embedded_page(i + 1, page)
+                if image_path is None:
+                    run.append(i + 1)
+                    continue
+                image_paths.extend(self._render_run(pdf_path, run, dpi))
+                run = []
                 image_paths.append(image_path)
-                print(f"Kaydedildi: {image_path}")
-                
+            image_paths.extend(self._render_run(pdf_path, run, dpi))
+
             return image_paths
         except Exception as e:
             print(f"Dönüştürme hatası: {e}")
             return []
 
-    def crop_question(self, page_image_path, coords, output_path, padding=10):
-        """Belirtilen koordinatlara göre soruyu biraz pay bırakarak kırpar."""
+    def _render_run(self, pdf_path, run, dpi):
+        """run'daki ardışık sayfaları tek pdftoppm çağrısıyla rasterize eder."""
+        if not run:
+            return []
+        rendered = convert_from_path(
+            pdf_path, dpi=dpi, first_page=run[0], last_page=run[-1])
+        return [self._save_page(number, page) for number, page in zip(run, rendered)]
+
+    def _open_reader(self, pdf_path):
+        if PdfReader is None:
+            return None
+        try:
+            return PdfReader(pdf_path)
+        except Exception:
+            return None
+
+    def _save_page(self, page_number, page):
+        image_path = os.path.join(self.output_dir, f"page_{page_number}.png")
+        page.save(image_path, 'PNG')
+        print(f"Kaydedildi: {image_path}")
+        return image_path
+
+    def _save_embedded_page(self, page_number, page):
+        """Taranmış sayfanın gömülü görselini kaydeder; uygun değilse None."""
+        try:
+            extracted = extract_page_image(page)
+        except Exception as e:
+            print(f"Gömülü görsel okunamadı (sayfa {page_number}): {e}")
+            return None
+        if extracted is None:
+            return None
+
+        jpeg_data, image = extracted
+        if image is not None:
+            return self._save_page(page_number, image)
+
+        image_path = os.path.join(self.output_dir, f"page_{page_number}.jpg")
+        with open(image_path, 'wb') as f:
+            f.write(jpeg_data)
+        print(f"Kaydedildi: {image_path}")
+        return image_path
+
+    def crop_question(self, page_image_path, coords, output_path, padding=10, trim_margin=TRIM_MARGIN,
+                      quality=STORAGE_QUALITY):
+        """Belirtilen koordinatlara göre soruyu biraz pay bırakarak kırpar.
+
+        Pay, sorunun hiçbir kısmı kesilmesin diye eklenir; ardından kırpım
+        mürekkep sınırına + trim_margin piksele daraltılır (None: daraltma yok).
+        Kırpım içeriğine göre 1 bit PNG, gri JPEG veya WebP olarak kaydedilir;
+        output_path'in uzantısı buna göre değişir, yazılan yol döner.
+        """
         try:
             with Image.open(page_image_path) as img:
                 width, height = img.size
@@ -45,8 +116,9 @@ class PDFProcessor:
                 bottom = ymax * height / 1000
                 
                 cropped_img = img.crop((left, top, right, bottom))
-                cropped_img.save(output_path)
-                return output_path
+                if trim_margin is not None:
+                    cropped_img = trim_to_ink(cropped_img, trim_margin)
+                return save_crop(cropped_img, output_path, quality)
         except Exception as e:
             print(f"Kırpma hatası: {e}")
             return None
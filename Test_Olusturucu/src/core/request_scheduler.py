@@ -0,0 +1,142 @@
+# src-python/engine.py içindeki RequestScheduler ile aynı hız sınırı, yeniden
+# deneme ve Retry-After kuralları; motor ayrı bir ikili olarak paketlendiğinden
+# kod paylaşılmıyor. Olaylar yerine konsola yazar. Eşlik testi:
+# tests/unit/core/test_engine_parity.py.
+
+import math
+import random
+import re
+import threading
+import time
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+RETRYABLE_ERRORS = (
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "InternalServerError", "DeadlineExceeded", "GatewayTimeout")
+
+
+def is_retryable(exc):
+    """429/5xx ve geçici Google API hataları yeniden denenebilir."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS:
+        return True
+    return type(exc).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after_seconds(exc):
+    """Sunucunun önerdiği bekleme süresi (Retry-After, RetryInfo veya mesaj metni).
+
+    Kullanılabilir bir ipucu yoksa None; negatif ve sonlu olmayan değerler
+    kullanılamaz.
+    """
+    delay = _raw_retry_after(exc)
+    if delay is None or not math.isfinite(delay) or delay < 0:
+        return None
+    return delay
+
+
+def _raw_retry_after(exc):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        try:
+            value = headers.get("Retry-After")
+            if value is not None:
+                return float(value)
+        except (TypeError, ValueError):
+            pass
+
+    for detail in getattr(exc, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+
+    message = str(exc)
+    match = (re.search(r"retry in ([\d.]+)\s*s", message, re.IGNORECASE) or
+             re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", message))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class RequestScheduler:
+    """Tüm model çağrıları için token-bucket hız sınırı ve jitter'lı üstel geri çekilme."""
+
+    def __init__(self, rpm=60, burst=None, max_retries=5, base_delay=1.0,
+                 max_delay=60.0, sleep=time.sleep, clock=time.monotonic):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self.set_rate(rpm, burst)
+
+    def set_rate(self, rpm, burst=None):
+        with self._lock:
+            self._rate = max(rpm, 1) / 60.0
+            self._burst = float(burst or max(1, min(rpm, 10)))
+            self._tokens = self._burst
+            self._updated = self._clock()
+
+    @property
+    def queue_depth(self):
+        return self._waiting
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(
+                    self._burst,
+                    self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            self._sleep(wait)
+
+    def call(self, fn, *args, label="", **kwargs):
+        """fn'i hız sınırına uyarak çağırır; geçici hatalarda yeniden dener."""
+        with self._lock:
+            self._waiting += 1
+
+        try:
+            attempt = 0
+            while True:
+                self._acquire()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        raise
+
+                    delay = retry_after_seconds(e)
+                    if delay is not None:
+                        # İpucuna en fazla geri çekilme tavanı kadar güvenilir
+                        delay = min(delay, self.max_delay)
+                    else:
+                        delay = random.uniform(
+                            0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                    attempt += 1
+
+                    print(f"{label}: API meşgul ({e.__class__.__name__}), "
+                          f"{delay:.1f} sn sonra yeniden deneniyor "
+                          f"({attempt}/{self.max_retries}, kuyruk: {self._waiting})")
+                    self._sleep(delay)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+
+_default_scheduler = None
+
+
+def get_scheduler():
+    """Uygulama genelinde paylaşılan zamanlayıcı."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = RequestScheduler()
+    return _default_scheduler
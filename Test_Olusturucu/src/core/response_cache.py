@@ -0,0 +1,119 @@
+# src-python/engine.py içindeki ResponseCache ile aynı depolama ve LRU
+# temizliği; motor ayrı bir ikili olarak paketlendiğinden kod paylaşılmıyor.
+# Anahtar burada piksellerden değil görsel dosyalarının içeriğinden üretilir.
+# Eşlik testi: tests/unit/core/test_engine_parity.py.
+
+import hashlib
+import json
+import os
+import threading
+
+
+class ResponseCache:
+    """Gemini yanıtlarını sayfa görüntüsü + prompt + model adına göre diskte saklar.
+
+    Her kayıt küçük bir JSON dosyasıdır; dosyanın mtime değeri LRU saati olarak
+    kullanılır ve boyut sınırı aşıldığında en eski kayıtlar silinir.
+    """
+
+    def __init__(self, cache_dir='data/cache', max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @staticmethod
+    def make_key(image_paths, prompt, model_name):
+        """Görsel dosyalarının içeriğinden anahtar üretir; dosya okunamazsa None döner."""
+        h = hashlib.sha256()
+        try:
+            for path in image_paths:
+                with open(path, 'rb') as f:
+                    h.update(hashlib.sha256(f.read()).digest())
+        except OSError:
+            return None
+        h.update(prompt.encode('utf-8'))
+        h.update(str(model_name).encode('utf-8'))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)  # Son kullanım zamanını güncelle
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Aynı önbelleği paylaşan süreçler birbirinin geçici dosyasını ezmesin
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(e[1] for e in self._entries())
+            else:
+                self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # En eski kayıtları sınırın %90'ının altına inene kadar sil
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "path": self.cache_dir,
+            "entries": len(entries),
+            "bytes": sum(e[1] for e in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        removed = 0
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+            self._total_bytes = 0
+        return removed
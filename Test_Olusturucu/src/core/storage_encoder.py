@@ -0,0 +1,114 @@
+# src-python/storage_encoder.py ile aynı sınıflandırma ve kodlama; motor
+# ayrı bir ikili olarak paketlendiğinden kod paylaşılmıyor. Uzantılar burada
+# noktalı döner ve save_crop yalnızca burada var. Eşlik testi:
+# tests/unit/core/test_engine_parity.py.
+
+import os
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, features
+
+BILEVEL = 'bilevel'
+GRAYSCALE = 'gray'
+COLOR = 'color'
+
+# Kayıplı biçimlerin (gri JPEG, WebP) varsayılan hedef kalitesi (1-100)
+STORAGE_QUALITY = 80
+
+# Kanalları bundan fazla ayrışan piksel renklidir...
+CHROMA_LEVEL = 32
+# ...ve piksellerin bu oranından fazlası renkliyse kırpım renklidir
+COLOR_FRACTION = 0.005
+# Bu iki değer arasındaki gri tonlar ara tondur: kenar yumuşatma, gölge ve
+# kağıt beyazının hemen altına kadar açık dolgular. Açık tonlar da sayılır;
+# eşiklenip beyaza dönen bir "taralı alan" sorunun bir parçasını siler
+MIDTONE_RANGE = (64, 236)
+# Ara tonları bu oranın altında kalan kırpım siyah-beyazdır; keskin baskı
+# bunun çok altında, gölgeli şekiller ve fotoğraflar çok üstünde kalır
+MIDTONE_FRACTION = 0.06
+# Siyah-beyaz kırpımlarda eşikleme seviyesi
+BILEVEL_THRESHOLD = 160
+
+# Sınıflandırma, hiçbir kenar bunu aşmayacak şekilde her n. piksel üzerinde
+# yapılır; yeniden örnekleme metni bulanıklaştırıp ara ton üretirdi
+CLASSIFY_MAX_SIDE = 512
+
+_EXTENSIONS = {'PNG': '.png', 'JPEG': '.jpg', 'WEBP': '.webp'}
+
+
+def classify_crop(image):
+    """Kırpımı BILEVEL, GRAYSCALE veya COLOR olarak sınıflandırır."""
+    if image.mode == '1':
+        return BILEVEL
+    step = -(-max(image.size) // CLASSIFY_MAX_SIDE)
+
+    if image.mode not in ('L', 'LA', 'I', 'I;16'):
+        rgb = np.asarray(image.convert('RGB'))[::step, ::step].astype(np.int16)
+        chroma = rgb.max(axis=2) - rgb.min(axis=2)
+        if np.mean(chroma > CHROMA_LEVEL) > COLOR_FRACTION:
+            return COLOR
+
+    gray = np.asarray(image.convert('L'))[::step, ::step]
+    low, high = MIDTONE_RANGE
+    if np.mean((gray > low) & (gray < high)) < MIDTONE_FRACTION:
+        return BILEVEL
+    return GRAYSCALE
+
+
+def encode_crop(image, quality=STORAGE_QUALITY):
+    """Kırpımı içeriğine göre kodlar; (bayt, uzantı, tür) döner.
+
+    Siyah-beyaz metin 1 bit PNG (kayıpsız), gri içerik gri JPEG, renkli
+    içerik WebP olur (Pillow WebP desteklemiyorsa JPEG).
+    """
+    kind = classify_crop(image)
+    buffered = BytesIO()
+
+    if kind == BILEVEL:
+        image = image.convert('L').point(
+            lambda v: 255 if v >= BILEVEL_THRESHOLD else 0, mode='1')
+        fmt, options = 'PNG', {'optimize': True}
+    elif kind == GRAYSCALE:
+        image = image.convert('L')
+        fmt, options = 'JPEG', {'quality': quality, 'optimize': True}
+    elif features.check('webp'):
+        image = image.convert('RGB')
+        fmt, options = 'WEBP', {'quality': quality, 'method': 4}
+    else:
+        image = image.convert('RGB')
+        fmt, options = 'JPEG', {'quality': quality, 'optimize': True}
+
+    image.save(buffered, format=fmt, **options)
+    return buffered.getvalue(), _EXTENSIONS[fmt], kind
+
+
+def save_crop(image, output_path, quality=STORAGE_QUALITY):
+    """Kırpımı output_path'in uzantısını seçilen biçimle değiştirerek yazar.
+
+    Asıl yazılan dosyanın yolunu döner.
+    """
+    data, ext, _ = encode_crop(image, quality)
+    path = os.path.splitext(output_path)[0] + ext
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def pdf_image(path, quality=STORAGE_QUALITY):
+    """reportlab'in çizeceği görseli döner.
+
+    reportlab JPEG dosyalarını olduğu gibi gömer, diğer her şeyi 8 bit RGB
+    Flate verisine açar; bu da dışa aktarılan testte kazancı geri alır.
+    JPEG'ler yol olarak geçer, 1 bit ve gri kırpımlar tek gri kanal olarak,
+    WebP kırpımlar JPEG'e çevrilerek çizilir.
+    """
+    with Image.open(path) as img:
+        if img.format == 'JPEG':
+            return path
+        if img.mode in ('1', 'L', 'LA'):
+            return img.convert('L')
+        buffered = BytesIO()
+        img.convert('RGB').save(buffered, format='JPEG', quality=quality)
+    buffered.seek(0)
+    return buffered
@@ -1,9 +1,12 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
 from PIL import Image
 import os
 
+from src.core.storage_encoder import pdf_image
+
 class TestGenerator:
     def __init__(self, output_dir='data/tests'):
         self.output_dir = output_dir
@@ -67,7 +70,7 @@ class TestGenerator:
                     c.drawString(x_pos - 0.5*cm if current_col == 0 else x_pos - 0.5*cm, y_positions[current_col] - 0.4*cm, f"{i+1}.")
                     
                     # Resmi çiz
-                    c.drawImage(img_path, x_pos, y_positions[current_col] - display_h, width=display_w, height=display_h)
+                    c.drawImage(ImageReader(pdf_image(img_path)), x_pos, y_positions[current_col] - display_h, width=display_w, height=display_h)
                     y_positions[current_col] -= (display_h + 0.8*cm)
             
         c.save()
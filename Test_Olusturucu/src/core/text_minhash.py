@@ -0,0 +1,73 @@
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+NUM_PERM = 128
+# 16 bant x 8 satır: Jaccard benzerliği ~0.7'nin üstündeki çiftler aday olur
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_SIZE = 5
+# Bundan kısa metinler ("Görsel Soru", OCR yok...) karşılaştırılmaz
+MIN_TEXT_CHARS = 40
+TEXT_DUPLICATE_THRESHOLD = 0.8
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)  # İmzalar kalıcı: tohum değişmemeli
+_PERM_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+# OCR çıktısında Türkçe harfler sık sık düşer; ikisini de ASCII'ye indir
+_TR_FOLD = str.maketrans('çğıöşüâîû', 'cgiosuaiu')
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_text(text):
+    """Türkçe büyük/küçük harf kuralıyla küçültür, aksanları ve noktalamayı atar."""
+    text = (text or '').replace('I', 'ı').replace('İ', 'i').lower()
+    text = text.translate(_TR_FOLD)
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Normalize metnin karakter k-gramları (kelime bölünmelerine dayanıklı)."""
+    text = normalize_text(text)
+    if len(text) < MIN_TEXT_CHARS:
+        return set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(text):
+    """NUM_PERM uzunluğunda uint32 MinHash imzası; kısa metinlerde None."""
+    grams = shingles(text)
+    if not grams:
+        return None
+    values = np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams),
+                         dtype=np.uint64, count=len(grams)) % np.uint64(_PRIME)
+    # (a * x + b) mod p; a, x < 2^31 olduğundan uint64 taşmaz
+    hashed = (_PERM_A[:, None] * values[None, :] + _PERM_B[:, None]) % np.uint64(_PRIME)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def signature_to_bytes(signature):
+    return signature.astype('<u4').tobytes()
+
+
+def signature_from_bytes(data):
+    return np.frombuffer(data, dtype='<u4')
+
+
+def lsh_buckets(signature):
+    """Her bant için (bant, kova) çiftleri; kova 63 bitlik bir tam sayıdır."""
+    buckets = []
+    for band in range(LSH_BANDS):
+        chunk = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].astype('<u4').tobytes()
+        digest = hashlib.blake2b(chunk, digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, 'little') >> 1))
+    return buckets
+
+
+def similarity(a, b):
+    """İki imzanın tahmini Jaccard benzerliği."""
+    return float(np.mean(a == b))
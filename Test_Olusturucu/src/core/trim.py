@@ -0,0 +1,60 @@
+# Motorun src-python/trim.py modülüyle aynı algoritma; ayrı paketlendikleri
+# için iki kopya tutuluyor. test_engine_parity.py sonuçların aynı kaldığını
+# denetler.
+
+import numpy as np
+
+# Kağıttan en az bu kadar koyu pikseller mürekkep sayılır; soluk çizimler
+# ve açık gölgeler her kağıt tonunda kırpmanın içinde kalır
+INK_CONTRAST = 16
+# RGB kanalları en az bu kadar ayrışan pikseller de mürekkeptir (kağıttan
+# pek koyu olmayan soluk renkli şekiller ve vurgular)
+MIN_CHROMA = 48
+# Kağıt tonu, piksellerin bu oranının ulaştığı gri düzeyidir
+PAPER_FRACTION = 0.9
+# Bir satır/sütunun en az bu oranı koyuysa mürekkep içerir; tek tük
+# noktalar ve tarama gürültüsü kırpmayı bozmaz
+MIN_INK_FRACTION = 0.002
+# Mürekkebin çevresinde bırakılan beyaz pay (piksel, 300 dpi)
+TRIM_MARGIN = 16
+
+
+def paper_level(gray):
+    """Kağıdın gri düzeyi: piksellerin PAPER_FRACTION kadarından parlak."""
+    counts = np.bincount(gray.ravel(), minlength=256)
+    return int(np.searchsorted(np.cumsum(counts), PAPER_FRACTION * gray.size))
+
+
+def ink_bounds(image, ink_contrast=INK_CONTRAST, min_chroma=MIN_CHROMA,
+               min_fraction=MIN_INK_FRACTION):
+    """Mürekkepli alanın (sol, üst, sağ, alt) kutusu; boş görselde None.
+
+    Satır ve sütun izdüşümleri tek NumPy geçişinde hesaplanır.
+    """
+    gray = np.asarray(image.convert('L'))
+    ink = gray < paper_level(gray) - ink_contrast
+    if image.mode not in ('1', 'L', 'LA'):
+        rgb = np.asarray(image.convert('RGB'))
+        ink |= rgb.max(axis=2) - rgb.min(axis=2) >= min_chroma
+
+    height, width = ink.shape
+    rows = np.flatnonzero(ink.sum(axis=1) >= max(1, width * min_fraction))
+    cols = np.flatnonzero(ink.sum(axis=0) >= max(1, height * min_fraction))
+    if not len(rows) or not len(cols):
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def trim_to_ink(image, margin=TRIM_MARGIN):
+    """Görseli mürekkep kutusu + margin piksele kırpar; boşsa olduğu gibi döner."""
+    bounds = ink_bounds(image)
+    if bounds is None:
+        return image
+
+    left, top, right, bottom = bounds
+    width, height = image.size
+    box = (max(0, left - margin), max(0, top - margin),
+           min(width, right + margin), min(height, bottom + margin))
+    if box == (0, 0, width, height):
+        return image
+    return image.crop(box)
@@ -3,11 +3,19 @@ import os
 
 from .init_db import init_db
 
+try:
+    from src.core import text_minhash
+    from src.core.image_hash import DUPLICATE_MAX_DISTANCE, HammingIndex, dhash
+except ImportError:  # numpy yoksa tekrar kontrolü yapılmaz
+    dhash = None
+    text_minhash = None
+
 class DBManager:
     def __init__(self, db_path='data/test_olusturucu.db'):
         self.db_path = db_path
         init_db(self.db_path)
         self._migrate_schema()
+        self._hash_index = None
 
     def _get_connection(self):
         return sqlite3.connect(self.db_path)
@@ -28,6 +36,24 @@ class DBManager:
             # difficulty exists in original code's INSERT, but ensuring it won't hurt if table was old
             if 'difficulty' not in columns:
                 cursor.execute("ALTER TABLE questions ADD COLUMN difficulty INTEGER")
+            # Görsel tekrar tespiti: 64 bit dHash (hex) ve ilk eşin kimliği
+            if 'image_hash' not in columns:
+                cursor.execute("ALTER TABLE questions ADD COLUMN image_hash TEXT")
+            if 'duplicate_of' not in columns:
+                cursor.execute("ALTER TABLE questions ADD COLUMN duplicate_of INTEGER")
+            # Metin tekrar tespiti: MinHash imzası + LSH bant kovaları
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS question_text_lsh (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    question_id INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_text_lsh_bucket ON question_text_lsh (band, bucket)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_text_lsh_question ON question_text_lsh (question_id)")
+            if 'text_minhash' not in columns:
+                cursor.execute("ALTER TABLE questions ADD COLUMN text_minhash BLOB")
+                self._index_existing_texts(cursor)
             
             conn.commit()
         except Exception as e:
@@ -35,21 +61,155 @@ class DBManager:
         finally:
             conn.close()
 
-    def add_question(self, text, image_path, subject=None, grade_level=None, difficulty=None, category=None):
+    @staticmethod
+    def _text_signature(text):
+        if text_minhash is None:
+            return None
+        return text_minhash.minhash(text)
+
+    def _index_text(self, cursor, question_id, signature):
+        cursor.execute('UPDATE questions SET text_minhash = ? WHERE id = ?',
+                       (text_minhash.signature_to_bytes(signature), question_id))
+        cursor.executemany(
+            'INSERT INTO question_text_lsh (band, bucket, question_id) VALUES (?, ?, ?)',
+            [(band, bucket, question_id) for band, bucket in text_minhash.lsh_buckets(signature)])
+
+    def _index_existing_texts(self, cursor):
+        """Sütun yeni eklendiğinde mevcut soruların imzalarını bir kez hesaplar."""
+        for question_id, text in cursor.execute('SELECT id, text FROM questions').fetchall():
+            signature = self._text_signature(text)
+            if signature is not None:
+                self._index_text(cursor, question_id, signature)
+
+    def _similar_texts(self, cursor, signature, threshold):
+        """LSH kovası ortak olan adayları imzayla doğrular; (benzerlik, id) listesi."""
+        buckets = text_minhash.lsh_buckets(signature)
+        where = ' OR '.join(['(l.band = ? AND l.bucket = ?)'] * len(buckets))
+        rows = cursor.execute(f'''
+            SELECT DISTINCT q.id, q.text_minhash
+            FROM question_text_lsh l JOIN questions q ON q.id = l.question_id
+            WHERE {where}
+        ''', [value for pair in buckets for value in pair]).fetchall()
+
+        matches = []
+        for question_id, data in rows:
+            score = text_minhash.similarity(signature, text_minhash.signature_from_bytes(data))
+            if score >= threshold:
+                matches.append((score, question_id))
+        matches.sort(key=lambda m: (-m[0], m[1]))
+        return matches
+
+    def find_similar_questions(self, text, threshold=None):
+        """Metni verilen soruya benzeyen kayıtların (benzerlik, id) listesi, en benzer önce."""
+        signature = self._text_signature(text)
+        if signature is None:
+            return []
+        if threshold is None:
+            threshold = text_minhash.TEXT_DUPLICATE_THRESHOLD
         conn = self._get_connection()
-        cursor = conn.cursor()
-        # Use subject as category if not provided, for backward compatibility logic
-        final_category = category if category else subject
-        
-        cursor.execute('''
-            INSERT INTO questions (text, image_path, category, difficulty, subject, grade_level)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (text, image_path, final_category, difficulty, subject, grade_level))
-        question_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        try:
+            return self._similar_texts(conn.cursor(), signature, threshold)
+        finally:
+            conn.close()
+
+    def _get_hash_index(self):
+        """Kayıtlı soruların dHash indeksi; ilk kullanımda bir kez yüklenir."""
+        if self._hash_index is None:
+            index = HammingIndex()
+            conn = self._get_connection()
+            rows = conn.execute(
+                'SELECT id, image_hash FROM questions WHERE image_hash IS NOT NULL').fetchall()
+            conn.close()
+            for question_id, image_hash in rows:
+                index.add(int(image_hash, 16), question_id)
+            self._hash_index = index
+        return self._hash_index
+
+    @staticmethod
+    def _hash_image(image_path):
+        if dhash is None:
+            return None
+        try:
+            return dhash(image_path)
+        except (OSError, ValueError):
+            return None
+
+    def find_duplicate_questions(self, image_path, max_distance=None):
+        """Görseli verilen soruya benzeyen kayıtların (uzaklık, id) listesi."""
+        image_hash = self._hash_image(image_path)
+        if image_hash is None:
+            return []
+        if max_distance is None:
+            max_distance = DUPLICATE_MAX_DISTANCE
+        return self._get_hash_index().search(image_hash, max_distance)
+
+    def add_question(self, text, image_path, subject=None, grade_level=None, difficulty=None, category=None,
+                     skip_duplicates=False):
+        """Soruyu ekler ve kimliğini döner.
+
+        Kırpım görseli ya da (OCR farklarından arındırılmış) metni bankadaki
+        bir soruyla neredeyse aynıysa kayıt duplicate_of ile işaretlenir.
+        skip_duplicates=True ise yalnızca görsel ve metin aynı soruda
+        buluştuğunda (metin kısa/yoksa görsel tek başına) hiç eklenmez,
+        yeni kırpım dosyası silinir ve mevcut sorunun kimliği döner. Tek
+        başına metin benzerliği kaydı yalnızca işaretler.
+        """
+        image_hash = self._hash_image(image_path)
+        signature = self._text_signature(text)
+        image_matches = []
+        if image_hash is not None:
+            image_matches = [q for _, q in self._get_hash_index().search(image_hash, DUPLICATE_MAX_DISTANCE)]
+
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            text_matches = []
+            if signature is not None:
+                text_matches = [q for _, q in self._similar_texts(
+                    cursor, signature, text_minhash.TEXT_DUPLICATE_THRESHOLD)]
+
+            if signature is None:
+                agreed = image_matches
+            else:
+                agreed = [q for q in image_matches if q in text_matches]
+            if skip_duplicates and agreed:
+                self._discard_image(cursor, image_path)
+                return agreed[0]
+            duplicates = agreed or image_matches or text_matches
+            duplicate_of = duplicates[0] if duplicates else None
+
+            # Use subject as category if not provided, for backward compatibility logic
+            final_category = category if category else subject
+
+            cursor.execute('''
+                INSERT INTO questions (text, image_path, category, difficulty, subject, grade_level,
+                                       image_hash, duplicate_of)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (text, image_path, final_category, difficulty, subject, grade_level,
+                  None if image_hash is None else f"{image_hash:016x}", duplicate_of))
+            question_id = cursor.lastrowid
+            if signature is not None:
+                self._index_text(cursor, question_id, signature)
+            conn.commit()
+        finally:
+            conn.close()
+
+        if image_hash is not None:
+            self._get_hash_index().add(image_hash, question_id)
         return question_id
 
+    @staticmethod
+    def _discard_image(cursor, image_path):
+        """Atlanan sorunun kırpımını, başka bir kayıt kullanmıyorsa siler."""
+        if not image_path:
+            return
+        if cursor.execute('SELECT 1 FROM questions WHERE image_path = ? LIMIT 1', (image_path,)).fetchone():
+            return
+        try:
+            os.remove(image_path)
+        except OSError:
+            pass
+
     def get_all_questions(self):
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -62,12 +222,17 @@ class DBManager:
         conn = self._get_connection()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM questions WHERE id = ?', (question_id,))
+        cursor.execute('DELETE FROM question_text_lsh WHERE question_id = ?', (question_id,))
         conn.commit()
         conn.close()
+        if self._hash_index is not None:
+            self._hash_index.remove(question_id)
 
     def delete_all_questions(self):
         conn = self._get_connection()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM questions')
+        cursor.execute('DELETE FROM question_text_lsh')
         conn.commit()
         conn.close()
+        self._hash_index = None
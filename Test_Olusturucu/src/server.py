@@ -123,25 +123,37 @@ async def upload_pdf(file: UploadFile = File(...)):
         
         # Note: This loop might need async adaptation or run in threadpool
         # But for now keeping it simple as per "Local App" requirement
-        for img_path in images:
+        failed_pages = []
+        for page_number, img_path in enumerate(images, start=1):
             questions_data = gemini_service.analyze_page(img_path)
+            if questions_data is None:
+                failed_pages.append(page_number)
+                continue
             for idx, q_data in enumerate(questions_data):
                 q_id_file = f"{os.path.basename(img_path)}_{idx}"
                 out_path = os.path.join(STATIC_IMG_DIR, f"{q_id_file}.png")
                 
-                pdf_processor.crop_question(img_path, q_data['coordinates'], out_path)
-                
+                out_path = pdf_processor.crop_question(img_path, q_data['coordinates'], out_path)
+                if not out_path:
+                    continue
+
                 db_manager.add_question(
                     text=q_data['text'], 
                     image_path=out_path,
                     subject=q_data.get('subject'),
                     grade_level=q_data.get('grade_level'),
-                    difficulty=q_data.get('difficulty')
+                    difficulty=q_data.get('difficulty'),
+                    skip_duplicates=True
                 )
         
         # Cleanup
         os.remove(temp_path)
         
+        if failed_pages:
+            send_notification("İşlem Tamamlandı",
+                              f"{len(failed_pages)} sayfa analiz edilemedi, diğer sorular bankaya eklendi.")
+            return {"status": "partial", "message": "Some pages could not be analyzed",
+                    "failed_pages": failed_pages}
         send_notification("İşlem Tamamlandı", "PDF başarıyla işlendi ve sorular bankaya eklendi.")
         return {"status": "success", "message": "PDF processed successfully"}
     except Exception as e:
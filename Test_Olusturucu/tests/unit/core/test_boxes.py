@@ -0,0 +1,63 @@
+import numpy as np
+from src.core.boxes import clean_boxes
+
+
+def test_fixes_inverted_and_out_of_page_boxes():
+    """Corners are reordered and clamped; slivers and NaN rows are dropped."""
+    boxes, keep = clean_boxes([
+        (500, 600, 100, 200),          # inverted
+        (-50, 700, 400, 1200),         # outside the page
+        (10, 10, 12, 500),             # 2 units wide: degenerate
+        (np.nan, 0, 100, 100),
+    ], 1000, 1000)
+
+    assert boxes.tolist() == [[100, 200, 500, 600], [0, 700, 400, 1000]]
+    assert keep.tolist() == [0, 1]
+
+
+def test_merges_duplicates_and_nested_fragments():
+    """Overlapping duplicates and a figure boxed inside its question collapse."""
+    boxes, keep = clean_boxes([
+        (0, 0, 480, 300),
+        (500, 0, 1000, 300),
+        (10, 5, 490, 310),             # duplicate of 0
+        (600, 100, 900, 250),          # figure inside 1
+    ], 1000, 1000)
+
+    assert boxes.tolist() == [[0, 0, 490, 310], [500, 0, 1000, 300]]
+    assert keep.tolist() == [0, 1]
+
+
+def test_keeps_question_with_several_boxed_figures():
+    """A question box holding two small figure boxes absorbs them."""
+    boxes, keep = clean_boxes([
+        (100, 100, 900, 500),
+        (150, 200, 450, 350),
+        (500, 200, 850, 350),
+    ], 1000, 1000)
+
+    assert boxes.tolist() == [[100, 100, 900, 500]]
+    assert keep.tolist() == [0]
+
+
+def test_drops_box_wrapping_several_questions():
+    """A whole-page box is dropped in favor of the questions inside it."""
+    boxes, keep = clean_boxes([
+        (0, 0, 1000, 1000),
+        (50, 50, 450, 400),
+        (550, 50, 950, 400),
+    ], 1000, 1000)
+
+    assert keep.tolist() == [1, 2]
+    assert len(boxes) == 2
+
+
+def test_drops_box_around_questions_it_is_made_of():
+    """Two questions boxed together as well as separately stay two questions."""
+    boxes, keep = clean_boxes([
+        (50, 50, 950, 620),
+        (60, 60, 940, 330),
+        (60, 350, 940, 610),
+    ], 1000, 1000)
+
+    assert keep.tolist() == [1, 2]
@@ -0,0 +1,324 @@
+"""src/core keeps copies of some src-python engine helpers.
+
+The desktop app and the engine sidecar are packaged separately (the
+sidecar is a standalone PyInstaller binary), so neither imports the
+other's code. These tests run both copies on the same inputs so a fix
+made on one side cannot silently miss the other.
+"""
+import importlib.util
+import os
+import random
+from types import SimpleNamespace
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from PIL import Image, ImageDraw
+
+from src.core import (boxes, embedded_images, model_json, request_scheduler,
+                      storage_encoder, trim)
+from src.core.response_cache import ResponseCache
+
+ENGINE_DIR = Path(__file__).resolve().parents[4] / 'src-python'
+
+
+def engine_module(name):
+    """src-python/<name>.py, loaded under a name that cannot shadow ours."""
+    path = ENGINE_DIR / f'{name}.py'
+    if not path.exists():
+        pytest.skip('src-python is not checked out next to Test_Olusturucu')
+    spec = importlib.util.spec_from_file_location(f'engine_{name}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """src-python/engine.py; its own imports resolve inside src-python."""
+    monkeypatch.syspath_prepend(str(ENGINE_DIR))
+    return engine_module('engine')
+
+
+def test_clean_boxes_parity():
+    """Both clean_boxes give the same boxes and indexes on noisy pages."""
+    engine_boxes = engine_module('boxes')
+    rng = np.random.default_rng(7)
+    pages = [
+        [(500, 600, 100, 200), (-50, 700, 400, 1200), (10, 10, 12, 500), (np.nan, 0, 100, 100)],
+        [(0, 0, 480, 300), (500, 0, 1000, 300), (10, 5, 490, 310), (600, 100, 900, 250)],
+        [(0, 0, 1000, 1000), (50, 50, 450, 400), (550, 50, 950, 400)],
+        [(100, 100, 900, 500), (150, 200, 450, 350), (500, 200, 850, 350)],
+        [],
+    ]
+    for _ in range(50):
+        corners = rng.uniform(-100, 1100, size=(rng.integers(1, 12), 4))
+        pages.append(corners.tolist())
+
+    for page in pages:
+        ours, our_keep = boxes.clean_boxes(page, 1000, 1000)
+        theirs, their_keep = engine_boxes.clean_boxes(page, 1000, 1000)
+        np.testing.assert_array_equal(ours, theirs)
+        np.testing.assert_array_equal(our_keep, their_keep)
+
+    for name in ('MERGE_IOU', 'CONTAIN_RATIO', 'MIN_SIDE', 'WRAPPER_COVER', 'WRAPPER_PAGE'):
+        assert getattr(boxes, name) == getattr(engine_boxes, name)
+
+
+def sample_crops():
+    """Blank, speckled, text-like and shaded crops in the modes we store."""
+    rng = np.random.default_rng(11)
+    blank = Image.new('L', (300, 200), 255)
+
+    specks = blank.copy()
+    for x, y in rng.integers(0, 200, size=(6, 2)):
+        specks.putpixel((int(x), int(y)), 0)
+
+    text = Image.new('RGB', (640, 420), 'white')
+    draw = ImageDraw.Draw(text)
+    for row in range(5):
+        draw.rectangle([60, 60 + row * 50, 520 - row * 40, 80 + row * 50], fill='black')
+
+    shaded = Image.fromarray(
+        np.tile(np.linspace(0, 255, 400, dtype=np.uint8), (300, 1)), 'L')
+    figure = text.copy()
+    ImageDraw.Draw(figure).ellipse([380, 220, 600, 400], fill=(200, 40, 40))
+    return [blank, specks, text, text.convert('1'), shaded, figure]
+
+
+def test_trim_parity():
+    """Both copies find the same ink and trim to the same pixels."""
+    engine_trim = engine_module('trim')
+    for name in ('INK_CONTRAST', 'MIN_CHROMA', 'PAPER_FRACTION', 'MIN_INK_FRACTION'):
+        assert getattr(trim, name) == getattr(engine_trim, name)
+
+    for image in sample_crops():
+        assert trim.ink_bounds(image) == engine_trim.ink_bounds(image)
+        for margin in (0, trim.TRIM_MARGIN):
+            ours = trim.trim_to_ink(image, margin)
+            theirs = engine_trim.trim_to_ink(image, margin)
+            assert ours.size == theirs.size
+            assert ours.tobytes() == theirs.tobytes()
+
+
+def test_storage_encoder_parity(tmp_path):
+    """Same class, same encoded bytes and same PDF input for every crop."""
+    engine_encoder = engine_module('storage_encoder')
+    for name in ('CHROMA_LEVEL', 'COLOR_FRACTION', 'MIDTONE_RANGE',
+                 'MIDTONE_FRACTION', 'BILEVEL_THRESHOLD', 'CLASSIFY_MAX_SIDE'):
+        assert getattr(storage_encoder, name) == getattr(engine_encoder, name)
+
+    for i, image in enumerate(sample_crops()):
+        assert storage_encoder.classify_crop(image) == engine_encoder.classify_crop(image)
+
+        data, ext, kind = storage_encoder.encode_crop(image, 70)
+        engine_data, engine_ext, engine_kind = engine_encoder.encode_crop(image, 70)
+        # Extensions differ only in the dot: '.png' here, 'png' in the engine
+        assert (data, ext, kind) == (engine_data, '.' + engine_ext, engine_kind)
+
+        path = tmp_path / f'crop_{i}{ext}'
+        path.write_bytes(data)
+        ours = storage_encoder.pdf_image(str(path), 70)
+        theirs = engine_encoder.pdf_image(str(path), 70)
+        if isinstance(ours, str):
+            assert ours == theirs
+        elif isinstance(ours, Image.Image):
+            assert ours.tobytes() == theirs.tobytes()
+        else:
+            assert ours.getvalue() == theirs.getvalue()
+
+
+MODEL_RESPONSES = [
+    '{"questions": [{"q": 1}, {"q": 2}]}',
+    '```json\n{"questions": [{"q": 1},]}\n```',
+    'İşte sonuç:\n{"questions": [{"q": 1}]}\nBaşka bir şey?',
+    '{"questions": [{"q": 1, "bbox": [1, 2, 3, 4]}, {"q": 2, "bbox": [5, 6',
+    '[{"q": 1}, {"q": 2},]',
+    '{"answers": [{"q_num": 1, "answer": "A"}]}',
+    '',
+    'JSON yok',
+]
+
+
+def outcome(parse, text, **kwargs):
+    try:
+        return parse(text, **kwargs)
+    except ValueError as e:
+        return ValueError, str(e)
+
+
+def test_model_json_parity():
+    """Both parsers read (or reject) model responses the same way."""
+    engine_json = engine_module('model_json')
+    schema = {'type': 'object', 'properties': {'questions': {'type': 'array'}}}
+    assert model_json.generation_config(schema) == engine_json.generation_config(schema)
+
+    for text in MODEL_RESPONSES:
+        for key in ('questions', 'answers', None):
+            assert (outcome(model_json.parse_model_json, text, array_key=key)
+                    == outcome(engine_json.parse_model_json, text, array_key=key))
+
+    truncated = MODEL_RESPONSES[3]
+    start = truncated.index('[')
+    assert (list(model_json.iter_array_items(truncated, start))
+            == list(engine_json.iter_array_items(truncated, start)))
+
+
+def sample_pdf_pages(tmp_path):
+    """Scans (JPEG, 1-bit, gray), a mixed page and a partial placement."""
+    from pypdf import PdfReader
+    from reportlab.pdfgen import canvas
+
+    paths = []
+    scan = Image.new('RGB', (620, 877), 'white')
+    ImageDraw.Draw(scan).rectangle([60, 80, 500, 120], fill='black')
+    for mode in ('RGB', '1', 'L'):
+        path = tmp_path / f'scan_{mode}.pdf'
+        scan.convert(mode).save(path, resolution=75)
+        paths.append(path)
+
+    jpeg = tmp_path / 'scan.jpg'
+    scan.save(jpeg)
+    path = tmp_path / 'drawn.pdf'
+    c = canvas.Canvas(str(path), pagesize=(595, 842))
+    c.drawImage(str(jpeg), 0, 0, 595, 842)                # full-page scan
+    c.showPage()
+    c.drawImage(str(jpeg), 0, 0, 595, 842)
+    c.drawString(72, 72, 'Sayfa 1')                       # mixed page
+    c.showPage()
+    c.drawImage(str(jpeg), 100, 100, 300, 400)            # partial placement
+    c.showPage()
+    c.save()
+    paths.append(path)
+
+    return [page for path in paths for page in PdfReader(str(path)).pages]
+
+
+def test_embedded_images_parity(tmp_path):
+    """Same pages qualify; the same bytes or pixels come out of both copies.
+
+    The engine returns a PIL image (JPEG bytes in info['jpeg_passthrough']),
+    this copy returns (jpeg_bytes, None) or (None, image).
+    """
+    engine_images = engine_module('embedded_images')
+    results = []
+    for page in sample_pdf_pages(tmp_path):
+        ours = embedded_images.extract_page_image(page)
+        theirs = engine_images.extract_page_image(page)
+        if ours is None:
+            assert theirs is None
+            results.append(None)
+            continue
+        jpeg_bytes, image = ours
+        if jpeg_bytes is not None:
+            assert theirs.info['jpeg_passthrough'] == jpeg_bytes
+            results.append('jpeg')
+        else:
+            assert 'jpeg_passthrough' not in theirs.info
+            assert (image.mode, image.size) == (theirs.mode, theirs.size)
+            assert image.tobytes() == theirs.tobytes()
+            results.append('decoded')
+
+    # Every branch was exercised
+    assert {'jpeg', 'decoded', None} <= set(results)
+
+
+def test_response_cache_parity(engine, tmp_path, monkeypatch):
+    """Both caches store, evict and clear the same entries the same way."""
+    temp_files = []
+    replace = os.replace
+
+    def recording_replace(src, dst):
+        temp_files.append(os.path.basename(src))
+        replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', recording_replace)
+
+    ours = ResponseCache(str(tmp_path / 'ours'), max_bytes=1200)
+    theirs = engine.ResponseCache(str(tmp_path / 'theirs'), max_bytes=1200)
+    for n in range(12):
+        key = f'{n:02d}' * 32
+        value = [{'number': n, 'text': 'x' * (20 + 15 * n)}]
+        for cache in (ours, theirs):
+            cache.put(key, value)
+            # Distinct LRU times so eviction order does not depend on timing
+            os.utime(cache._path(key), (1_000_000 + n, 1_000_000 + n))
+        ours.get('00' * 32)
+        theirs.get('00' * 32)
+
+    def stored(cache):
+        return sorted(os.path.relpath(path, cache.cache_dir)
+                      for _, _, path in cache._entries())
+
+    assert stored(ours) == stored(theirs)
+    assert len(stored(ours)) < 12
+    assert {k: v for k, v in ours.stats().items() if k != 'path'} == \
+        {k: v for k, v in theirs.stats().items() if k != 'path'}
+    assert all(f'.{os.getpid()}-' in name for name in temp_files)
+    assert ours.clear() == theirs.clear()
+
+
+class ApiError(Exception):
+    """Stand-in for google.api_core errors: code, response headers, details."""
+
+    def __init__(self, message='', code=None, headers=None, details=None):
+        super().__init__(message)
+        self.code = code
+        self.response = SimpleNamespace(headers=headers) if headers is not None else None
+        self.details = details
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def api_errors():
+    delay = SimpleNamespace(retry_delay=SimpleNamespace(seconds=7, nanos=500_000_000))
+    return [
+        ApiError('quota', code=429, headers={'Retry-After': '12'}),
+        ApiError('quota', code=429, headers={'Retry-After': '-5'}),
+        ApiError('quota', code=429, headers={'Retry-After': 'nan'}),
+        ApiError('quota', code=429, headers={'Retry-After': 'inf'}),
+        ApiError('quota', code=429, headers={'Retry-After': 'soon'}),
+        ApiError('overloaded', code=503, details=[delay]),
+        ApiError('Please retry in 3.25s.', code=500),
+        ApiError('retry_delay { seconds: 40 }', code=502),
+        ApiError('bad request', code=400, headers={'Retry-After': '1'}),
+        ResourceExhausted('retry in 900s'),
+        ValueError('not an API error'),
+    ]
+
+
+def test_request_scheduler_parity(engine):
+    """Both schedulers classify errors, read hints and back off alike."""
+    assert request_scheduler.RETRYABLE_STATUS == engine.RETRYABLE_STATUS
+    assert request_scheduler.RETRYABLE_ERRORS == engine.RETRYABLE_ERRORS
+    for error in api_errors():
+        assert request_scheduler.is_retryable(error) == engine._is_retryable(error)
+        assert (request_scheduler.retry_after_seconds(error) ==
+                engine._retry_after_seconds(error))
+
+    def sleeps(scheduler_class, errors):
+        slept = []
+        scheduler = scheduler_class(rpm=60, burst=1, max_retries=4,
+                                    sleep=slept.append, clock=lambda: sum(slept))
+        remaining = list(errors)
+
+        def flaky():
+            if remaining:
+                raise remaining.pop(0)
+            return 'ok'
+
+        random.seed(5)
+        try:
+            result = scheduler.call(flaky, label='page 1')
+        except Exception as e:
+            result = type(e).__name__
+        return result, slept
+
+    retryable = [e for e in api_errors() if request_scheduler.is_retryable(e)]
+    cases = [retryable[:4], retryable[4:], retryable, [ValueError('boom')]]
+    for errors in cases:
+        assert (sleeps(request_scheduler.RequestScheduler, errors) ==
+                sleeps(engine.RequestScheduler, errors))
@@ -59,7 +59,7 @@ def test_analyze_chunk_parsing(mocker):
     assert results[0]["page_index"] == 0
 
 def test_gemini_api_error_handling(mocker):
-    """Test that API errors return empty list instead of crashing."""
+    """API errors return None (failure), not an empty question list."""
     mock_genai = mocker.patch("src.core.gemini_service.genai")
     mock_model = MagicMock()
     mock_genai.GenerativeModel.return_value = mock_model
@@ -71,4 +71,98 @@ def test_gemini_api_error_handling(mocker):
     service = GeminiService()
     
     results = service.analyze_chunk(["path"])
-    assert results == []
+    assert results is None
+
+def test_analyze_chunk_sends_inline_images(mocker, tmp_path):
+    """Readable images are sent as inline JPEG parts without upload_file."""
+    mock_genai = mocker.patch("src.core.gemini_service.genai")
+    mock_model = MagicMock()
+    mock_genai.GenerativeModel.return_value = mock_model
+    mock_response = MagicMock()
+    mock_response.text = '{"questions": []}'
+    mock_model.generate_content.return_value = mock_response
+
+    from PIL import Image
+    page = tmp_path / "page_1.png"
+    Image.new("RGB", (3000, 1500), color="white").save(page)
+
+    mocker.patch.dict(os.environ, {"GEMINI_API_KEY": "TEST_KEY"})
+    service = GeminiService(cache=MagicMock(get=MagicMock(return_value=None)))
+    service.analyze_chunk([str(page)])
+
+    assert not mock_genai.upload_file.called
+    parts = mock_model.generate_content.call_args[0][0]
+    assert parts[1]["mime_type"] == "image/jpeg"
+    assert isinstance(parts[1]["data"], bytes)
+
+
+def test_analyze_chunk_file_transport_cleans_up(mocker, tmp_path):
+    """File transport uploads each image and deletes it after the call."""
+    mock_genai = mocker.patch("src.core.gemini_service.genai")
+    mock_model = MagicMock()
+    mock_genai.GenerativeModel.return_value = mock_model
+    mock_response = MagicMock()
+    mock_response.text = '{"questions": []}'
+    mock_model.generate_content.return_value = mock_response
+
+    mocker.patch.dict(os.environ, {"GEMINI_API_KEY": "TEST_KEY"})
+    service = GeminiService(cache=MagicMock(get=MagicMock(return_value=None)), transport='file')
+    service.analyze_chunk([str(tmp_path / "a.png"), str(tmp_path / "b.png")])
+
+    assert mock_genai.upload_file.call_count == 2
+    assert mock_genai.delete_file.call_count == 2
+
+def test_clean_detections_per_page():
+    """Boxes are cleaned per page; duplicates and malformed coordinates go away."""
+    from src.core.gemini_service import clean_detections
+
+    detections = [
+        {"page_index": 0, "text": "A", "coordinates": [0, 0, 300, 480]},
+        {"page_index": 0, "text": "A again", "coordinates": [5, 10, 310, 490]},
+        {"page_index": 1, "text": "B", "coordinates": [300, 480, 0, 0]},
+        {"page_index": 1, "text": "broken", "coordinates": [1, 2]},
+    ]
+    cleaned = clean_detections(detections)
+
+    assert [q["text"] for q in cleaned] == ["A", "B"]
+    assert cleaned[0]["coordinates"] == [0, 0, 310, 490]
+    assert cleaned[1]["coordinates"] == [0, 0, 300, 480]
+
+def test_analyze_chunk_requests_structured_output(mocker, tmp_path):
+    """Requests carry the response schema; a truncated answer keeps its complete questions."""
+    from src.core.gemini_service import CHUNK_SCHEMA
+    from src.core.response_cache import ResponseCache
+
+    mock_genai = mocker.patch("src.core.gemini_service.genai")
+    mock_model = MagicMock()
+    mock_genai.GenerativeModel.return_value = mock_model
+    mock_model.generate_content.return_value = MagicMock(text=(
+        '{"questions": [{"page_index": 0, "text": "Q1", "coordinates": [0, 0, 400, 1000]},'
+        ' {"page_index": 0, "text": "Q2", "coordinates": [500, 0, 9'))
+
+    service = GeminiService(cache=ResponseCache(str(tmp_path / "cache")))
+    results = service.analyze_chunk([str(tmp_path / "missing.png")])
+
+    assert [q["text"] for q in results] == ["Q1"]
+    config = mock_model.generate_content.call_args.kwargs["generation_config"]
+    assert config["response_mime_type"] == "application/json"
+    assert config["response_schema"] is CHUNK_SCHEMA
+
+
+def test_analyze_chunk_unreadable_response_is_a_failure(mocker, tmp_path):
+    """A response with no JSON at all is a failure and is not cached."""
+    from src.core.request_scheduler import RequestScheduler
+    from src.core.response_cache import ResponseCache
+
+    mock_genai = mocker.patch("src.core.gemini_service.genai")
+    mock_model = MagicMock()
+    mock_genai.GenerativeModel.return_value = mock_model
+    mock_model.generate_content.return_value = MagicMock(text="Üzgünüm, yardımcı olamam.")
+
+    cache = ResponseCache(str(tmp_path / "cache"))
+    service = GeminiService(cache=cache, scheduler=RequestScheduler(rpm=6000))
+    assert service.analyze_chunk([str(tmp_path / "missing.png")]) is None
+    assert cache.stats()["entries"] == 0
+
+    mock_model.generate_content.return_value = MagicMock(text='{"questions": []}')
+    assert service.analyze_chunk([str(tmp_path / "missing.png")]) == []
@@ -0,0 +1,52 @@
+import random
+
+from PIL import Image, ImageDraw
+from src.core.image_hash import HammingIndex, dhash, hamming
+
+
+def _question_image(seed, size=(600, 400)):
+    rng = random.Random(seed)
+    img = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(size[0] - 120), rng.randrange(size[1] - 20)
+        draw.rectangle([x, y, x + rng.randrange(40, 120), y + 12], fill=0)
+    return img
+
+
+def test_dhash_survives_rescale_and_reencode(tmp_path):
+    """A resized JPEG copy hashes close to the original; another question does not."""
+    original = _question_image(1)
+    path = tmp_path / "copy.jpg"
+    original.resize((450, 300)).save(path, quality=70)
+
+    assert hamming(dhash(original), dhash(str(path))) <= 6
+    assert hamming(dhash(original), dhash(_question_image(2))) > 6
+
+
+def test_index_search_matches_linear_scan():
+    """Index results equal a brute-force hamming scan, sorted by distance."""
+    rng = random.Random(0)
+    hashes = [rng.getrandbits(64) for _ in range(3000)]
+    index = HammingIndex()
+    for i, h in enumerate(hashes):
+        index.add(h, i)
+
+    query = hashes[5] ^ 0b1011  # 3 bits away from item 5
+    for radius in (3, 6, 20):  # 20 > indexed radius: full vectorized scan
+        expected = sorted((hamming(query, h), i) for i, h in enumerate(hashes)
+                          if hamming(query, h) <= radius)
+        assert index.search(query, radius) == expected
+    assert index.search(query)[0] == (3, 5)
+
+
+def test_index_remove():
+    """Removed ids are no longer returned; other ids with the same hash stay."""
+    index = HammingIndex()
+    index.add(0xFF, 1)
+    index.add(0xFF, 2)
+    index.add(0x0F, 3)
+    index.remove(1)
+
+    assert len(index) == 2
+    assert index.search(0xFF, 0) == [(0, 2)]
@@ -0,0 +1,32 @@
+import pytest
+from src.core.model_json import generation_config, iter_array_items, parse_model_json
+
+
+def test_parse_plain_and_fenced_json():
+    """Schema-mode JSON parses directly; fenced, chatty output still works."""
+    assert parse_model_json('{"questions": []}') == {"questions": []}
+
+    text = 'Elbette!\n```json\n{"questions": [{"text": "a"},]}\n```\nBaşka soru?'
+    assert parse_model_json(text) == {"questions": [{"text": "a"}]}
+
+
+def test_parse_truncated_array_keeps_complete_items():
+    """A response cut off mid-object keeps the questions before the cut."""
+    text = '{"questions": [{"text": "a"}, {"text": "b"}, {"text": "c", "coordin'
+    assert parse_model_json(text) == {"questions": [{"text": "a"}, {"text": "b"}]}
+
+
+def test_parse_without_json_raises():
+    with pytest.raises(ValueError):
+        parse_model_json("Bu sayfada soru bulunamadı.")
+
+
+def test_iter_array_items_stops_at_partial_item():
+    text = '[{"a": 1}, {"a": 2}, {"a"'
+    assert [item for item, _ in iter_array_items(text, 0)] == [{"a": 1}, {"a": 2}]
+
+
+def test_generation_config():
+    schema = {"type": "object"}
+    assert generation_config(schema) == {"response_mime_type": "application/json",
+                                         "response_schema": schema}
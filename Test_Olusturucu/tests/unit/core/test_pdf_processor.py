@@ -62,3 +62,119 @@ def test_crop_question(tmp_path):
         # Tolerance of +/- 1 pixel due to float rounding
         assert 499 <= w <= 501
         assert 499 <= h <= 501
+
+def test_crop_question_trims_to_ink(tmp_path):
+    """Padded crops are snapped to the printed area plus the trim margin."""
+    from PIL import ImageDraw
+
+    img_path = tmp_path / "page.png"
+    img = Image.new("RGB", (1000, 1000), color="white")
+    ImageDraw.Draw(img).rectangle([400, 300, 599, 449], fill="black")
+    img.save(img_path)
+
+    processor = PDFProcessor(output_dir=str(tmp_path))
+    out_path = tmp_path / "cropped.png"
+    result = processor.crop_question(str(img_path), [200, 200, 800, 800], str(out_path),
+                                     padding=25, trim_margin=10)
+
+    with Image.open(result) as c_img:
+        assert c_img.size == (220, 170)
+
+def test_convert_scanned_pdf_passes_jpeg_through(mocker, tmp_path):
+    """Single-image scanned pages are written as the embedded JPEG, no rendering."""
+    mock_convert = mocker.patch("src.core.pdf_processor.convert_from_path")
+
+    pdf_path = tmp_path / "scan.pdf"
+    Image.new("RGB", (620, 877), color="white").save(pdf_path, resolution=75)
+
+    processor = PDFProcessor(output_dir=str(tmp_path / "pages"))
+    paths = processor.convert_pdf_to_images(str(pdf_path))
+
+    assert len(paths) == 1
+    assert paths[0].endswith("page_1.jpg")
+    assert not mock_convert.called
+    with Image.open(paths[0]) as page:
+        assert page.format == "JPEG"
+        assert page.size == (620, 877)
+
+
+def test_convert_mixed_pdf_renders_only_that_page(mocker, tmp_path):
+    """Pages with vector content still go through poppler, one page at a time."""
+    from reportlab.pdfgen import canvas
+
+    pdf_path = tmp_path / "mixed.pdf"
+    c = canvas.Canvas(str(pdf_path))
+    c.drawString(100, 700, "1. Soru metni")
+    c.showPage()
+    c.save()
+
+    mock_convert = mocker.patch("src.core.pdf_processor.convert_from_path")
+    mock_convert.return_value = [Image.new("RGB", (10, 10), color="white")]
+
+    processor = PDFProcessor(output_dir=str(tmp_path / "pages"))
+    paths = processor.convert_pdf_to_images(str(pdf_path))
+
+    assert len(paths) == 1
+    assert paths[0].endswith("page_1.png")
+    mock_convert.assert_called_once_with(
+        str(pdf_path), dpi=300, first_page=1, last_page=1)
+
+def test_convert_mixed_pdf_renders_runs_in_one_call(mocker, tmp_path):
+    """Consecutive vector pages share one poppler call; scans in between split the runs."""
+    from io import BytesIO
+
+    from pypdf import PdfReader, PdfWriter
+    from reportlab.pdfgen import canvas
+
+    vector = BytesIO()
+    c = canvas.Canvas(vector)
+    c.drawString(100, 700, "1. Soru metni")
+    c.showPage()
+    c.save()
+    scan = BytesIO()
+    Image.new("RGB", (620, 877), color="white").save(scan, format="PDF", resolution=75)
+
+    # Sayfa düzeni: vektör, vektör, tarama, vektör, vektör, vektör
+    writer = PdfWriter()
+    for kind in "vvsvvv":
+        source = scan if kind == "s" else vector
+        source.seek(0)
+        writer.add_page(PdfReader(source).pages[0])
+    pdf_path = tmp_path / "book.pdf"
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+    def fake_convert(path, dpi, first_page, last_page):
+        return [Image.new("RGB", (10, 10), color="white")
+                for _ in range(first_page, last_page + 1)]
+
+    mock_convert = mocker.patch("src.core.pdf_processor.convert_from_path",
+                                side_effect=fake_convert)
+
+    processor = PDFProcessor(output_dir=str(tmp_path / "pages"))
+    paths = processor.convert_pdf_to_images(str(pdf_path))
+
+    assert [os.path.basename(p) for p in paths] == [
+        "page_1.png", "page_2.png", "page_3.jpg",
+        "page_4.png", "page_5.png", "page_6.png"]
+    assert mock_convert.call_count == 2
+    assert [c.kwargs for c in mock_convert.call_args_list] == [
+        {"dpi": 300, "first_page": 1, "last_page": 2},
+        {"dpi": 300, "first_page": 4, "last_page": 6}]
+
+def test_crop_question_stores_text_as_bilevel_png(tmp_path):
+    """Text-only crops are stored as 1-bit PNGs under the requested name."""
+    from PIL import ImageDraw
+
+    img_path = tmp_path / "page.png"
+    img = Image.new("RGB", (1000, 1000), color="white")
+    ImageDraw.Draw(img).rectangle([300, 300, 699, 399], fill="black")
+    img.save(img_path)
+
+    processor = PDFProcessor(output_dir=str(tmp_path))
+    result = processor.crop_question(str(img_path), [250, 250, 750, 750],
+                                     str(tmp_path / "q.jpg"), padding=0)
+
+    assert result == str(tmp_path / "q.png")
+    with Image.open(result) as c_img:
+        assert c_img.mode == "1"
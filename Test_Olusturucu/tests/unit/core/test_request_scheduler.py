@@ -0,0 +1,116 @@
+import pytest
+from unittest.mock import MagicMock
+from src.core.request_scheduler import RequestScheduler, is_retryable, retry_after_seconds
+
+
+class ResourceExhausted(Exception):
+    """Stand-in for google.api_core.exceptions.ResourceExhausted (HTTP 429)."""
+    code = 429
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_scheduler(clock, **kwargs):
+    return RequestScheduler(sleep=clock.sleep, clock=clock.clock, **kwargs)
+
+
+def test_retries_rate_limit_then_succeeds():
+    """A 429 is retried with backoff and the call finally succeeds."""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, rpm=600)
+    fn = MagicMock(side_effect=[ResourceExhausted("quota"), ResourceExhausted("quota"), "ok"])
+
+    assert scheduler.call(fn, label="test") == "ok"
+    assert fn.call_count == 3
+    assert len(clock.sleeps) == 2
+    assert scheduler.queue_depth == 0
+
+
+def test_non_retryable_error_raises_immediately():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    fn = MagicMock(side_effect=ValueError("bad json"))
+
+    with pytest.raises(ValueError):
+        scheduler.call(fn)
+    assert fn.call_count == 1
+    assert clock.sleeps == []
+
+
+def test_gives_up_after_max_retries():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, rpm=600, max_retries=2)
+    fn = MagicMock(side_effect=ResourceExhausted("quota"))
+
+    with pytest.raises(ResourceExhausted):
+        scheduler.call(fn)
+    assert fn.call_count == 3
+
+
+def test_retry_after_hint_is_honored():
+    """The server's 'retry in Ns' hint replaces the computed backoff."""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, rpm=600)
+    fn = MagicMock(side_effect=[ResourceExhausted("Quota exceeded. Please retry in 7.5s."), "ok"])
+
+    scheduler.call(fn)
+    assert 7.5 in clock.sleeps
+
+
+@pytest.mark.parametrize("hint", ["-5", "nan", "inf"])
+def test_unusable_retry_after_falls_back_to_backoff(hint):
+    """Negative or non-finite hints are ignored instead of reaching sleep()."""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, rpm=600, base_delay=1.0)
+    exc = ResourceExhausted("busy")
+    exc.response = MagicMock(headers={"Retry-After": hint})
+    fn = MagicMock(side_effect=[exc, "ok"])
+
+    assert retry_after_seconds(exc) is None
+    assert scheduler.call(fn) == "ok"
+    assert len(clock.sleeps) == 1 and 0 <= clock.sleeps[0] <= 1.0
+
+
+def test_retry_after_hint_is_capped_at_max_delay():
+    """A huge hint cannot stall a worker past max_delay."""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, rpm=600, max_delay=30.0)
+    fn = MagicMock(side_effect=[ResourceExhausted("Please retry in 86400s."), "ok"])
+
+    scheduler.call(fn)
+    assert clock.sleeps == [30.0]
+
+
+def test_token_bucket_limits_rate():
+    """With a burst of 2 at 60 rpm, the third call waits about one second."""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, rpm=60, burst=2)
+    fn = MagicMock(return_value="ok")
+
+    for _ in range(3):
+        scheduler.call(fn)
+
+    assert clock.sleeps and abs(sum(clock.sleeps) - 1.0) < 1e-6
+
+
+def test_error_classification():
+    assert is_retryable(ResourceExhausted())
+    assert not is_retryable(ValueError())
+
+    response = MagicMock()
+    response.headers = {"Retry-After": "3"}
+    exc = Exception("busy")
+    exc.response = response
+    assert retry_after_seconds(exc) == 3.0
+    assert retry_after_seconds(Exception("no hint")) is None
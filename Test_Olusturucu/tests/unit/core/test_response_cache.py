@@ -0,0 +1,83 @@
+import os
+import time
+from unittest.mock import MagicMock
+from PIL import Image
+from src.core.response_cache import ResponseCache
+
+
+def test_put_get_roundtrip(tmp_path):
+    """Stored value is returned for the same key."""
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.put("ab" * 32, [{"text": "Soru"}])
+
+    assert cache.get("ab" * 32) == [{"text": "Soru"}]
+    assert cache.get("cd" * 32) is None
+
+
+def test_make_key_depends_on_content_prompt_and_model(tmp_path):
+    """Keys change with image bytes, prompt or model; missing files give None."""
+    img = tmp_path / "page.png"
+    img.write_bytes(b"pixels")
+
+    key = ResponseCache.make_key([str(img)], "prompt", "model")
+    assert key == ResponseCache.make_key([str(img)], "prompt", "model")
+    assert key != ResponseCache.make_key([str(img)], "other prompt", "model")
+    assert key != ResponseCache.make_key([str(img)], "prompt", "other-model")
+
+    img.write_bytes(b"different pixels")
+    assert key != ResponseCache.make_key([str(img)], "prompt", "model")
+
+    assert ResponseCache.make_key([str(tmp_path / "missing.png")], "p", "m") is None
+
+
+def test_lru_eviction(tmp_path):
+    """Least recently used entries are evicted once the size cap is exceeded."""
+    cache = ResponseCache(cache_dir=str(tmp_path), max_bytes=300)
+    keys = [f"{i:02d}" * 32 for i in range(10)]
+
+    cache.put(keys[0], ["x" * 40])
+    old = time.time() - 100
+    os.utime(cache._path(keys[0]), (old, old))
+    cache.get(keys[0])  # Touch: now the most recently used
+
+    for i, key in enumerate(keys[1:], start=1):
+        cache.put(key, ["x" * 40])
+        ts = time.time() - 50 + i
+        os.utime(cache._path(key), (ts, ts))
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 300
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+
+
+def test_clear(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.put("ab" * 32, [])
+    cache.put("cd" * 32, [])
+
+    assert cache.clear() == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_gemini_cache_hit_skips_api(mocker, tmp_path):
+    """A cached chunk is answered without upload or generate_content."""
+    mock_genai = mocker.patch("src.core.gemini_service.genai")
+    mock_model = MagicMock()
+    mock_model.model_name = "models/gemini-2.5-pro"
+    mock_genai.GenerativeModel.return_value = mock_model
+    mock_response = MagicMock()
+    mock_response.text = '{"questions": [{"page_index": 0, "text": "Q", "coordinates": [0, 0, 10, 10]}]}'
+    mock_model.generate_content.return_value = mock_response
+
+    page = tmp_path / "page_1.png"
+    Image.new("RGB", (100, 100), color="white").save(page)
+
+    from src.core.gemini_service import GeminiService
+    service = GeminiService(cache=ResponseCache(cache_dir=str(tmp_path / "cache")))
+
+    first = service.analyze_chunk([str(page)])
+    second = service.analyze_chunk([str(page)])
+
+    assert first == second
+    assert mock_model.generate_content.call_count == 1
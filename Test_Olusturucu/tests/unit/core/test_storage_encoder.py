@@ -0,0 +1,84 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw, features
+from src.core.storage_encoder import (BILEVEL, COLOR, GRAYSCALE, classify_crop,
+                                      encode_crop, pdf_image, save_crop)
+
+
+def _text_crop():
+    img = Image.new("RGB", (1200, 400), "white")
+    draw = ImageDraw.Draw(img)
+    for row in range(8):
+        draw.rectangle([40, 30 + row * 45, 1100, 45 + row * 45], fill="black")
+    return img
+
+
+def _gradient_crop():
+    ramp = np.tile(np.linspace(0, 255, 600, dtype=np.uint8), (300, 1))
+    return Image.fromarray(ramp).convert("RGB")
+
+
+def test_classify_crop():
+    """Black text, gray shading and colored figures get their own class."""
+    text = _text_crop()
+    colored = text.copy()
+    ImageDraw.Draw(colored).rectangle([800, 0, 1000, 200], fill=(30, 90, 200))
+
+    assert classify_crop(text) == BILEVEL
+    assert classify_crop(_gradient_crop()) == GRAYSCALE
+    assert classify_crop(colored) == COLOR
+
+
+def test_light_shading_is_not_binarized():
+    """A pale shaded area survives storage instead of turning white."""
+    shaded = _text_crop()
+    ImageDraw.Draw(shaded).rectangle([600, 200, 1000, 380], fill=(215, 215, 215))
+
+    assert classify_crop(shaded) == GRAYSCALE
+    data, _, _ = encode_crop(shaded)
+    with Image.open(io.BytesIO(data)) as img:
+        assert abs(img.convert("L").getpixel((800, 370)) - 215) <= 8
+
+
+def test_encode_crop_formats():
+    """Bilevel crops become 1-bit PNGs, gray ones grayscale JPEGs."""
+    data, ext, kind = encode_crop(_text_crop())
+    with Image.open(io.BytesIO(data)) as img:
+        assert (ext, kind, img.format, img.mode) == (".png", BILEVEL, "PNG", "1")
+
+    data, ext, kind = encode_crop(_gradient_crop(), quality=60)
+    with Image.open(io.BytesIO(data)) as img:
+        assert (ext, img.format, img.mode) == (".jpg", "JPEG", "L")
+
+
+def test_encode_crop_is_smaller_than_color_jpeg():
+    """Text crops shrink several times compared to full-color JPEGs."""
+    text = _text_crop()
+    baseline = io.BytesIO()
+    text.save(baseline, format="JPEG")
+
+    data, _, _ = encode_crop(text)
+    assert len(data) * 4 < len(baseline.getvalue())
+
+
+def test_save_crop_replaces_extension(tmp_path):
+    """The stored file's extension follows the chosen format."""
+    path = save_crop(_text_crop(), str(tmp_path / "q_1.png"))
+    assert path == str(tmp_path / "q_1.png")
+
+    path = save_crop(_gradient_crop(), str(tmp_path / "q_2.png"))
+    assert path == str(tmp_path / "q_2.jpg")
+
+    colored = Image.new("RGB", (200, 200), (200, 30, 30))
+    path = save_crop(colored, str(tmp_path / "q_3.png"))
+    assert path.endswith(".webp" if features.check("webp") else ".jpg")
+
+
+def test_pdf_image(tmp_path):
+    """JPEGs pass through by path; 1-bit crops are drawn as gray."""
+    jpeg = save_crop(_gradient_crop(), str(tmp_path / "a.png"))
+    assert pdf_image(jpeg) == jpeg
+
+    png = save_crop(_text_crop(), str(tmp_path / "b.png"))
+    assert pdf_image(png).mode == "L"
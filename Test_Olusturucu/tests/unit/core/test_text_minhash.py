@@ -0,0 +1,26 @@
+from src.core.text_minhash import minhash, normalize_text, similarity
+
+QUESTION = ("Bir çiftçi tarlasının üçte birine buğday, kalanın yarısına arpa ekmiştir. "
+            "Geriye kalan 40 dönüme mısır ektiğine göre tarlanın tamamı kaç dönümdür?")
+
+
+def test_normalize_text_turkish_case_and_diacritics():
+    """Turkish dotted/dotless I and dropped diacritics normalize the same way."""
+    assert normalize_text("IŞIK İçin, ÇİÇEK!") == normalize_text("isik icin cicek")
+    assert normalize_text("  Soru:  1)  ") == "soru 1"
+
+
+def test_minhash_close_for_ocr_variants():
+    """OCR noise keeps similarity high; a different question scores low."""
+    noisy = QUESTION.replace("ç", "c").replace("ğ", "g").replace("dönüm", "donum ") + " A) 60"
+    other = ("Bir sınıftaki öğrencilerin %40'ı kızdır. Sınıfa 6 erkek öğrenci daha "
+             "katıldığında erkeklerin oranı %70 olduğuna göre sınıfta kaç kız vardır?")
+
+    assert similarity(minhash(QUESTION), minhash(noisy)) >= 0.8
+    assert similarity(minhash(QUESTION), minhash(other)) < 0.2
+
+
+def test_minhash_skips_short_text():
+    """Placeholder texts are too short to compare."""
+    assert minhash("Görsel Soru (OCR Yok)") is None
+    assert minhash(None) is None
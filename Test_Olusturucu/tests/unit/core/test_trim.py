@@ -0,0 +1,37 @@
+from PIL import Image, ImageDraw
+from src.core.trim import ink_bounds, trim_to_ink
+
+
+def test_ink_bounds_ignores_specks_and_paper_tone():
+    """Off-white paper and single dust pixels do not count as ink."""
+    img = Image.new("L", (800, 600), 235)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([100, 50, 499, 299], fill=10)
+    draw.point((790, 590), fill=0)
+
+    assert ink_bounds(img) == (100, 50, 500, 300)
+    assert ink_bounds(Image.new("L", (50, 50), 255)) is None
+
+
+def test_ink_bounds_keeps_pale_figure_at_crop_edge():
+    """Light gray and pale colored drawings count as ink, even on a white page."""
+    img = Image.new("RGB", (800, 600), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([100, 250, 499, 349], fill="black")
+    draw.rectangle([550, 40, 799, 599], fill=(225, 225, 225))
+    assert ink_bounds(img) == (100, 40, 800, 600)
+
+    img = Image.new("RGB", (800, 600), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([100, 250, 499, 349], fill="black")
+    draw.rectangle([0, 0, 80, 599], fill=(255, 250, 170))
+    assert ink_bounds(img) == (0, 0, 500, 600)
+
+
+def test_trim_to_ink_margin_is_clamped():
+    """The margin never reaches past the original crop."""
+    img = Image.new("RGB", (300, 200), "white")
+    ImageDraw.Draw(img).rectangle([5, 50, 199, 149], fill="black")
+
+    trimmed = trim_to_ink(img, margin=20)
+    assert trimmed.size == (220, 140)
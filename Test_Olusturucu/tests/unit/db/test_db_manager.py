@@ -37,3 +37,74 @@ def test_delete_all(db_session):
     db_session.delete_all_questions()
     questions = db_session.get_all_questions()
     assert len(questions) == 0
+
+def test_duplicate_question_flagged_or_skipped(db_session, tmp_path):
+    """Near-identical crops are flagged, or skipped with skip_duplicates."""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("L", (600, 400), 255)
+    ImageDraw.Draw(img).rectangle([40, 40, 400, 80], fill=0)
+    ImageDraw.Draw(img).rectangle([40, 200, 250, 230], fill=0)
+    first, copy = tmp_path / "a.png", tmp_path / "b.jpg"
+    img.save(first)
+    img.resize((500, 333)).save(copy, quality=80)
+
+    q1 = db_session.add_question("Soru", str(first))
+    q2 = db_session.add_question("Soru (2. baskı)", str(copy))
+    assert db_session.find_duplicate_questions(str(copy))[0][1] == q1
+
+    assert db_session.add_question("Soru", str(copy), skip_duplicates=True) == q1
+    assert len(db_session.get_all_questions()) == 2
+
+    db_session.delete_question(q1)
+    assert [q for _, q in db_session.find_duplicate_questions(str(first))] == [q2]
+
+def test_similar_question_text(db_session):
+    """OCR variants of a stored question are found through the LSH index."""
+    text = ("Bir çiftçi tarlasının üçte birine buğday, kalanın yarısına arpa ekmiştir. "
+            "Geriye kalan 40 dönüme mısır ektiğine göre tarlanın tamamı kaç dönümdür?")
+    variant = text.upper().replace("Ç", "C").replace("Ü", "U")
+
+    q1 = db_session.add_question(text, "p1")
+    db_session.add_question("Tamamen farklı ve yeterince uzun bir soru metni burada yer alıyor.", "p2")
+
+    assert [q for _, q in db_session.find_similar_questions(variant)] == [q1]
+
+    # Text alone only flags the duplicate; the crops may show different figures
+    q3 = db_session.add_question(variant, "p3", skip_duplicates=True)
+    assert q3 != q1
+    conn = db_session._get_connection()
+    assert conn.execute("SELECT duplicate_of FROM questions WHERE id = ?", (q3,)).fetchone() == (q1,)
+    conn.close()
+
+    db_session.delete_question(q1)
+    assert [q for _, q in db_session.find_similar_questions(variant)] == [q3]
+
+def test_skipped_duplicate_removes_its_crop(db_session, tmp_path):
+    """A skipped crop is deleted unless another question still uses the file."""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("L", (600, 400), 255)
+    ImageDraw.Draw(img).rectangle([40, 40, 400, 80], fill=0)
+    ImageDraw.Draw(img).ellipse([300, 150, 500, 350], fill=0)
+    first, again = tmp_path / "a.png", tmp_path / "b.png"
+    img.save(first)
+    img.save(again)
+    text = ("Bir çiftçi tarlasının üçte birine buğday, kalanın yarısına arpa ekmiştir. "
+            "Geriye kalan 40 dönüme mısır ektiğine göre tarlanın tamamı kaç dönümdür?")
+
+    q1 = db_session.add_question(text, str(first))
+    assert db_session.add_question(text, str(again), skip_duplicates=True) == q1
+    assert not again.exists()
+
+    # Same crop file as the stored question: it must survive
+    assert db_session.add_question(text, str(first), skip_duplicates=True) == q1
+    assert first.exists()
+
+    # Same image, different question text: kept and flagged
+    img.save(again)
+    other = "Tamamen farklı ve yeterince uzun bir soru metni burada yer alıyor, şıklarıyla birlikte."
+    q2 = db_session.add_question(other, str(again), skip_duplicates=True)
+    assert q2 != q1
+    assert again.exists()
+    assert len(db_session.get_all_questions()) == 2
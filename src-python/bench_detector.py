@@ -0,0 +1,137 @@
+"""Export the YOLO detector to ONNX and benchmark it against the torch path.
+
+    python bench_detector.py export [--int8]
+    python bench_detector.py bench book.pdf [--pages 20] [--onnx models/best.int8.onnx]
+
+The benchmark renders the pages once, runs both backends on the same
+in-memory images and prints a JSON report: pages/s for each backend plus
+how closely the ONNX boxes match the torch boxes (IoU >= 0.5 matching).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from pdf2image import convert_from_path
+
+from onnx_detector import OnnxQuestionDetector, export_onnx
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PT_PATH = os.path.join(SCRIPT_DIR, "models", "best.pt")
+ONNX_PATH = os.path.join(SCRIPT_DIR, "models", "best.onnx")
+
+
+def box_iou(a, b):
+    """Pairwise IoU between two (N, 4) and (M, 4) xyxy arrays."""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_boxes(reference, candidate, threshold=0.5):
+    """Greedy one-to-one matching; returns (matches, ious of matches)."""
+    if not reference or not candidate:
+        return 0, []
+    iou = box_iou(reference, candidate)
+    matched = []
+    while iou.size and iou.max() >= threshold:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        matched.append(float(iou[i, j]))
+        iou[i, :] = -1
+        iou[:, j] = -1
+    return len(matched), matched
+
+
+def time_backend(detect, pages, batch):
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(pages), batch):
+        results.extend(detect(pages[i:i + batch]))
+    elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def run_bench(pdf_path, max_pages, onnx_path, batch, dpi):
+    from ultralytics import YOLO
+
+    pages = convert_from_path(pdf_path, dpi=dpi, first_page=1, last_page=max_pages)
+
+    torch_model = YOLO(PT_PATH)
+
+    def torch_detect(images):
+        out = []
+        for result in torch_model(list(images), iou=0.5, conf=0.4,
+                                  agnostic_nms=True, verbose=False):
+            out.append(result.boxes.xyxy.cpu().numpy().tolist())
+        return out
+
+    onnx_model = OnnxQuestionDetector(onnx_path)
+
+    # Warm-up so model loading / graph optimization is not timed
+    torch_detect(pages[:1])
+    onnx_model.detect(pages[:1])
+
+    torch_boxes, torch_time = time_backend(torch_detect, pages, batch)
+    onnx_boxes, onnx_time = time_backend(onnx_model.detect, pages, batch)
+
+    ref_total = sum(len(b) for b in torch_boxes)
+    cand_total = sum(len(b) for b in onnx_boxes)
+    matched, ious = 0, []
+    for ref, cand in zip(torch_boxes, onnx_boxes):
+        m, page_ious = match_boxes(ref, cand)
+        matched += m
+        ious.extend(page_ious)
+
+    return {
+        "pages": len(pages),
+        "dpi": dpi,
+        "batch": batch,
+        "onnx_model": os.path.basename(onnx_path),
+        "torch_pages_per_sec": round(len(pages) / torch_time, 2),
+        "onnx_pages_per_sec": round(len(pages) / onnx_time, 2),
+        "speedup": round(torch_time / onnx_time, 2),
+        "torch_boxes": ref_total,
+        "onnx_boxes": cand_total,
+        "recall_vs_torch": round(matched / ref_total, 4) if ref_total else None,
+        "precision_vs_torch": round(matched / cand_total, 4) if cand_total else None,
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YOLO ONNX export & benchmark")
+    subparsers = parser.add_subparsers(dest="command")
+
+    parser_export = subparsers.add_parser("export")
+    parser_export.add_argument("--int8", action="store_true",
+                               help="Also write an INT8-quantized copy")
+
+    parser_bench = subparsers.add_parser("bench")
+    parser_bench.add_argument("pdf_path")
+    parser_bench.add_argument("--pages", type=int, default=20)
+    parser_bench.add_argument("--onnx", default=ONNX_PATH)
+    parser_bench.add_argument("--batch", type=int, default=4)
+    parser_bench.add_argument("--dpi", type=int, default=300)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        path = export_onnx(PT_PATH, ONNX_PATH, int8=args.int8)
+        print(json.dumps({"status": "success", "path": path}))
+    elif args.command == "bench":
+        report = run_bench(args.pdf_path, args.pages, args.onnx, args.batch, args.dpi)
+        print(json.dumps(report, indent=2))
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""One-pass cleanup of the question boxes a detector returns for a page.
+
+Model output is noisy: the same question boxed twice, inverted corners,
+coordinates past the page edge, slivers, a figure boxed separately inside
+its question, or one box around the whole page. clean_boxes() fixes all of
+that on the page's (N, 4) array with NumPy broadcasting, so every engine
+crops exactly one box per question.
+
+Test_Olusturucu/src/core/boxes.py is a copy for the desktop app, which is
+packaged on its own; its test_engine_parity.py checks the two agree.
+"""
+import numpy as np
+
+# Boxes overlapping at least this much are the same question
+MERGE_IOU = 0.5
+# A box with this fraction of its area inside another box is nested in it
+CONTAIN_RATIO = 0.85
+# Minimum box side, as a fraction of the page side
+MIN_SIDE = 0.01
+# A box containing several boxes is dropped in their favor when they cover
+# this fraction of it, or when it covers this fraction of the page
+WRAPPER_COVER = 0.6
+WRAPPER_PAGE = 0.9
+
+
+def clean_boxes(boxes, width, height, iou_threshold=MERGE_IOU,
+                contain_ratio=CONTAIN_RATIO, min_side=MIN_SIDE,
+                wrapper_cover=WRAPPER_COVER, wrapper_page=WRAPPER_PAGE):
+    """Normalize, clamp, filter and merge xyxy boxes on a width x height page.
+
+    Returns (merged, keep): merged is an (M, 4) float array and keep[i] is
+    the index of the input box merged[i] stands for (the first box of its
+    group), so callers can carry over per-box metadata. Output follows input
+    order. Rows with NaN/inf are dropped.
+
+    Duplicates (IoU >= iou_threshold) and fragments nested inside a box are
+    merged into their union. A box that contains several other boxes is
+    dropped in favor of them when they cover most of it (wrapper_cover) or
+    it covers most of the page (wrapper_page).
+    """
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    index = np.arange(len(b))
+
+    valid = np.isfinite(b).all(axis=1)
+    b, index = b[valid], index[valid]
+
+    # Inverted corners, then clamp to the page
+    b = np.concatenate([np.minimum(b[:, :2], b[:, 2:]),
+                        np.maximum(b[:, :2], b[:, 2:])], axis=1)
+    limits = np.array([width, height, width, height], dtype=np.float64)
+    b = np.clip(b, 0, limits)
+
+    size = b[:, 2:] - b[:, :2]
+    valid = (size >= min_side * limits[:2]).all(axis=1)
+    b, index = b[valid], index[valid]
+    if len(b) < 2:
+        return b, index
+
+    lt = np.maximum(b[:, None, :2], b[None, :, :2])
+    rb = np.minimum(b[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    iou = inter / (area[:, None] + area[None, :] - inter)
+
+    # inside[i, j]: box j lies (mostly) inside box i
+    inside = inter / area[None, :] >= contain_ratio
+    np.fill_diagonal(inside, False)
+    children = inside.sum(axis=1)
+
+    # A box holding several others is a wrapper only when they fill most of
+    # it (several questions boxed together) or it spans the page; a question
+    # with two separately boxed figures keeps its text and absorbs them
+    covered = np.where(inside, inter, 0).sum(axis=1) / area
+    page_sized = area >= wrapper_page * width * height
+    wrapper = (children >= 2) & ((covered >= wrapper_cover) | page_sized)
+    linked = (iou >= iou_threshold) | (inside & ~wrapper[:, None])
+    linked |= linked.T
+    linked[wrapper, :] = False
+    linked[:, wrapper] = False
+    np.fill_diagonal(linked, True)
+
+    # Connected components: every box takes the lowest index it reaches
+    labels = np.arange(len(b))
+    while True:
+        reached = np.where(linked, labels[None, :], len(b)).min(axis=1)
+        if (reached == labels).all():
+            break
+        labels = reached
+
+    labels, b = labels[~wrapper], b[~wrapper]
+    groups = np.unique(labels)
+    slot = np.searchsorted(groups, labels)
+    merged = np.concatenate([np.full((len(groups), 2), np.inf),
+                             np.full((len(groups), 2), -np.inf)], axis=1)
+    np.minimum.at(merged[:, :2], slot, b[:, :2])
+    np.maximum.at(merged[:, 2:], slot, b[:, 2:])
+    return merged, index[groups]
@@ -9,6 +9,11 @@ SCRIPT_NAME = "engine.py"
 APP_NAME = "engine"
 TAURI_BIN_DIR = "../src-tauri/binaries"
 
+# `python build_engine.py --onnx` builds a slim sidecar that runs the YOLO
+# detector through ONNX Runtime instead of bundling ultralytics + torch
+ONNX_ONLY = "--onnx" in sys.argv
+ONNX_MODELS = ["models/best.onnx", "models/best.int8.onnx"]
+
 def clean():
     if os.path.exists("build"):
         shutil.rmtree("build")
@@ -46,6 +51,8 @@ def build():
     # --name: Executable name
     # --hidden-import: Explicitly include hidden modules
     
+    sep = ";" if platform.system().lower() == "windows" else ":"
+
     cmd = [
         sys.executable, "-m", "PyInstaller",
         "--clean",
@@ -56,14 +63,25 @@ def build():
         "--hidden-import", "pypdf",
         "--hidden-import", "pdf2image",
         "--hidden-import", "PIL", # Pillow
-        "--hidden-import", "ultralytics",
-        "--add-data", f"models/best.pt{';' if platform.system().lower() == 'windows' else ':'}models",
-        SCRIPT_NAME
     ]
 
+    if ONNX_ONLY:
+        # ONNX Runtime detector: ship the exported model, leave torch out
+        onnx_models = [m for m in ONNX_MODELS if os.path.exists(m)]
+        if not onnx_models:
+            raise Exception("No ONNX model found. Run: python bench_detector.py export --int8")
+        cmd.extend(["--hidden-import", "onnxruntime", "--hidden-import", "onnx_detector"])
+        cmd.extend(["--exclude-module", "torch", "--exclude-module", "ultralytics"])
+        for m in onnx_models:
+            cmd.extend(["--add-data", f"{m}{sep}models"])
+    else:
+        cmd.extend(["--hidden-import", "ultralytics"])
+        cmd.extend(["--add-data", f"models/best.pt{sep}models"])
+
+    cmd.append(SCRIPT_NAME)
+
     # Include .env if exists
     if os.path.exists(".env"):
-        sep = ";" if platform.system().lower() == "windows" else ":"
         cmd.extend(["--add-data", f".env{sep}."])
         print("Including .env in binary.")
     else:
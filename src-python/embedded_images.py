@@ -0,0 +1,149 @@
+"""Pull the scan out of single-image PDF pages instead of rasterizing them.
+
+Scanned exam books are usually one full-page JPEG or CCITT image per page.
+For those pages the embedded image *is* the page: rendering it through
+poppler at 300 dpi only burns CPU and, for JPEGs, adds a second lossy
+encode. extract_page_image() returns that image directly, or None when the
+page has anything else on it (vector text, drawings, several images, a
+rotated or partial placement...) so the caller renders it as usual.
+
+Test_Olusturucu/src/core/embedded_images.py is the desktop app's copy; it
+returns (jpeg_bytes, image) pairs instead of a PIL image. A parity test
+there checks both accept the same pages and yield the same content.
+"""
+from io import BytesIO
+
+# Visible content besides the image makes the page "mixed"; these operators
+# only set up state, clip or draw the single image
+STATE_OPS = {b"q", b"Q", b"cm", b"gs", b"Do", b"re", b"W", b"W*", b"n"}
+TEXT_STATE_OPS = {b"BT", b"ET", b"Tf", b"Td", b"TD", b"Tm", b"T*", b"Tc",
+                  b"Tw", b"Tz", b"TL", b"Ts", b"Tr"}
+TEXT_SHOW_OPS = {b"Tj", b"TJ", b"'", b'"'}
+# Invisible text (OCR layer of searchable scans) does not change the pixels
+INVISIBLE_TEXT_MODE = 3
+
+# How far the image may fall short of the page edges (fraction of the size)
+COVER_TOLERANCE = 0.02
+
+JPEG_COLOR_SPACES = {"/DeviceRGB", "/DeviceGray"}
+
+
+def _multiply(m, n):
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a * a2 + b * c2, a * b2 + b * d2,
+            c * a2 + d * c2, c * b2 + d * d2,
+            e * a2 + f * c2 + e2, e * b2 + f * d2 + f2)
+
+
+def _image_placement(page, image_name):
+    """Return the CTM the image is drawn with, or None if the page is mixed."""
+    contents = page.get_contents()
+    if contents is None:
+        return None
+
+    ctm = (1, 0, 0, 1, 0, 0)
+    stack = []
+    text_mode = 0
+    placement = None
+
+    for operands, operator in contents.operations:
+        if operator == b"q":
+            stack.append(ctm)
+        elif operator == b"Q":
+            ctm = stack.pop() if stack else (1, 0, 0, 1, 0, 0)
+        elif operator == b"cm":
+            ctm = _multiply(tuple(float(v) for v in operands), ctm)
+        elif operator == b"Do":
+            if operands[0] != image_name or placement is not None:
+                return None
+            placement = ctm
+        elif operator == b"Tr":
+            text_mode = int(operands[0])
+        elif operator in TEXT_SHOW_OPS:
+            if text_mode != INVISIBLE_TEXT_MODE:
+                return None
+        elif operator not in STATE_OPS and operator not in TEXT_STATE_OPS:
+            return None
+
+    return placement
+
+
+def _covers_page(ctm, page):
+    a, b, c, d, e, f = ctm
+    if abs(b) > 1e-6 or abs(c) > 1e-6 or a <= 0 or d <= 0:
+        return False
+
+    box = page.mediabox
+    left, bottom = float(box.left), float(box.bottom)
+    width, height = float(box.width), float(box.height)
+    tol_x, tol_y = width * COVER_TOLERANCE, height * COVER_TOLERANCE
+    return (abs(e - left) <= tol_x and abs(f - bottom) <= tol_y and
+            abs(e + a - (left + width)) <= tol_x and
+            abs(f + d - (bottom + height)) <= tol_y)
+
+
+def _jpeg_passthrough(xobj):
+    """Raw JPEG bytes when the stream can be used as-is, else None."""
+    # Lossless wrappers (ASCII85, Flate...) before DCT are undone by get_data()
+    filters = xobj.get("/Filter")
+    if isinstance(filters, list):
+        filters = filters[-1] if filters else None
+    if filters != "/DCTDecode" or "/Decode" in xobj:
+        return None
+
+    color_space = xobj.get("/ColorSpace")
+    if isinstance(color_space, list):
+        # [/ICCBased stream]: fine as long as it is gray or RGB
+        if color_space[0] != "/ICCBased":
+            return None
+        if color_space[1].get_object().get("/N") not in (1, 3):
+            return None
+    elif color_space not in JPEG_COLOR_SPACES:
+        return None
+
+    data = xobj.get_data()
+    return data if data[:2] == b"\xff\xd8" else None
+
+
+def extract_page_image(page):
+    """Return the page's only image as a PIL image, or None to rasterize.
+
+    JPEG streams are handed to Pillow untouched (decoded lazily) and the
+    original bytes are kept in img.info["jpeg_passthrough"] so they can be
+    forwarded without re-encoding. Other encodings (CCITT, Flate...) are
+    decoded by pypdf.
+    """
+    from PIL import Image as PILImage
+
+    if page.rotation % 360:
+        return None
+
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    if not xobjects:
+        return None
+    xobjects = xobjects.get_object()
+    if len(xobjects) != 1:
+        return None
+
+    name, ref = next(iter(xobjects.items()))
+    xobj = ref.get_object()
+    if (xobj.get("/Subtype") != "/Image" or xobj.get("/ImageMask") or
+            "/SMask" in xobj):
+        return None
+
+    ctm = _image_placement(page, name)
+    if ctm is None or not _covers_page(ctm, page):
+        return None
+
+    data = _jpeg_passthrough(xobj)
+    if data is not None:
+        img = PILImage.open(BytesIO(data))
+        img.info["jpeg_passthrough"] = data
+        return img
+
+    img = page.images[0].image
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("L" if img.mode in ("1", "L", "LA") else "RGB")
+    return img
@@ -1,15 +1,31 @@
+import time
+_START_TIME = time.perf_counter()
+_MAIN_START_TIME = _START_TIME
+
 import os
 from io import BytesIO
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from dotenv import load_dotenv
-from pdf2image import convert_from_path
-import google.generativeai as genai
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait as wait_futures
 import argparse
 import base64
+import contextlib
+import contextvars
+import hashlib
 import json
+import math
+import random
+import re
+import subprocess
 import sys
+import threading
+
+# Heavy dependencies (google.generativeai, reportlab, pdf2image, dotenv,
+# pypdf, ultralytics...) are imported by the subcommands that need them,
+# so e.g. `export` never loads the Gemini SDK. Check with --startup-report.
+from embedded_images import extract_page_image
+from text_layer import detect_questions_from_text
 print("DEBUG: Engine script started...", file=sys.stderr)
 sys.stderr.flush()
 
@@ -28,28 +44,248 @@ else:
     script_dir = os.path.dirname(os.path.abspath(__file__))
     model_path = os.path.join(script_dir, "models", "best.pt")
 
+# Exported detector for the ONNX Runtime backend (quantized copy preferred)
+onnx_model_paths = [
+    os.path.join(script_dir, "models", "best.int8.onnx"),
+    os.path.join(script_dir, "models", "best.onnx"),
+]
+
 env_path = os.path.join(script_dir, '.env')
-load_dotenv(env_path)
 
-# Fallback: Check local dir if not found in bundle (dev mode priority)
-if not os.getenv("GEMINI_API_KEY"):
-    local_env = os.path.join(
-        os.path.dirname(
-            os.path.abspath(__file__)),
-        '.env')
-    load_dotenv(local_env)
+# Resolved on first use by get_api_key()
+api_key = None
+_env_loaded = False
+
+
+def get_api_key():
+    """GEMINI_API_KEY from the environment, else from the bundled .env file."""
+    global api_key, _env_loaded
+    if api_key is None and not _env_loaded:
+        _env_loaded = True
+        if not os.getenv("GEMINI_API_KEY"):
+            from dotenv import load_dotenv
+            load_dotenv(env_path)
+
+            # Fallback: Check local dir if not found in bundle (dev mode priority)
+            if not os.getenv("GEMINI_API_KEY"):
+                local_env = os.path.join(
+                    os.path.dirname(
+                        os.path.abspath(__file__)),
+                    '.env')
+                load_dotenv(local_env)
+        api_key = os.getenv("GEMINI_API_KEY")
+    return api_key
+
+
+class _LazyGenAI:
+    """google.generativeai, imported and configured on first attribute access."""
+
+    _module = None
+
+    def __getattr__(self, name):
+        module = _LazyGenAI._module
+        if module is None:
+            import google.generativeai as module
+            key = get_api_key()
+            if key:
+                module.configure(api_key=key)
+            _LazyGenAI._module = module
+        return getattr(module, name)
+
+
+genai = _LazyGenAI()
+
+
+def convert_from_path(*args, **kwargs):
+    from pdf2image import convert_from_path as _convert_from_path
+    return _convert_from_path(*args, **kwargs)
+
 
-api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
+_gemini_model = None
+_gemini_lock = threading.Lock()
+
+
+def configure_api_key(key):
+    """Switch the API key at runtime (engine serve); drops the cached model."""
+    global api_key, _gemini_model
+    with _gemini_lock:
+        if key and key != get_api_key():
+            genai.configure(api_key=key)
+            api_key = key
+            _gemini_model = None
+
+
+def get_gemini_model():
+    """One GenerativeModel per process, reused by every command."""
+    global _gemini_model
+    with _gemini_lock:
+        if _gemini_model is None:
+            try:
+                _gemini_model = genai.GenerativeModel('gemini-2.5-pro')
+            except BaseException:
+                _gemini_model = genai.GenerativeModel('gemini-1.5-pro')
+        return _gemini_model
 
 # --- GLOBAL PATH SETUPFor Windows/Linux ---
 if sys.platform == "win32":
     APP_DATA_DIR = os.path.join(os.getenv("LOCALAPPDATA"), "DoclingStitch")
 else:
     APP_DATA_DIR = os.path.join(os.path.expanduser("~"), "DoclingStitch")
+# Subdirectories are created by the code that writes into them
+
 
-os.makedirs(APP_DATA_DIR, exist_ok=True)
+PAGE_PROMPT = """
+                Görevin: Bu sayfadaki test sorularını ayrıştırmak.
+
+                KURALLAR:
+                1. Her soruyu (soru numarası, metni, şıkları ve varsa görseli) içine alan BİR DİKDÖRTGEN (Bounding Box) belirle.
+                2. Soru numarasını (Örn: "1.", "24.") mutlaka yakala.
+                3. Sorunun zorluk seviyesini (1-5 arası) ve konusunu tahmin et.
+
+            ÇIKTI FORMATI (JSON):
+            {
+              "questions": [
+                {
+                  "number": 1,
+                  "text_snippet": "Metin...",
+                  "bbox": [ymin, xmin, ymax, xmax],
+                  "difficulty": 3,
+                  "topic": "Konu Başlığı"
+                }
+              ]
+            }
+            NOT: bbox koordinatları 0 ile 1000 arasında normalize edilmiş olmalıdır.
+            """
+
+# Response schemas for the structured-output mode (see model_json.py);
+# they mirror the formats the prompts describe
+PAGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "number": {"type": "integer"},
+                    "text_snippet": {"type": "string"},
+                    "bbox": {"type": "array", "items": {"type": "number"}},
+                    "difficulty": {"type": "integer"},
+                    "topic": {"type": "string"},
+                },
+                "required": ["bbox"],
+            },
+        },
+    },
+    "required": ["questions"],
+}
+
+# Number of pages rasterized per pdftoppm call in streaming mode.
+# Peak memory is bounded by this window instead of the page count.
+PAGE_WINDOW = 4
+
+# Pages per batched YOLO inference
+YOLO_BATCH = 4
+
+# Hybrid engine: crops classified per model request, and their longest side
+HYBRID_BATCH = 24
+HYBRID_CROP_SIDE = 1280
+
+HYBRID_PROMPT = """
+                Görevin: Aşağıda numaralandırılmış test sorusu görsellerini sınıflandırmak.
+                Her görsel tek bir sorudur; soruları yeniden kesmene gerek yok.
+
+                Her soru için:
+                1. Soru metnini (şıklar hariç) çıkar.
+                2. Sorunun zorluk seviyesini (1-5 arası) tahmin et.
+                3. Konusunu belirle.
+
+            ÇIKTI FORMATI (JSON):
+            {
+              "questions": [
+                {
+                  "index": 1,
+                  "text": "Metin...",
+                  "difficulty": 3,
+                  "topic": "Konu Başlığı"
+                }
+              ]
+            }
+            NOT: "index" değeri görselin üzerindeki "Soru N" etiketindeki N olmalıdır.
+            """
+
+HYBRID_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "index": {"type": "integer"},
+                    "text": {"type": "string"},
+                    "difficulty": {"type": "integer"},
+                    "topic": {"type": "string"},
+                },
+                "required": ["index"],
+            },
+        },
+    },
+    "required": ["questions"],
+}
+
+# Output resolution of stored question crops
+PRINT_DPI = 300
+
+# Crops are encoded once, to disk; progress events only carry a small
+# preview, the full image is referenced through "image_path"
+THUMB_MAX_SIDE = 384
+THUMB_QUALITY = 75
+
+# White margin (pixels at PRINT_DPI) kept around the ink of each crop;
+# None keeps the crops exactly as detected
+TRIM_MARGIN = 16
+
+# Target quality (1-100) of the lossy formats crops are stored in; text-only
+# crops are stored as lossless 1-bit PNGs (see storage_encoder.py)
+IMAGE_QUALITY = 80
+
+# Question ids are "q_" + this many hex digits of the crop's SHA-256
+QUESTION_ID_CHARS = 20
+
+# Gemini pages analyzed in parallel (model round trips overlap)
+DEFAULT_CONCURRENCY = 4
+
+
+# Model request budget shared by every API call in the process
+DEFAULT_RPM = 60
+MAX_RETRIES = 5
+
+# Images are sent inline with the request unless the request would exceed
+# this size, in which case they go through the File API instead
+DEFAULT_TRANSPORT = "inline"
+INLINE_MAX_BYTES = 18 * 1024 * 1024
+INLINE_MAX_SIDE = 2048
+INLINE_QUALITY = 85
+
+# On-disk response cache size cap (least recently used entries go first)
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Finished analysis jobs (checkpoints) are pruned after this many days
+JOB_RETENTION_DAYS = 7
+
+# Scratch directories left behind by killed processes are removed after this
+WORKSPACE_MAX_AGE_SECONDS = 24 * 3600
+
+# How often blocked waits look at the cancel flag, and how long a cancelled
+# job waits for model calls already on the wire (so uploads get deleted)
+CANCEL_POLL_SECONDS = 0.2
+CANCEL_GRACE_SECONDS = 5.0
+# engine serve: how long SIGTERM waits for the cancelled requests, which
+# first give their own model calls up to CANCEL_GRACE_SECONDS
+SERVE_STOP_SECONDS = CANCEL_GRACE_SECONDS + 1.0
+# Exit status of a CLI run that was cancelled
+CANCEL_EXIT_CODE = 130
 
 
 def log_debug(msg):
@@ -57,108 +293,968 @@ def log_debug(msg):
     pass
 
 
-def analyze_page_with_yolo(image_path, page_num, global_counter):
+_stdout_lock = threading.Lock()
+
+# Per-request event sink installed by `engine serve`; None means plain stdout
+_event_sink = contextvars.ContextVar("event_sink", default=None)
+
+
+def write_stdout(message):
+    # Worker threads emit too; keep every NDJSON line atomic
+    with _stdout_lock:
+        print(json.dumps(message))
+        sys.stdout.flush()
+
+
+def emit_event(event):
+    sink = _event_sink.get()
+    if sink is not None:
+        sink(event)
+    else:
+        write_stdout(event)
+
+
+def emit_stderr_event(event):
+    # For commands whose stdout must stay a single JSON document
+    sink = _event_sink.get()
+    if sink is not None:
+        sink(event)
+        return
+    print(json.dumps(event), file=sys.stderr)
+    sys.stderr.flush()
+
+
+def atomic_tmp_path(path):
+    """Sibling temp file for write-then-os.replace, unique across processes."""
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+def submit_in_context(executor, fn, *args):
+    """executor.submit() that keeps the caller's event sink (engine serve)."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+# --- CANCELLATION ---
+
+
+class AnalysisCancelled(BaseException):
+    """Raised inside a cancelled job.
+
+    Derives from BaseException (like asyncio.CancelledError) so the
+    per-page `except Exception` handlers let it through.
+    """
+
+
+class CancelToken:
+    """Cancel flag of one job, shared by its worker threads via _cancel_token."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancel"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def check(self):
+        if self._event.is_set():
+            raise AnalysisCancelled(self.reason)
+
+    def sleep(self, seconds):
+        if self._event.wait(max(0.0, seconds)):
+            raise AnalysisCancelled(self.reason)
+
+
+# Token of the job running in this context; None means not cancellable
+_cancel_token = contextvars.ContextVar("cancel_token", default=None)
+
+
+def check_cancelled():
+    token = _cancel_token.get()
+    if token is not None:
+        token.check()
+
+
+def cancellable_sleep(seconds):
+    token = _cancel_token.get()
+    if token is None:
+        time.sleep(seconds)
+    else:
+        token.sleep(seconds)
+
+
+def wait_result(future):
+    """future.result(), giving up with AnalysisCancelled once the job is cancelled."""
+    while True:
+        check_cancelled()
+        try:
+            return future.result(timeout=CANCEL_POLL_SECONDS)
+        except FutureTimeoutError:
+            continue
+
+
+def watch_for_cancel(token, stream):
+    """Cancel `token` on SIGTERM or a {"cmd": "cancel"} line on `stream`."""
+    import signal
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: token.cancel("SIGTERM"))
+
+    def read_commands():
+        for line in stream:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("cmd") == "cancel":
+                token.cancel("cancel")
+                return
+
+    threading.Thread(target=read_commands, daemon=True).start()
+
+
+def exit_cancelled():
+    """Exit now instead of joining worker threads stuck in a model call."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(CANCEL_EXIT_CODE)
+
+
+# --- REQUEST SCHEDULER ---
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+RETRYABLE_ERRORS = (
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "InternalServerError", "DeadlineExceeded", "GatewayTimeout")
+
+
+def _is_retryable(exc):
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS:
+        return True
+    return type(exc).__name__ in RETRYABLE_ERRORS
+
+
+def _retry_after_seconds(exc):
+    """Server supplied wait hint: Retry-After header, RetryInfo or message text.
+
+    None when there is no usable hint; negative or non-finite values are
+    not usable.
+    """
+    delay = _raw_retry_after(exc)
+    if delay is None or not math.isfinite(delay) or delay < 0:
+        return None
+    return delay
+
+
+def _raw_retry_after(exc):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        try:
+            value = headers.get("Retry-After")
+            if value is not None:
+                return float(value)
+        except (TypeError, ValueError):
+            pass
+
+    for detail in getattr(exc, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+
+    message = str(exc)
+    match = (re.search(r"retry in ([\d.]+)\s*s", message, re.IGNORECASE) or
+             re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", message))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class RequestScheduler:
+    """Token-bucket rate limiter with jittered exponential backoff.
+
+    Every model call in the process goes through one instance so concurrent
+    pages share the request budget instead of racing into 429s.
+
+    The desktop app has its own copy (Test_Olusturucu/src/core/
+    request_scheduler.py, printing instead of emitting events); a parity
+    test there compares the two.
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, burst=None, max_retries=MAX_RETRIES,
+                 base_delay=1.0, max_delay=60.0,
+                 sleep=cancellable_sleep, clock=time.monotonic):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._last_reported = 0
+        self.set_rate(rpm, burst)
+
+    def set_rate(self, rpm, burst=None):
+        with self._lock:
+            self._rate = max(rpm, 1) / 60.0
+            self._burst = float(burst or max(1, min(rpm, 10)))
+            self._tokens = self._burst
+            self._updated = self._clock()
+
+    @property
+    def queue_depth(self):
+        return self._waiting
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(
+                    self._burst,
+                    self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            self._sleep(wait)
+
+    def _update_depth(self, delta, label):
+        # Caller holds the lock; returns a queue event only when depth changed
+        self._waiting += delta
+        if self._waiting == self._last_reported:
+            return None
+        self._last_reported = self._waiting
+        return {"type": "queue", "depth": self._waiting, "label": label}
+
+    def call(self, fn, *args, label="", on_event=None, **kwargs):
+        with self._lock:
+            event = self._update_depth(1, label)
+        if on_event and event:
+            on_event(event)
+
+        try:
+            attempt = 0
+            while True:
+                self._acquire()
+                check_cancelled()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    if not _is_retryable(e) or attempt >= self.max_retries:
+                        raise
+
+                    delay = _retry_after_seconds(e)
+                    if delay is not None:
+                        # A hint is trusted only up to the backoff ceiling
+                        delay = min(delay, self.max_delay)
+                    else:
+                        # Full jitter keeps parallel workers from retrying in lockstep
+                        delay = random.uniform(
+                            0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                    attempt += 1
+
+                    if on_event:
+                        on_event({
+                            "type": "log",
+                            "message": f"{label}: API meşgul ({e.__class__.__name__}), "
+                                       f"{delay:.1f} sn sonra yeniden deneniyor "
+                                       f"({attempt}/{self.max_retries})"})
+                    self._sleep(delay)
+        finally:
+            with self._lock:
+                event = self._update_depth(-1, label)
+            if on_event and event:
+                on_event(event)
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler()
+    return _scheduler
+
+
+# --- IMAGE TRANSPORT ---
+
+
+class ImageParts:
+    """Builds the image parts of one model request.
+
+    Images are re-encoded as JPEG (longest side <= INLINE_MAX_SIDE) and sent
+    as inline byte parts, saving the upload_file round trip. Only when the
+    request would grow past INLINE_MAX_BYTES (or transport="file") are they
+    uploaded; those remote files are deleted again by cleanup().
+    """
+
+    def __init__(self, transport=DEFAULT_TRANSPORT, label="", on_event=None,
+                 max_side=INLINE_MAX_SIDE, quality=INLINE_QUALITY):
+        self.transport = transport
+        self.label = label
+        self.on_event = on_event
+        self.max_side = max_side
+        self.quality = quality
+        self.inline_bytes = 0
+        self.uploaded = []
+
+    def _encode(self, image):
+        from PIL import Image as PILImage
+
+        if isinstance(image, (str, os.PathLike)):
+            with PILImage.open(image) as img:
+                return self._encode(img.copy())
+
+        # Scanned page taken straight from the PDF: forward the original JPEG
+        passthrough = image.info.get("jpeg_passthrough")
+        if (passthrough and image.format == "JPEG" and
+                max(image.size) <= self.max_side):
+            return passthrough
+
+        img = image
+        if max(img.size) > self.max_side:
+            img = img.copy()
+            img.thumbnail((self.max_side, self.max_side))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        buffered = BytesIO()
+        img.save(buffered, format="JPEG", quality=self.quality)
+        return buffered.getvalue()
+
+    def add(self, image, display_name=None):
+        data = self._encode(image)
+
+        if (self.transport == "inline" and
+                self.inline_bytes + len(data) <= INLINE_MAX_BYTES):
+            self.inline_bytes += len(data)
+            return {"mime_type": "image/jpeg", "data": data}
+
+        uploaded = get_scheduler().call(
+            genai.upload_file, BytesIO(data), mime_type="image/jpeg",
+            display_name=display_name, label=self.label,
+            on_event=self.on_event)
+        self.uploaded.append(uploaded)
+        return uploaded
+
+    def cleanup(self):
+        for uploaded in self.uploaded:
+            try:
+                genai.delete_file(uploaded.name)
+            except Exception as e:
+                log_debug(f"File cleanup error: {e}")
+        self.uploaded = []
+
+
+# --- RESPONSE CACHE ---
+
+
+class ResponseCache:
+    """Content-addressed store of parsed model responses.
+
+    Keys hash the page pixels together with the prompt and model name, so a
+    page seen in any earlier import is answered without touching the API.
+    Entries are small JSON files; their mtime doubles as the LRU clock.
+
+    The desktop app has its own copy (Test_Olusturucu/src/core/
+    response_cache.py, keyed by image files); a parity test there compares
+    the two.
+    """
+
+    def __init__(self, cache_dir, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @staticmethod
+    def make_key(image, prompt, model_name):
+        h = hashlib.sha256()
+        if isinstance(image, (bytes, bytearray)):
+            h.update(image)
+        else:
+            h.update(f"{image.mode}:{image.size}".encode("utf-8"))
+            h.update(image.tobytes())
+        h.update(prompt.encode("utf-8"))
+        h.update(str(model_name).encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # Mark as recently used
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = atomic_tmp_path(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(e[1] for e in self._entries())
+            else:
+                self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Drop oldest entries until we are back under 90% of the cap
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "path": self.cache_dir,
+            "entries": len(entries),
+            "bytes": sum(e[1] for e in entries),
+            "max_bytes": self.max_bytes
+        }
+
+    def clear(self):
+        removed = 0
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+            self._total_bytes = 0
+        return removed
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            os.path.join(APP_DATA_DIR, "cache", "responses"))
+    return _response_cache
+
+
+# --- JOB WORKSPACES ---
+
+
+@contextlib.contextmanager
+def job_workspace(prefix="job-"):
+    """Private scratch directory for one job, removed when the job ends.
+
+    Concurrent jobs (serve mode, several sidecars) never share temp files.
+    """
+    import shutil
+    import tempfile
+
+    root = os.path.join(APP_DATA_DIR, "workspaces")
+    os.makedirs(root, exist_ok=True)
+    cutoff = time.time() - WORKSPACE_MAX_AGE_SECONDS
+    for name in os.listdir(root):
+        stale = os.path.join(root, name)
+        try:
+            if os.path.getmtime(stale) < cutoff:
+                shutil.rmtree(stale, ignore_errors=True)
+        except OSError:
+            pass
+
+    path = tempfile.mkdtemp(prefix=prefix, dir=root)
     try:
-        from ultralytics import YOLO
-    except ImportError:
-        log_debug("YOLO not installed")
-        return [], global_counter
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+# --- ANALYSIS JOBS ---
+
+# Job whose pages _emit_progress checkpoints (set by run_analysis)
+_current_job = contextvars.ContextVar("current_job", default=None)
+# Crop trim margin of the running analysis (see TRIM_MARGIN)
+_trim_margin = contextvars.ContextVar("trim_margin", default=TRIM_MARGIN)
+# Storage quality of the running analysis (see IMAGE_QUALITY)
+_image_quality = contextvars.ContextVar("image_quality", default=IMAGE_QUALITY)
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class AnalysisJob:
+    """Checkpoint directory of one analysis run: APP_DATA_DIR/jobs/<job_id>/.
+
+    job.json records the PDF (path + content hash), its page count and the
+    run_analysis options; pages/<n>.json holds the questions of every page
+    that has been emitted. `analyze --resume <job_id>` replays those pages
+    and only analyzes the rest.
+    """
+
+    def __init__(self, job_id, meta):
+        self.job_id = job_id
+        self.meta = meta
+        self.job_dir = self.path_for(job_id)
+
+    @staticmethod
+    def path_for(job_id):
+        return os.path.join(APP_DATA_DIR, "jobs", job_id)
+
+    @classmethod
+    def create(cls, pdf_path, total_pages, options):
+        cls.prune()
+        job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+        meta = {
+            "pdf_path": os.path.abspath(pdf_path),
+            "pdf_sha256": _file_sha256(pdf_path),
+            "total_pages": total_pages,
+            "options": options,
+            "status": "running",
+            "created": time.time(),
+        }
+        job = cls(job_id, meta)
+        os.makedirs(os.path.join(job.job_dir, "pages"), exist_ok=True)
+        job._write_json("job.json", meta)
+        return job
+
+    @classmethod
+    def load(cls, job_id):
+        """Raises ValueError when the job is unknown or its PDF changed."""
+        if not job_id or os.path.basename(job_id) != job_id:
+            raise ValueError(f"Geçersiz iş kimliği: {job_id}")
+        try:
+            with open(os.path.join(cls.path_for(job_id), "job.json"),
+                      "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise ValueError(f"İş bulunamadı: {job_id}")
+
+        pdf_path = meta["pdf_path"]
+        if not os.path.exists(pdf_path) or _file_sha256(pdf_path) != meta["pdf_sha256"]:
+            raise ValueError(f"PDF dosyası değişmiş veya bulunamadı: {pdf_path}")
+        return cls(job_id, meta)
+
+    @classmethod
+    def prune(cls, max_age_days=JOB_RETENTION_DAYS):
+        jobs_dir = os.path.join(APP_DATA_DIR, "jobs")
+        if not os.path.isdir(jobs_dir):
+            return
+        import shutil
+
+        cutoff = time.time() - max_age_days * 86400
+        for name in os.listdir(jobs_dir):
+            job_dir = os.path.join(jobs_dir, name)
+            try:
+                if os.path.getmtime(job_dir) < cutoff:
+                    shutil.rmtree(job_dir)
+            except OSError:
+                pass
+
+    def _write_json(self, name, value):
+        path = os.path.join(self.job_dir, name)
+        tmp_path = atomic_tmp_path(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def save_page(self, page_num, page_questions):
+        self._write_json(os.path.join("pages", f"{page_num:05d}.json"),
+                         {"page": page_num, "questions": page_questions})
+
+    def finished_pages(self):
+        """{page_num: questions} for every checkpointed page."""
+        finished = {}
+        pages_dir = os.path.join(self.job_dir, "pages")
+        for name in sorted(os.listdir(pages_dir)) if os.path.isdir(pages_dir) else []:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(pages_dir, name), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue  # Torn write: analyze the page again
+            finished[entry["page"]] = entry["questions"]
+        return finished
+
+    def mark_finished(self):
+        self.meta["status"] = "finished"
+        self._write_json("job.json", self.meta)
+
+
+def resume_analysis(job_id):
+    try:
+        job = AnalysisJob.load(job_id)
+    except ValueError as e:
+        emit_event({"type": "error", "message": str(e)})
+        return
+    return run_analysis(job.meta["pdf_path"], job=job, **job.meta["options"])
+
+
+def iter_pdf_pages(pdf_path, total_pages, dpi=300, window=PAGE_WINDOW,
+                   reader=None, skip=()):
+    """Yield (page_index, PIL image) while rendering at most `window` pages at a time.
+
+    With a pypdf `reader`, scanned pages that consist of a single full-page
+    image yield that embedded image directly; only the remaining pages are
+    rasterized. Page indexes in `skip` are neither rendered nor yielded.
+    The generator drops its own reference to each page as it is
+    yielded; the caller owns the image and should close() it once it has
+    been cropped.
+    """
+    if window is None or window < 1:
+        window = total_pages or 1
+
+    for first_page in range(1, total_pages + 1, window):
+        last_page = min(first_page + window - 1, total_pages)
+        wanted = [n for n in range(first_page, last_page + 1) if n - 1 not in skip]
+
+        pages = {}
+        if reader is not None:
+            for number in wanted:
+                check_cancelled()
+                img = _embedded_page_image(reader, number - 1)
+                if img is not None:
+                    pages[number] = img
+
+        # Render the rest in contiguous runs, one pdftoppm call per run
+        missing = [n for n in wanted if n not in pages]
+        while missing:
+            check_cancelled()
+            run_end = missing[0]
+            while run_end + 1 in missing:
+                run_end += 1
+            rendered = convert_from_path(
+                pdf_path, dpi=dpi, first_page=missing[0], last_page=run_end)
+            for number, img in zip(range(missing[0], run_end + 1), rendered):
+                pages[number] = img
+            missing = [n for n in missing if n > run_end]
+
+        for number in wanted:
+            if number in pages:
+                yield number - 1, pages.pop(number)
+
+
+def _embedded_page_image(reader, page_index):
+    try:
+        return extract_page_image(reader.pages[page_index])
+    except Exception as e:
+        log_debug(f"Embedded image error on page {page_index + 1}: {e}")
+        return None
+
+
+def render_pdf_region(pdf_path, page_number, box, dpi=PRINT_DPI):
+    """Render only `box` of one page using pdftoppm's crop-box options.
+
+    `box` is (left, top, right, bottom) in pixels at `dpi`; `page_number` is
+    1-based. Only the requested region is rasterized.
+    """
+    from PIL import Image as PILImage
+
+    left, top, right, bottom = [int(round(v)) for v in box]
+    left, top = max(0, left), max(0, top)
+    cmd = [
+        "pdftoppm",
+        "-f", str(page_number), "-l", str(page_number),
+        "-r", str(dpi),
+        "-x", str(left), "-y", str(top),
+        "-W", str(max(1, right - left)), "-H", str(max(1, bottom - top)),
+        pdf_path
+    ]
+    # No output root: pdftoppm writes a single PPM image to stdout
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    img = PILImage.open(BytesIO(result.stdout))
+    img.load()
+    return img
+
+
+_yolo_model = None
+_onnx_detector = None
+_detector_backend = None
+# Loading and inference are serialized: concurrent `engine serve` requests
+# share one detector instance
+_detector_lock = threading.RLock()
+
+
+def _find_onnx_model():
+    for path in onnx_model_paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def resolve_detector_backend(preferred="auto"):
+    """Pick "onnx" or "torch" for the YOLO engine; raises RuntimeError if unusable."""
+    onnx_ready = False
+    if preferred in ("auto", "onnx"):
+        try:
+            import onnxruntime  # noqa: F401
+            onnx_ready = _find_onnx_model() is not None
+        except ImportError:
+            onnx_ready = False
+
+    if onnx_ready:
+        return "onnx"
+    if preferred == "onnx":
+        raise RuntimeError(
+            "ONNX modeli veya onnxruntime bulunamadı (models/best.onnx).")
 
     try:
-        model = YOLO(model_path)
+        import ultralytics  # noqa: F401
+    except ImportError:
+        raise RuntimeError("YOLO (ultralytics) kütüphanesi yüklü değil.")
+    if not os.path.exists(model_path):
+        raise RuntimeError(f"Model dosyası bulunamadı: {model_path}")
+    return "torch"
+
+
+def load_question_detector(backend):
+    global _onnx_detector, _detector_backend
+    with _detector_lock:
+        if backend == "onnx":
+            if _onnx_detector is None:
+                from onnx_detector import OnnxQuestionDetector
+                _onnx_detector = OnnxQuestionDetector(_find_onnx_model())
+        else:
+            get_yolo_model()
+        _detector_backend = backend
+
+
+def get_yolo_model():
+    """Load the YOLO weights once per process."""
+    global _yolo_model
+    with _detector_lock:
+        if _yolo_model is None:
+            from ultralytics import YOLO
+            _yolo_model = YOLO(model_path)
+        return _yolo_model
+
+
+def detect_questions_yolo(page_images):
+    """Run one batched inference over in-memory pages.
+
+    Returns, for each page, a list of (x1, y1, x2, y2) pixel boxes.
+    """
+    with _detector_lock:
+        if _detector_backend == "onnx":
+            return _onnx_detector.detect(page_images)
+
+        model = get_yolo_model()
         # Reduce duplicates with lower IoU threshold and higher Confidence
-        results = model(image_path, iou=0.5, conf=0.4, agnostic_nms=True)
+        results = model(list(page_images), iou=0.5, conf=0.4,
+                        agnostic_nms=True, verbose=False)
+
+    detections = []
+    for result in results:
+        boxes = result.boxes
+        xyxy = boxes.xyxy.cpu().numpy()
+        conf = boxes.conf.cpu().numpy()
+        # Check confidence (optional threshold)
+        detections.append(
+            [tuple(float(v) for v in box) for box, c in zip(xyxy, conf)
+             if c >= 0.3])
+    return detections
+
+
+def question_image_path(digest, ext="jpg"):
+    """extracted_questions/ab/cd/<sha256>.<ext> for a crop's content hash."""
+    return os.path.abspath(os.path.join(
+        APP_DATA_DIR, "extracted_questions",
+        digest[:2], digest[2:4], f"{digest}.{ext}"))
+
+
+def encode_question_crop(question_img):
+    """Encode a crop without storing it; return (id, data, path, preview).
+
+    The crop is encoded once, as a 1-bit PNG, grayscale JPEG or WebP
+    depending on its content (storage_encoder.encode_crop, at the run's
+    image quality); its SHA-256 names the file in a two-level sharded tree
+    and gives the question id, so identical crops share one file and later
+    imports never overwrite earlier ones. The preview is a small data-URI
+    thumbnail for the progress event, or just the path when THUMB_MAX_SIDE
+    is 0. White margins are trimmed to the run's margin first.
+    """
+    from storage_encoder import encode_crop
+
+    margin = _trim_margin.get()
+    if margin is not None:
+        from trim import trim_to_ink
+
+        question_img = trim_to_ink(question_img, margin)
+    if question_img.mode not in ("RGB", "L"):
+        question_img = question_img.convert("RGB")
+    data, ext, _ = encode_crop(question_img, _image_quality.get())
+
+    digest = hashlib.sha256(data).hexdigest()
+    save_path = question_image_path(digest, ext)
+    question_id = f"q_{digest[:QUESTION_ID_CHARS]}"
+    if not THUMB_MAX_SIDE:
+        return question_id, data, save_path, save_path
+
+    thumb = question_img.copy()
+    thumb.thumbnail((THUMB_MAX_SIDE, THUMB_MAX_SIDE))
+    if thumb.mode not in ("RGB", "L"):
+        thumb = thumb.convert("RGB")
+    buffered = BytesIO()
+    thumb.save(buffered, format="JPEG", quality=THUMB_QUALITY)
+    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    return question_id, data, save_path, f"data:image/jpeg;base64,{img_str}"
+
+
+def write_question_crop(data, save_path):
+    """Store encoded crop bytes at their content-addressed path, once."""
+    if os.path.exists(save_path):
+        return
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    tmp_path = atomic_tmp_path(save_path)
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, save_path)
 
-        page_questions = []
 
-        # Load original image for cropping
-        from PIL import Image as PILImage
-        img = PILImage.open(image_path)
-        width, height = img.size
+def save_question_crop(question_img):
+    """Encode and store the crop; return (id, path, preview)."""
+    question_id, data, save_path, preview = encode_question_crop(question_img)
+    write_question_crop(data, save_path)
+    return question_id, save_path, preview
 
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                # box.xyxy[0] -> [x1, y1, x2, y2]
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
 
-                # Check confidence (optional threshold)
-                if box.conf[0] < 0.3:
-                    continue
+def crop_yolo_questions(page_image, page_num, boxes):
+    from boxes import clean_boxes
+
+    page_questions = []
+    boxes, _ = clean_boxes(boxes, *page_image.size)
+
+    for x1, y1, x2, y2 in boxes.tolist():
+        # Crop
+        question_img = page_image.crop((x1, y1, x2, y2))
+        question_id, save_path, preview = save_question_crop(question_img)
+
+        page_questions.append({
+            "id": question_id,
+            # No text extraction in YOLO mode
+            "text": "Görsel Soru (OCR Yok)",
+            "image": preview,
+            "image_path": str(save_path),
+            "page": page_num,
+            "bbox": [y1, x1, y2, x2],
+            "difficulty": 3,
+            "topic": "Genel"
+        })
+
+    return page_questions
 
-                # Crop
-                question_img = img.crop((x1, y1, x2, y2))
-
-                heading = f"q_{global_counter}"
-
-                save_dir = os.path.join(APP_DATA_DIR, "extracted_questions")
-                os.makedirs(save_dir, exist_ok=True)
-                save_path = os.path.abspath(
-                    os.path.join(save_dir, f"{heading}.jpg"))
-                question_img.save(save_path, "JPEG")
-
-                # Base64 Preview
-                buffered = BytesIO()
-                question_img.save(buffered, format="JPEG")
-                img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-                base64_data = f"data:image/jpeg;base64,{img_str}"
-
-                page_questions.append({
-                    "id": heading,
-                    # No text extraction in YOLO mode
-                    "text": "Görsel Soru (OCR Yok)",
-                    "image": base64_data,
-                    "image_path": str(save_path),
-                    "page": page_num,
-                    "bbox": [y1, x1, y2, x2],
-                    "difficulty": 3,
-                    "topic": "Genel"
-                })
-                global_counter += 1
-
-        return page_questions, global_counter
 
+def analyze_page_with_yolo(page_image, page_num):
+    """Single-page convenience wrapper; `page_image` may be a PIL image or a path."""
+    try:
+        from PIL import Image as PILImage
+        if isinstance(page_image, (str, os.PathLike)):
+            page_image = PILImage.open(page_image)
+        boxes = detect_questions_yolo([page_image])[0]
+        return crop_yolo_questions(page_image, page_num, boxes)
     except Exception as e:
         log_debug(f"YOLO Error: {e}")
-        return [], global_counter
-
+        return []
+
+
+def run_analysis(pdf_path, engine_type="gemini", page_window=PAGE_WINDOW,
+                 concurrency=DEFAULT_CONCURRENCY, use_cache=True,
+                 detect_dpi=None, transport=DEFAULT_TRANSPORT,
+                 yolo_batch=YOLO_BATCH, detector="auto",
+                 hybrid_batch=HYBRID_BATCH, text_layer=True, stream=True,
+                 trim_margin=TRIM_MARGIN, image_quality=IMAGE_QUALITY,
+                 job=None):
+    """Analyze a PDF, streaming start/progress/finish events.
+
+    With `stream` the Gemini engine reads each page's response as it is
+    generated and emits a provisional `question` event per question before
+    the page's `progress` event (see PageStream).
+
+    Every emitted page is checkpointed to an AnalysisJob; pass a loaded
+    `job` (see resume_analysis) to replay its finished pages and continue
+    with the rest. When the CancelToken in _cancel_token is set the run
+    stops rendering, drops queued model requests and ends with a
+    `cancelled` event; its checkpoints stay resumable.
+
+    The model request rate is a process setting shared by every run (see
+    get_scheduler().set_rate), not an option of one analysis.
+    """
+    options = {
+        "engine_type": engine_type, "page_window": page_window,
+        "concurrency": concurrency, "use_cache": use_cache,
+        "detect_dpi": detect_dpi, "transport": transport,
+        "yolo_batch": yolo_batch, "detector": detector,
+        "hybrid_batch": hybrid_batch, "text_layer": text_layer,
+        "stream": stream, "trim_margin": trim_margin,
+        "image_quality": image_quality,
+    }
 
-def run_analysis(pdf_path, engine_type="gemini"):
-    if engine_type == "gemini" and not api_key:
-        print(json.dumps({"type": "error", "message": "API Key missing"}))
-        sys.stdout.flush()
+    if engine_type in ("gemini", "hybrid") and not get_api_key():
+        emit_event({"type": "error", "message": "API Key missing"})
         return
 
     # YOLO CHECK
-    if engine_type == "yolo":
+    if engine_type in ("yolo", "hybrid"):
         try:
-            import ultralytics
-        except ImportError:
-            print(json.dumps(
-                {"type": "error", "message": "YOLO (ultralytics) kütüphanesi yüklü değil."}))
-            sys.stdout.flush()
+            backend = resolve_detector_backend(detector)
+        except RuntimeError as e:
+            emit_event({"type": "error", "message": str(e)})
             return
 
     try:
         model = None
-        if engine_type == "gemini":
-            try:
-                model = genai.GenerativeModel('gemini-2.5-pro')
-            except BaseException:
-                model = genai.GenerativeModel('gemini-1.5-pro')
-        elif engine_type == "yolo":
-            if not os.path.exists(model_path):
-                print(json.dumps(
-                    {"type": "error", "message": f"Model dosyası bulunamadı: {model_path}"}))
-                return
-            # Lazy load inside loop or here? Here is fine
-            # Actually, analyze_page_with_yolo loads it, but we can pass model
-            # path
-            pass
+        if engine_type in ("gemini", "hybrid"):
+            model = get_gemini_model()
+        if engine_type in ("yolo", "hybrid"):
+            load_question_detector(backend)
     except Exception as e:
-        print(json.dumps({"type": "error",
-                          "message": f"Model başlatma hatası: {e}"}))
-        sys.stdout.flush()
+        emit_event({"type": "error",
+                    "message": f"Model başlatma hatası: {e}"})
         return
 
     try:
@@ -167,153 +1263,599 @@ def run_analysis(pdf_path, engine_type="gemini"):
         reader = PdfReader(pdf_path)
         total_pages = len(reader.pages)
 
-        # Convert pages on demand or in batches would be better for memory,
-        # but for now let's convert all (pdf2image is fastish) or handle 1 by 1 if possible.
-        # To avoid heavy memory on huge PDFs, we should convert page by page if possible,
-        # but convert_from_path usually loads them. Let's stick to convert_from_path for simplicity
-        # but we will emit events.
-        # Create local temp dir in User Data folder to resolve "Access Denied"
-        # in Program Files
-        temp_dir = os.path.join(APP_DATA_DIR, "temp_images")
-
-        if os.path.exists(temp_dir):
-            import shutil
-            try:
-                shutil.rmtree(temp_dir)
-            except BaseException:
-                pass  # Ignore if locked
-        os.makedirs(temp_dir, exist_ok=True)
-
-        pages = convert_from_path(pdf_path, dpi=300)
+        if job is None:
+            job = AnalysisJob.create(pdf_path, total_pages, options)
+        finished = job.finished_pages()
+
+        # Two-resolution mode (Gemini): detect and upload on a low-dpi page,
+        # then re-render only the question regions at PRINT_DPI
+        if engine_type != "gemini":
+            detect_dpi = None
+        render_dpi = detect_dpi or PRINT_DPI
+
+        # Pages are rendered lazily, `page_window` at a time. Scanned pages
+        # come straight from the embedded image, except in two-resolution
+        # mode where page pixels must map to `detect_dpi`
+        pages = iter_pdf_pages(
+            pdf_path, total_pages, dpi=render_dpi, window=page_window,
+            reader=None if detect_dpi else reader, skip=finished)
     except Exception as e:
-        print(json.dumps({"type": "error",
-                          "message": f"PDF okuma hatası: {str(e)}"}))
-        sys.stdout.flush()
+        emit_event({"type": "error",
+                    "message": f"PDF okuma hatası: {str(e)}"})
         return
 
     # Notify Start
-    print(json.dumps({"type": "start", "total": total_pages}))
-    sys.stdout.flush()
+    emit_event({"type": "start", "total": total_pages, "job": job.job_id})
+
+    # Resumed job: replay checkpointed pages before analyzing the rest
+    for page_num in sorted(finished):
+        _emit_progress(page_num, total_pages, finished[page_num])
+    if finished:
+        emit_event({"type": "log",
+                    "message": f"Resumed job {job.job_id}: "
+                               f"{len(finished)}/{total_pages} pages from checkpoint"})
+
+    cache = get_response_cache() if use_cache else None
+
+    executor = None
+    if engine_type in ("gemini", "hybrid"):
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+    # Hybrid: YOLO crops are queued here and classified dozens at a time
+    classifier = None
+    on_page = None
+    if engine_type == "hybrid":
+        classifier = HybridClassifier(
+            model, executor, total_pages, batch_size=hybrid_batch,
+            concurrency=concurrency, cache=cache, transport=transport)
+        on_page = classifier.add_page
+
+    # Pages whose model call is running, oldest first. Results are consumed
+    # in page order so progress events stay deterministic.
+    in_flight = deque()
+
+    # YOLO pages waiting for the next batched inference
+    yolo_batch_pages = []
+    text_layer_pages = 0
+
+    job_token = _current_job.set(job)
+    trim_token = _trim_margin.set(trim_margin)
+    quality_token = _image_quality.set(image_quality)
+    cancelled = None
+    try:
+        for page_num, page_image in pages:
+            check_cancelled()
+
+            # Born-digital pages: boxes come from the text layer, no model
+            local = _detect_page_text_layer(reader, page_num) if text_layer else None
+            if local is not None:
+                text_layer_pages += 1
+
+            if engine_type != "gemini":
+                yolo_batch_pages.append((page_num, page_image, local))
+                if len(yolo_batch_pages) >= max(1, yolo_batch):
+                    _analyze_yolo_batch(yolo_batch_pages, total_pages, on_page)
+                    for _, img, _ in yolo_batch_pages:
+                        img.close()
+                    yolo_batch_pages = []
+                continue
+
+            page_stream = None
+            if local is not None:
+                future = Future()
+                future.set_result(local)
+            else:
+                if stream:
+                    page_stream = PageStream(page_image, page_num, total_pages,
+                                             pdf_path, detect_dpi)
+                future = submit_in_context(
+                    executor, _detect_page_gemini, model, page_num, page_image, cache,
+                    transport, page_stream)
+            in_flight.append((page_num, page_image, future, page_stream))
+
+            while len(in_flight) >= max(1, concurrency):
+                # Popped only once finished, so a cancel while waiting on it
+                # still finds its model call in in_flight
+                _finish_gemini_page(
+                    in_flight[0], total_pages, pdf_path, detect_dpi)
+                in_flight.popleft()
+
+        while in_flight:
+            _finish_gemini_page(
+                in_flight[0], total_pages, pdf_path, detect_dpi)
+            in_flight.popleft()
+
+        if yolo_batch_pages:
+            _analyze_yolo_batch(yolo_batch_pages, total_pages, on_page)
+
+        if classifier is not None:
+            classifier.finish()
+
+        if text_layer_pages:
+            emit_event({"type": "log",
+                        "message": f"Text layer: {text_layer_pages}/{total_pages} "
+                                   "pages parsed locally"})
+    except AnalysisCancelled as e:
+        cancelled = e
+    except Exception as e:
+        # Rasterization failed mid-stream (corrupt page, poppler crash...)
+        emit_event({"type": "error",
+                    "message": f"PDF okuma hatası: {str(e)}"})
+        return
+    finally:
+        _current_job.reset(job_token)
+        _trim_margin.reset(trim_token)
+        _image_quality.reset(quality_token)
+        running = []
+        for _, img, _ in yolo_batch_pages:
+            img.close()
+        if classifier is not None:
+            running.extend(classifier.cancel())
+        if executor is not None:
+            for _, page_image, future, _ in in_flight:
+                if not future.cancel():
+                    running.append(future)
+                page_image.close()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    if cancelled is not None:
+        # Calls already sent cannot be recalled; give them a moment to
+        # return so their File API uploads are deleted, then stop waiting
+        if running:
+            wait_futures(running, timeout=CANCEL_GRACE_SECONDS)
+        emit_event({"type": "cancelled", "job": job.job_id,
+                    "reason": str(cancelled)})
+        return
+
+    job.mark_finished()
 
-    global_counter = 1
+    # Notify Finish
+    emit_event({"type": "finish"})
+
+
+def _emit_progress(page_num, total_pages, page_questions):
+    event = {
+        "type": "progress",
+        "current": page_num + 1,
+        "total": total_pages,
+        "questions": page_questions
+    }
+    job = _current_job.get()
+    if job is not None:
+        job.save_page(page_num, page_questions)
+    emit_event(event)
+
+
+def _emit_page_error(page_num, e):
+    # Emit error for this page but continue
+    log_debug(f"Page {page_num} Error: {e}")
+    emit_event(
+        {"type": "log", "message": f"Page {page_num + 1} Error: {str(e)}"})
+    # Lets consumers drop the page's provisional `question` events
+    emit_event({"type": "page_error", "current": page_num + 1,
+                "message": str(e)})
+
+
+def _detect_page_text_layer(reader, page_num):
+    """Question boxes read from the PDF text layer, or None to use the AI engine."""
+    try:
+        return detect_questions_from_text(reader.pages[page_num])
+    except Exception as e:
+        log_debug(f"Text layer error on page {page_num + 1}: {e}")
+        return None
+
+
+def _response_items(text, key="questions"):
+    """The `key` array of a JSON model response, dict items only.
+
+    Parsed with model_json.parse_model_json, so a fenced, chatty or
+    truncated response still yields its complete items.
+    """
+    from model_json import parse_model_json
 
-    for page_num, page_image in enumerate(pages):
+    data = parse_model_json(text, array_key=key)
+    items = data.get(key, []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return []
+    return [item for item in items if isinstance(item, dict)]
+
+
+class PageStream:
+    """Crops a page's questions while its model response is still streaming.
+
+    Each question is cropped and emitted as a `question` event as soon as
+    its JSON object closes, instead of after the whole page. These events
+    are provisional: the page's `progress` event, built once boxes are
+    cleaned across the page, is the authoritative list. It reuses the
+    crops made here for boxes that come out of cleaning unchanged.
+
+    Crops are only encoded here; they are written to the store once they
+    survive into the page's final list, so boxes dropped by cleaning and
+    pages that fail or are cancelled leave no files behind. Provisional
+    questions therefore carry no image_path yet.
+    """
+
+    def __init__(self, page_image, page_num, total_pages, pdf_path=None,
+                 detect_dpi=None):
+        self.page_image = page_image
+        self.page_num = page_num
+        self.total_pages = total_pages
+        self.pdf_path = pdf_path
+        self.detect_dpi = detect_dpi
+        self.crops = {}  # cleaned 0-1000 xyxy box -> (question, crop bytes)
+
+    def add(self, item):
+        """Runs in the worker thread that reads the response."""
+        from boxes import clean_boxes
+
+        boxes, _ = clean_boxes([_model_box(item)], 1000, 1000)
+        if not len(boxes):
+            return
+        box = tuple(boxes[0].tolist())
+        if box in self.crops:
+            return
+
+        question, data = _encode_question(
+            self.page_image, self.page_num, item, box, self.pdf_path,
+            self.detect_dpi)
+        self.crops[box] = (question, data)
+        emit_event({"type": "question", "current": self.page_num + 1,
+                    "total": self.total_pages,
+                    "question": dict(question, image_path=None)})
+
+
+def _read_stream(response, page_stream):
+    """Consume a streamed response, handing each closed question to page_stream."""
+    from model_json import ArrayStream
+
+    parser = ArrayStream("questions")
+    for chunk in response:
+        check_cancelled()
         try:
-            # Save page image temporarily
-            temp_filename = f"page_{page_num}.jpg"
-            temp_path = os.path.abspath(os.path.join(temp_dir, temp_filename))
-            page_image.save(temp_path, "JPEG")
+            piece = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. only a finish reason)
+            continue
+        for item in parser.feed(piece):
+            if isinstance(item, dict):
+                page_stream.add(item)
+    return parser.text
 
-            page_questions = []
 
-            if engine_type == "gemini":
-                # --- GEMINI LOGIC ---
-                prompt = """
-                Görevin: Bu sayfadaki test sorularını ayrıştırmak.
+def _detect_page_gemini(model, page_num, page_image, cache=None,
+                        transport=DEFAULT_TRANSPORT, page_stream=None):
+    """Runs in a worker thread: send one page and return the parsed questions.
 
-                KURALLAR:
-                1. Her soruyu (soru numarası, metni, şıkları ve varsa görseli) içine alan BİR DİKDÖRTGEN (Bounding Box) belirle.
-                2. Soru numarasını (Örn: "1.", "24.") mutlaka yakala.
-                3. Sorunun zorluk seviyesini (1-5 arası) ve konusunu tahmin et.
+    With a PageStream the response is streamed and questions are cropped
+    and emitted while the rest of the page is still being generated.
+    """
+    from model_json import generation_config
+
+    cache_key = None
+    if cache is not None:
+        cache_key = ResponseCache.make_key(
+            page_image, PAGE_PROMPT, getattr(model, "model_name", ""))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    label = f"Page {page_num + 1}"
+    parts = ImageParts(transport, label=label, on_event=emit_event)
+    try:
+        page_part = parts.add(page_image, display_name=f"Page {page_num}")
+        response = get_scheduler().call(
+            model.generate_content, [PAGE_PROMPT, page_part],
+            generation_config=generation_config(PAGE_SCHEMA),
+            stream=page_stream is not None,
+            label=label, on_event=emit_event)
+        # A stream must be read before its uploaded page is deleted
+        if page_stream is not None:
+            text = _read_stream(response, page_stream)
+        else:
+            text = response.text
+    finally:
+        parts.cleanup()
 
-            ÇIKTI FORMATI (JSON):
-            {
-              "questions": [
-                {
-                  "number": 1,
-                  "text_snippet": "Metin...",
-                  "bbox": [ymin, xmin, ymax, xmax],
-                  "difficulty": 3,
-                  "topic": "Konu Başlığı"
-                }
-              ]
-            }
-            NOT: bbox koordinatları 0 ile 1000 arasında normalize edilmiş olmalıdır.
-            """
+    questions = _response_items(text)
 
-                sample_file = genai.upload_file(
-                    path=temp_path, display_name=f"Page {page_num}")
-                response = model.generate_content([prompt, sample_file])
-
-                # Parse JSON
-                text = response.text.replace(
-                    "```json", "").replace(
-                    "```", "").strip()
-                data = json.loads(text)
-
-                width, height = page_image.size
-
-                for q in data.get("questions", []):
-                    # Cut Image
-                    bbox = q["bbox"]
-                    ymin, xmin, ymax, xmax = bbox
-
-                    left = xmin * width / 1000
-                    top = ymin * height / 1000
-                    right = xmax * width / 1000
-                    bottom = ymax * height / 1000
-
-                    # Crop
-                    question_img = page_image.crop((left, top, right, bottom))
-
-                    save_dir = os.path.join(
-                        APP_DATA_DIR, "extracted_questions")
-                    os.makedirs(save_dir, exist_ok=True)
-                    save_path = os.path.abspath(os.path.join(
-                        save_dir, f"q_{global_counter}.jpg"))
-                    question_img.save(save_path, "JPEG")
-
-                    # Base64
-                    buffered = BytesIO()
-                    question_img.save(buffered, format="JPEG")
-                    img_str = base64.b64encode(
-                        buffered.getvalue()).decode("utf-8")
-                    base64_data = f"data:image/jpeg;base64,{img_str}"
-
-                    page_questions.append({
-                        "id": f"q_{global_counter}",
-                        "text": q.get("text_snippet", "") + "...",
-                        "image": base64_data,
-                        "image_path": str(save_path),
-                        "page": page_num + 1,
-                        "bbox": [left, top, right, bottom],
-                        "difficulty": q.get("difficulty", 3),
-                        "topic": q.get("topic", "Genel")
-                    })
-                    global_counter += 1
-
-            elif engine_type == "yolo":
-                # --- YOLO LOGIC ---
-                yolo_questions, global_counter = analyze_page_with_yolo(
-                    temp_path, page_num + 1, global_counter)
-                page_questions.extend(yolo_questions)
-
-            # EMIT PROGRESS EVENT
-            event = {
-                "type": "progress",
-                "current": page_num + 1,
-                "total": total_pages,
-                "questions": page_questions
-            }
-            print(json.dumps(event))
-            sys.stdout.flush()
+    if cache_key is not None:
+        cache.put(cache_key, questions)
+    return questions
+
+
+def _finish_gemini_page(entry, total_pages, pdf_path=None, detect_dpi=None):
+    """Wait for the oldest in-flight page, crop its questions and emit progress."""
+    page_num, page_image, future, page_stream = entry
+    try:
+        detected = wait_result(future)
+        page_questions = _crop_gemini_questions(
+            page_image, page_num, detected, pdf_path, detect_dpi,
+            streamed=page_stream.crops if page_stream is not None else None)
+        _emit_progress(page_num, total_pages, page_questions)
+    except Exception as e:
+        _emit_page_error(page_num, e)
+    finally:
+        page_image.close()
+
+
+def _model_box(q):
+    """xyxy box on 0-1000 from a model [ymin, xmin, ymax, xmax] bbox.
+
+    Malformed bboxes become a NaN row that clean_boxes drops.
+    """
+    try:
+        ymin, xmin, ymax, xmax = (float(v) for v in q["bbox"])
+        return (xmin, ymin, xmax, ymax)
+    except (KeyError, TypeError, ValueError):
+        return (float("nan"),) * 4
+
+
+def _encode_question(page_image, page_num, q, box, pdf_path=None,
+                     detect_dpi=None):
+    """Crop and describe one question; box is xyxy on 0-1000.
+
+    Returns (question, crop bytes); the crop is not stored yet, see
+    write_question_crop(data, question["image_path"]).
+    """
+    width, height = page_image.size
+    if detect_dpi:
+        # Boxes are mapped onto the print-resolution page
+        scale = PRINT_DPI / float(detect_dpi)
+        width, height = width * scale, height * scale
+
+    xmin, ymin, xmax, ymax = box
+    left = xmin * width / 1000
+    top = ymin * height / 1000
+    right = xmax * width / 1000
+    bottom = ymax * height / 1000
+
+    # Crop
+    if detect_dpi:
+        question_img = render_pdf_region(
+            pdf_path, page_num + 1, (left, top, right, bottom))
+    else:
+        question_img = page_image.crop((left, top, right, bottom))
+
+    question_id, data, save_path, preview = encode_question_crop(question_img)
+
+    return {
+        "id": question_id,
+        "text": q.get("text_snippet", "") + "...",
+        "image": preview,
+        "image_path": str(save_path),
+        "page": page_num + 1,
+        "bbox": [left, top, right, bottom],
+        "difficulty": q.get("difficulty", 3),
+        "topic": q.get("topic", "Genel")
+    }, data
+
+
+def _crop_question(page_image, page_num, q, box, pdf_path=None,
+                   detect_dpi=None):
+    """Crop, store and describe one question; box is xyxy on 0-1000."""
+    question, data = _encode_question(page_image, page_num, q, box, pdf_path,
+                                      detect_dpi)
+    write_question_crop(data, question["image_path"])
+    return question
+
+
+def _crop_gemini_questions(page_image, page_num, detected, pdf_path=None,
+                           detect_dpi=None, streamed=None):
+    """Clean the page's model boxes and crop one question per box.
 
+    `streamed` maps boxes already cropped by a PageStream to their
+    (question, crop bytes); those crops are reused and stored now.
+    """
+    from boxes import clean_boxes
+
+    cleaned, keep = clean_boxes([_model_box(q) for q in detected], 1000, 1000)
+
+    page_questions = []
+    for i, box in zip(keep.tolist(), cleaned.tolist()):
+        crop = streamed.get(tuple(box)) if streamed else None
+        if crop is not None:
+            question, data = crop
+            write_question_crop(data, question["image_path"])
+        else:
+            question = _crop_question(page_image, page_num, detected[i], box,
+                                      pdf_path, detect_dpi)
+        page_questions.append(question)
+    return page_questions
+
+
+def _analyze_yolo_batch(batch, total_pages, on_page=None):
+    """Detect a batch of pages at once, then crop and emit them in order.
+
+    Batch entries are (page_num, page_image, local); pages whose `local`
+    boxes already came from the text layer skip inference.
+    `on_page(page_num, page_questions)` replaces the progress event when the
+    crops still need work (hybrid engine).
+    """
+    pending = [img for _, img, local in batch if local is None]
+    detections, detect_error = iter([]), None
+    try:
+        if pending:
+            detections = iter(detect_questions_yolo(pending))
+    except Exception as e:
+        detections, detect_error = None, e
+
+    for page_num, page_image, local in batch:
+        if local is None and detections is None:
+            _emit_page_error(page_num, detect_error)
+            continue
+        try:
+            if local is not None:
+                page_questions = _crop_gemini_questions(
+                    page_image, page_num, local)
+            else:
+                page_questions = crop_yolo_questions(
+                    page_image, page_num + 1, next(detections))
+            if on_page is not None:
+                on_page(page_num, page_questions)
+            else:
+                _emit_progress(page_num, total_pages, page_questions)
         except Exception as e:
-            # Emit error for this page but continue
-            log_debug(f"Page {page_num} Error: {e}")
-            print(json.dumps(
-                {"type": "log", "message": f"Page {page_num + 1} Error: {str(e)}"}))
-            sys.stdout.flush()
+            _emit_page_error(page_num, e)
+
+
+# --- HYBRID ENGINE ---
+
+
+class HybridClassifier:
+    """Fills in text, topic and difficulty for locally detected crops.
+
+    Pages arrive already cropped by YOLO and are held back until
+    `batch_size` crops have accumulated; those crops go to the model in a
+    single request, so a book costs a handful of calls instead of one per
+    page. Requests run on the shared executor while detection continues,
+    and pages are emitted in order once their batch has been answered.
+    """
+
+    def __init__(self, model, executor, total_pages, batch_size=HYBRID_BATCH,
+                 concurrency=DEFAULT_CONCURRENCY, cache=None,
+                 transport=DEFAULT_TRANSPORT):
+        self.model = model
+        self.executor = executor
+        self.total_pages = total_pages
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+        self.transport = transport
+        self.pending = []
+        self.pending_count = 0
+        self.in_flight = deque()
+
+    def add_page(self, page_num, page_questions):
+        self.pending.append((page_num, page_questions))
+        self.pending_count += len(page_questions)
+        if self.pending_count >= self.batch_size:
+            self._submit()
+
+    def finish(self):
+        self._submit()
+        while self.in_flight:
+            self._drain_oldest()
+
+    def cancel(self):
+        """Drop queued batches; returns the futures already running."""
+        running = [future for _, future in self.in_flight
+                   if future is not None and not future.cancel()]
+        self.in_flight.clear()
+        self.pending = []
+        self.pending_count = 0
+        return running
+
+    def _submit(self):
+        if not self.pending:
+            return
+        pages, self.pending, self.pending_count = self.pending, [], 0
+        questions = [q for _, page_questions in pages for q in page_questions]
+
+        future = None
+        if questions:
+            future = submit_in_context(
+                self.executor, _classify_crops, self.model, questions, self.cache,
+                self.transport)
+        self.in_flight.append((pages, future))
+
+        while len(self.in_flight) >= self.concurrency:
+            self._drain_oldest()
+
+    def _drain_oldest(self):
+        pages, future = self.in_flight.popleft()
+        if future is not None:
+            try:
+                _merge_crop_metadata(
+                    [q for _, page_questions in pages for q in page_questions],
+                    wait_result(future))
+            except Exception as e:
+                # Keep the crops; only their metadata stays at the defaults
+                first, last = pages[0][0] + 1, pages[-1][0] + 1
+                log_debug(f"Hybrid metadata error (pages {first}-{last}): {e}")
+                emit_event({"type": "log",
+                            "message": f"Page {first}-{last} metadata error: {e}"})
+
+        for page_num, page_questions in pages:
+            _emit_progress(page_num, self.total_pages, page_questions)
+
+
+def _classify_crops(model, questions, cache=None, transport=DEFAULT_TRANSPORT):
+    """Runs in a worker thread: one request for a whole batch of crops."""
+    from model_json import generation_config
+
+    cache_key = None
+    if cache is not None:
+        digest = hashlib.sha256()
+        for q in questions:
+            with open(q["image_path"], "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        cache_key = ResponseCache.make_key(
+            digest.digest(), HYBRID_PROMPT, getattr(model, "model_name", ""))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    label = f"Crops p{questions[0]['page']}-{questions[-1]['page']}"
+    parts = ImageParts(transport, label=label, on_event=emit_event,
+                       max_side=HYBRID_CROP_SIDE)
+    try:
+        content = [HYBRID_PROMPT]
+        for index, q in enumerate(questions, start=1):
+            content.append(f"Soru {index}:")
+            content.append(parts.add(q["image_path"], display_name=q["id"]))
+        response = get_scheduler().call(
+            model.generate_content, content,
+            generation_config=generation_config(HYBRID_SCHEMA),
+            label=label, on_event=emit_event)
+    finally:
+        parts.cleanup()
+
+    results = _response_items(response.text)
+
+    if cache_key is not None:
+        cache.put(cache_key, results)
+    return results
+
+
+def _merge_crop_metadata(questions, results):
+    for item in results:
+        try:
+            index = int(item.get("index"))
+        except (TypeError, ValueError):
+            continue
+        if not 1 <= index <= len(questions):
             continue
+        q = questions[index - 1]
 
-    # Notify Finish
-    print(json.dumps({"type": "finish"}))
-    sys.stdout.flush()
+        if item.get("text"):
+            q["text"] = item["text"]
+        if item.get("topic"):
+            q["topic"] = item["topic"]
+        try:
+            q["difficulty"] = min(5, max(1, int(item.get("difficulty"))))
+        except (TypeError, ValueError):
+            pass
 
 # --- TEMPLATE ANALYSIS LOGIC ---
 
 
+TEMPLATE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "safe_area": {
+            "type": "object",
+            "properties": {side: {"type": "number"}
+                           for side in ("top", "bottom", "left", "right")},
+            "required": ["top", "bottom", "left", "right"],
+        },
+    },
+    "required": ["safe_area"],
+}
+
+
 def analyze_template_with_gemini(model, image_path):
+    from model_json import generation_config, parse_model_json
+
     prompt = """
     Görevin: Bu PDF şablon sayfasının "Güvenli Baskı Alanını" (Safe Print Area) belirlemek.
 
@@ -335,44 +1877,42 @@ def analyze_template_with_gemini(model, image_path):
       }
     }
     """
+    parts = ImageParts(label="Template", on_event=emit_stderr_event)
     try:
-        sample_file = genai.upload_file(
-            path=image_path, display_name="Template Page")
-        response = model.generate_content([prompt, sample_file])
-        text = response.text.replace("```json", "").replace("```", "").strip()
-        data = json.loads(text)
+        page_part = parts.add(image_path, display_name="Template Page")
+        response = get_scheduler().call(
+            model.generate_content, [prompt, page_part],
+            generation_config=generation_config(TEMPLATE_SCHEMA),
+            label="Template", on_event=emit_stderr_event)
+        data = parse_model_json(response.text, array_key=None)
         return data.get(
             "safe_area", {"top": 50, "bottom": 950, "left": 50, "right": 950})
     except Exception as e:
         log_debug(f"Gemini Template Error: {e}")
         # Default safe area (standard margins)
         return {"top": 50, "bottom": 950, "left": 50, "right": 950}
+    finally:
+        parts.cleanup()
 
 
 def run_template_analysis(pdf_path):
-    if not api_key:
-        print(json.dumps({"error": "API Key missing"}))
-        return
+    if not get_api_key():
+        return {"error": "API Key missing"}
 
-    try:
-        model = genai.GenerativeModel('gemini-2.5-pro')
-    except BaseException:
-        model = genai.GenerativeModel('gemini-1.5-pro')
+    model = get_gemini_model()
 
     try:
         # Convert first page to image
         pages = convert_from_path(pdf_path, dpi=150, first_page=1, last_page=1)
         if not pages:
-            print(json.dumps({"error": "Empty PDF"}))
-            return
+            return {"error": "Empty PDF"}
 
-        temp_dir = os.path.join(APP_DATA_DIR, "temp_images")
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_path = os.path.join(temp_dir, "template_preview.jpg")
-        pages[0].save(temp_path, "JPEG")
+        with job_workspace("template-") as workspace:
+            temp_path = os.path.join(workspace, "template_preview.jpg")
+            pages[0].save(temp_path, "JPEG")
 
-        # Analyze
-        safe_area = analyze_template_with_gemini(model, temp_path)
+            # Analyze
+            safe_area = analyze_template_with_gemini(model, temp_path)
 
         # Return result + preview image base64
         buffered = BytesIO()
@@ -380,20 +1920,24 @@ def run_template_analysis(pdf_path):
         pages[0].save(buffered, format="JPEG", quality=50)
         img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
 
-        output = {
+        return {
             "margins": safe_area,
             "preview_base64": f"data:image/jpeg;base64,{img_str}"
         }
-        print(json.dumps(output))
 
     except Exception as e:
         log_debug(f"Template Analysis Error: {e}")
-        print(json.dumps({"error": str(e)}))
+        return {"error": str(e)}
 
 # --- EXPORT LOGIC ---
 
 
 def run_export(output_path, image_paths, template_path=None, margins=None):
+    from storage_encoder import pdf_image
+    from reportlab.lib.utils import ImageReader
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
     # 1. Create content PDF (Questions) in memory
     packet = BytesIO()
     c = canvas.Canvas(packet, pagesize=A4)
@@ -451,7 +1995,7 @@ def run_export(output_path, image_paths, template_path=None, margins=None):
             continue
 
         try:
-            img = ImageReader(img_path)
+            img = ImageReader(pdf_image(img_path, IMAGE_QUALITY))
             img_w, img_h = img.getSize()
             aspect = img_h / float(img_w)
 
@@ -523,24 +2067,55 @@ def run_export(output_path, image_paths, template_path=None, margins=None):
         with open(output_path, "wb") as f:
             f.write(packet.getbuffer())
 
-    print(json.dumps({"status": "success", "path": output_path}))
+    return {"status": "success", "path": output_path}
+
+
+# --- CACHE MAINTENANCE ---
+
+
+def run_cache_command(action):
+    cache = get_response_cache()
+    if action == "stats":
+        return cache.stats()
+    elif action == "clear":
+        removed = cache.clear()
+        return {"status": "success", "removed": removed}
+    return {"error": f"Unknown cache action: {action}"}
 
 
 # --- SOLVER LOGIC ---
 
+SOLVER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "q_num": {"type": "integer"},
+                    "answer": {"type": "string"},
+                    "detail": {"type": "string"},
+                },
+                "required": ["q_num", "answer"],
+            },
+        },
+    },
+    "required": ["answers"],
+}
+
+
 def run_solver(questions_json):
-    if not api_key:
-        print(json.dumps({"error": "API Key missing"}))
-        return
+    from model_json import generation_config, parse_model_json
+
+    if not get_api_key():
+        return {"error": "API Key missing"}
 
     try:
         data = json.loads(questions_json)
         # data is List of {id, text, image_path}
 
-        try:
-            model = genai.GenerativeModel('gemini-2.5-pro')
-        except BaseException:
-            model = genai.GenerativeModel('gemini-1.5-pro')
+        model = get_gemini_model()
 
         prompt = """
         Görevin: Aşağıdaki test sorularını çözmek ve bir CEVAP ANAHTARI oluşturmak.
@@ -560,36 +2135,365 @@ def run_solver(questions_json):
         """
 
         content_parts = [prompt]
+        parts = ImageParts(label="Solver", on_event=emit_stderr_event)
 
-        for i, q in enumerate(data):
-            q_text = f"\nSoru {i + 1}:\n{q.get('text', '')}"
-            content_parts.append(q_text)
-
-            # Add Image if exists
-            img_path = q.get('image_path')
-            if img_path and os.path.exists(img_path):
-                file_ref = genai.upload_file(
-                    path=img_path, display_name=f"Q{i + 1}")
-                content_parts.append(file_ref)
-
-        response = model.generate_content(content_parts)
-        text = response.text.replace("```json", "").replace("```", "").strip()
+        try:
+            for i, q in enumerate(data):
+                q_text = f"\nSoru {i + 1}:\n{q.get('text', '')}"
+                content_parts.append(q_text)
+
+                # Add Image if exists
+                img_path = q.get('image_path')
+                if img_path and os.path.exists(img_path):
+                    content_parts.append(
+                        parts.add(img_path, display_name=f"Q{i + 1}"))
+
+            response = get_scheduler().call(
+                model.generate_content, content_parts,
+                generation_config=generation_config(SOLVER_SCHEMA),
+                label="Solver", on_event=emit_stderr_event)
+        finally:
+            parts.cleanup()
 
         try:
-            result = json.loads(text)
-            print(json.dumps(result))  # Output to stdout
+            return parse_model_json(response.text, array_key="answers")
         except Exception as e:
             log_debug(f"Solver Error: {e}")
-            print(json.dumps({"error": str(e)}))
+            return {"error": str(e)}
     except Exception as e:
         log_debug(f"Run Solver Error: {e}")
-        print(json.dumps({"error": str(e)}))
+        return {"error": str(e)}
+
+
+# --- SERVE MODE ---
+
+# Requests handled at the same time by one `engine serve` process
+DEFAULT_SERVE_WORKERS = 4
+
+
+def _serve_analyze(pdf_path=None, engine="gemini", resume=None, **options):
+    if resume:
+        return resume_analysis(resume)
+    return run_analysis(pdf_path, engine_type=engine, **options)
+
+
+def _check_params(method, params):
+    """Raise TypeError when `params` do not fit `method`."""
+    import inspect
+
+    bound = inspect.signature(method).bind(**params)
+    if method is _serve_analyze:
+        # engine_type comes from `engine`; checkpoints are reached via `resume`
+        analysis = inspect.signature(run_analysis)
+        analysis = analysis.replace(parameters=[
+            p for p in analysis.parameters.values()
+            if p.name not in ("engine_type", "job")])
+        analysis.bind(None, **bound.arguments.get("options", {}))
+
+
+def _serve_export(output_path, images, template=None, margins=None):
+    return run_export(output_path, images, template, margins)
+
+
+def _serve_solve(questions):
+    if not isinstance(questions, str):
+        questions = json.dumps(questions)
+    return run_solver(questions)
+
+
+SERVE_METHODS = {
+    "analyze": _serve_analyze,
+    "export": _serve_export,
+    "analyze-template": run_template_analysis,
+    "solve": _serve_solve,
+    "cache": run_cache_command,
+    "ping": lambda: {"status": "ok"},
+}
+
+
+class EngineServer:
+    """Long-lived engine speaking newline-delimited JSON-RPC 2.0 on stdio.
+
+    Request:   {"jsonrpc": "2.0", "id": 7, "method": "export",
+                "params": {"output_path": ..., "images": [...]}}
+    Events:    {"jsonrpc": "2.0", "method": "event",
+                "params": {"id": 7, "event": {"type": "progress", ...}}}
+    Response:  {"jsonrpc": "2.0", "id": 7, "result": {...}}
+
+    Methods mirror the subcommands (analyze, export, analyze-template,
+    solve, cache) and take their options as named params. Every request
+    needs an id not used by a running request; params are checked before
+    it is queued. Requests run concurrently on a thread pool, and models,
+    detectors, the response cache and the request scheduler stay loaded
+    between them. The process exits when stdin closes.
+
+    Cancel:    {"jsonrpc": "2.0", "id": 8, "method": "cancel", "params": {"id": 7}}
+               or {"cmd": "cancel"} to cancel every running request.
+               A cancelled request ends with a REQUEST_CANCELLED error reply.
+
+    The API key and the request rate are shared by every request, so they
+    are not request params; `configure` changes them while nothing runs:
+               {"jsonrpc": "2.0", "id": 9, "method": "configure",
+                "params": {"api_key": "...", "rpm": 30}}
+    """
+
+    # JSON-RPC error code of a cancelled request (as in LSP)
+    REQUEST_CANCELLED = -32800
+    # Process-wide settings, only accepted by `configure`
+    SERVER_PARAMS = ("api_key", "rpm")
+
+    def __init__(self, max_workers=DEFAULT_SERVE_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self._cancel_tokens = {}
+        self._futures = {}
+        self._tokens_lock = threading.Lock()
+
+    def cancel(self, req_id=None, reason="cancel"):
+        """Cancel one request (or all of them); returns the cancelled ids."""
+        with self._tokens_lock:
+            targets = [(rid, token) for rid, token in self._cancel_tokens.items()
+                       if req_id is None or rid == req_id]
+        for _, token in targets:
+            token.cancel(reason)
+        return [rid for rid, _ in targets]
+
+    def stop(self, reason="SIGTERM", grace=None):
+        """Cancel every request and wait up to `grace` seconds for them.
+
+        Requests still queued are answered right away; running ones get the
+        grace period to emit their `cancelled` event, reply, checkpoint and
+        delete their uploads, like a cancelled CLI run.
+        """
+        with self._tokens_lock:
+            futures = dict(self._futures)
+        self.cancel(reason=reason)
+
+        running = []
+        for req_id, future in futures.items():
+            if future.cancel():
+                self._forget(req_id)
+                self._reply_cancelled(req_id, reason)
+            else:
+                running.append(future)
+        self.executor.shutdown(wait=False)
+        wait_futures(running,
+                     timeout=SERVE_STOP_SECONDS if grace is None else grace)
+
+    def _forget(self, req_id):
+        with self._tokens_lock:
+            self._cancel_tokens.pop(req_id, None)
+            self._futures.pop(req_id, None)
+
+    def configure(self, api_key=None, rpm=None):
+        """Change the server-wide settings; refused while requests run."""
+        with self._tokens_lock:
+            if self._futures:
+                raise RuntimeError("Requests are running; configure between them")
+            configure_api_key(api_key)
+            if rpm:
+                get_scheduler().set_rate(rpm)
+        return {"status": "ok"}
+
+    def _reply_cancelled(self, req_id, reason):
+        self._reply(req_id, error={"code": self.REQUEST_CANCELLED,
+                                   "message": f"Request cancelled ({reason})"})
+
+    def _reply(self, req_id, result=None, error=None):
+        message = {"jsonrpc": "2.0", "id": req_id}
+        if error is not None:
+            message["error"] = error
+        else:
+            message["result"] = result
+        write_stdout(message)
+
+    def handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self._reply(None, error={"code": -32700, "message": f"Parse error: {e}"})
+            return
+
+        if not isinstance(request, dict):
+            self._reply(None, error={"code": -32600, "message": "Invalid request"})
+            return
+
+        if request.get("cmd") == "cancel":
+            self.cancel()
+            return
+
+        req_id = request.get("id")
+        name = request.get("method")
+        params = request.get("params") or {}
+        if not isinstance(req_id, (str, int)) or isinstance(req_id, bool):
+            self._reply(None, error={"code": -32600, "message": "Invalid request: id required"})
+            return
+        if not isinstance(params, dict):
+            self._reply(req_id, error={"code": -32602, "message": "params must be an object"})
+            return
+
+        # Answered right away, not queued behind the requests they concern
+        if name == "cancel":
+            target = params.get("id")
+            if not isinstance(target, (str, int)) or isinstance(target, bool):
+                self._reply(req_id, error={"code": -32602, "message": "cancel needs params.id"})
+                return
+            self._reply(req_id, {"cancelled": self.cancel(target)})
+            return
+        if name == "configure":
+            try:
+                _check_params(self.configure, params)
+                result = self.configure(**params)
+            except TypeError as e:
+                self._reply(req_id, error={"code": -32602, "message": str(e)})
+            except RuntimeError as e:
+                self._reply(req_id, error={"code": -32000, "message": str(e)})
+            else:
+                self._reply(req_id, result)
+            return
+
+        method = SERVE_METHODS.get(name)
+        if method is None:
+            self._reply(req_id, error={
+                "code": -32601, "message": f"Method not found: {name}"})
+            return
+        shared = [key for key in self.SERVER_PARAMS if key in params]
+        if shared:
+            self._reply(req_id, error={"code": -32602, "message": (
+                f"{', '.join(shared)}: server setting, use the configure method")})
+            return
+        try:
+            _check_params(method, params)
+        except TypeError as e:
+            self._reply(req_id, error={"code": -32602, "message": str(e)})
+            return
+
+        with self._tokens_lock:
+            if req_id in self._futures:
+                duplicate = True
+            else:
+                duplicate = False
+                self._cancel_tokens[req_id] = CancelToken()
+                self._futures[req_id] = self.executor.submit(
+                    self._run, req_id, method, dict(params))
+        if duplicate:
+            self._reply(req_id, error={
+                "code": -32600, "message": f"Invalid request: id {req_id!r} is already running"})
+
+    def _run(self, req_id, method, params):
+        def sink(event):
+            write_stdout({"jsonrpc": "2.0", "method": "event",
+                          "params": {"id": req_id, "event": event}})
+
+        with self._tokens_lock:
+            request_token = self._cancel_tokens.get(req_id)
+        token = _event_sink.set(sink)
+        cancel_token = _cancel_token.set(request_token)
+        try:
+            result = method(**params)
+        except AnalysisCancelled as e:
+            self._reply_cancelled(req_id, e.args[0] if e.args else "cancel")
+        except Exception as e:
+            log_debug(f"Serve Error ({req_id}): {e}")
+            self._reply(req_id, error={"code": -32000, "message": str(e)})
+        else:
+            # run_analysis reports cancellation with an event and returns
+            if request_token is not None and request_token.cancelled:
+                self._reply_cancelled(req_id, request_token.reason)
+            else:
+                self._reply(req_id, result)
+        finally:
+            _event_sink.reset(token)
+            _cancel_token.reset(cancel_token)
+            self._forget(req_id)
+
+    def serve_forever(self, stream):
+        for line in stream:
+            if line.strip():
+                self.handle_line(line)
+        # stdin closed: let running requests finish before the process exits
+        self.executor.shutdown(wait=True)
+
+
+# --- STARTUP REPORT ---
+
+
+class ImportTimer:
+    """`-X importtime`-style accounting for modules imported after install().
+
+    Works in the frozen sidecar too, where interpreter flags are not
+    available. Only first-time imports are timed; self time excludes the
+    nested imports a module triggers.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._stack = []
+        self._original = None
+
+    def install(self):
+        import builtins
+
+        self._original = builtins.__import__
+        builtins.__import__ = self._import
+
+    def uninstall(self):
+        import builtins
+
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original(name, globals, locals, fromlist, level)
+
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.records.append((elapsed - children, elapsed, len(self._stack), name))
+
+    def report(self, stream, command_seconds):
+        print("import time: self [us] | cumulative | imported package", file=stream)
+        for self_time, total, depth, name in self.records:
+            print(f"import time: {int(self_time * 1e6):>9} | {int(total * 1e6):>10} | "
+                  f"{'  ' * depth}{name}", file=stream)
+        module_seconds = _MAIN_START_TIME - _START_TIME
+        print(f"startup: module {module_seconds * 1000:.1f} ms, "
+              f"command {command_seconds * 1000:.1f} ms, "
+              f"total {(module_seconds + command_seconds) * 1000:.1f} ms",
+              file=stream)
+        stream.flush()
 
 
 def main():
+    global _MAIN_START_TIME
+    _MAIN_START_TIME = time.perf_counter()
+
+    # `engine --startup-report <command> ...` runs the command normally and
+    # prints import timings to stderr (stdout stays the command's output)
+    if "--startup-report" in sys.argv:
+        sys.argv.remove("--startup-report")
+        timer = ImportTimer()
+        timer.install()
+        try:
+            _run_cli()
+        finally:
+            timer.uninstall()
+            timer.report(sys.stderr, time.perf_counter() - _MAIN_START_TIME)
+        return
+
+    _run_cli()
+
+
+def _check_poppler():
     # Windows Check: Poppler is required for pdf2image
     if sys.platform == "win32":
-        import subprocess
         try:
             subprocess.run(["pdftoppm", "-h"], capture_output=True)
         except FileNotFoundError:
@@ -599,18 +2503,95 @@ def main():
             }))
             sys.exit(1)
 
+
+def _run_cli():
     parser = argparse.ArgumentParser(description="AI Test Engine")
     subparsers = parser.add_subparsers(dest="command")
 
     parser_analyze = subparsers.add_parser("analyze")
-    parser_analyze.add_argument("pdf_path")
+    parser_analyze.add_argument("pdf_path", nargs="?")
+    parser_analyze.add_argument(
+        "--resume",
+        metavar="JOB",
+        help="Continue an interrupted job (id from the start event); "
+             "the job's PDF and options are reused")
     parser_analyze.add_argument(
         "--engine",
         default="gemini",
         choices=[
             "gemini",
-            "yolo"],
+            "yolo",
+            "hybrid"],
         help="Extraction engine")
+    parser_analyze.add_argument(
+        "--page-window",
+        type=int,
+        default=PAGE_WINDOW,
+        help="Pages rendered per batch (bounds peak memory)")
+    parser_analyze.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Pages analyzed in parallel (Gemini engine)")
+    parser_analyze.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached model responses")
+    parser_analyze.add_argument(
+        "--rpm",
+        type=int,
+        default=DEFAULT_RPM,
+        help="Max model requests per minute (shared by all workers)")
+    parser_analyze.add_argument(
+        "--detect-dpi",
+        type=int,
+        default=None,
+        help="Detect on pages rendered at this dpi (e.g. 120) and re-render "
+             "only question regions at print resolution (Gemini engine)")
+    parser_analyze.add_argument(
+        "--transport",
+        default=DEFAULT_TRANSPORT,
+        choices=["inline", "file"],
+        help="Send page images inline or through the File API")
+    parser_analyze.add_argument(
+        "--yolo-batch",
+        type=int,
+        default=YOLO_BATCH,
+        help="Pages per batched inference (YOLO and hybrid engines)")
+    parser_analyze.add_argument(
+        "--detector",
+        default="auto",
+        choices=["auto", "torch", "onnx"],
+        help="YOLO backend: ultralytics/torch or ONNX Runtime "
+             "(auto prefers ONNX when models/best.onnx is present)")
+    parser_analyze.add_argument(
+        "--no-text-layer",
+        action="store_true",
+        help="Always use the AI engine, even on pages with a usable text layer")
+    parser_analyze.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Wait for each page's full model response instead of emitting "
+             "questions as they are generated")
+    parser_analyze.add_argument(
+        "--hybrid-batch",
+        type=int,
+        default=HYBRID_BATCH,
+        help="Question crops classified per model request (hybrid engine)")
+    parser_analyze.add_argument(
+        "--trim-margin",
+        type=int,
+        default=TRIM_MARGIN,
+        help="White margin in pixels kept around the ink of each crop")
+    parser_analyze.add_argument(
+        "--no-trim",
+        action="store_true",
+        help="Keep crops exactly as detected")
+    parser_analyze.add_argument(
+        "--image-quality",
+        type=int,
+        default=IMAGE_QUALITY,
+        help="Target quality (1-100) of stored grayscale and color crops")
 
     parser_export = subparsers.add_parser("export")
     parser_export.add_argument("output_path")
@@ -634,18 +2615,64 @@ def main():
         required=True,
         help="JSON string of questions list")
 
+    parser_cache = subparsers.add_parser("cache")
+    parser_cache.add_argument("action", choices=["stats", "clear"])
+
+    parser_serve = subparsers.add_parser("serve")
+    parser_serve.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_SERVE_WORKERS,
+        help="Requests processed concurrently")
+    parser_serve.add_argument(
+        "--rpm",
+        type=int,
+        default=DEFAULT_RPM,
+        help="Max model requests per minute (shared by all requests)")
+
     if len(sys.argv) > 1 and sys.argv[1] not in [
-            "analyze", "export", "analyze-template", "solve"]:
+            "analyze", "export", "analyze-template", "solve", "cache",
+            "serve", "-h", "--help"]:
         # Legacy support or direct file call
+        _check_poppler()
+        cancel = _listen_for_cancel()
         run_analysis(sys.argv[1])
+        if cancel.cancelled:
+            exit_cancelled()
         return
 
     args = parser.parse_args()
 
+    # Only the commands that rasterize pages need poppler
+    if args.command in ("analyze", "analyze-template", "serve"):
+        _check_poppler()
+
+    cancel = None
     if args.command == "analyze":
-        run_analysis(args.pdf_path, engine_type=args.engine)
+        cancel = _listen_for_cancel()
+    if args.command in ("analyze", "serve"):
+        get_scheduler().set_rate(args.rpm)
+
+    if args.command == "analyze" and args.resume:
+        resume_analysis(args.resume)
+    elif args.command == "analyze":
+        if not args.pdf_path:
+            parser_analyze.error("pdf_path or --resume is required")
+        run_analysis(args.pdf_path, engine_type=args.engine,
+                     page_window=args.page_window,
+                     concurrency=args.concurrency,
+                     use_cache=not args.no_cache,
+                     detect_dpi=args.detect_dpi,
+                     transport=args.transport,
+                     yolo_batch=args.yolo_batch,
+                     detector=args.detector,
+                     hybrid_batch=args.hybrid_batch,
+                     text_layer=not args.no_text_layer,
+                     stream=not args.no_stream,
+                     trim_margin=None if args.no_trim else args.trim_margin,
+                     image_quality=args.image_quality)
     elif args.command == "analyze-template":
-        run_template_analysis(args.pdf_path)
+        write_stdout(run_template_analysis(args.pdf_path))
     elif args.command == "export":
         margins = None
         if args.margins:
@@ -653,12 +2680,42 @@ def main():
                 margins = json.loads(args.margins)
             except BaseException:
                 pass
-        run_export(args.output_path, args.images, args.template, margins)
+        write_stdout(
+            run_export(args.output_path, args.images, args.template, margins))
     elif args.command == "solve":
-        run_solver(args.questions)
+        write_stdout(run_solver(args.questions))
+    elif args.command == "cache":
+        write_stdout(run_cache_command(args.action))
+    elif args.command == "serve":
+        import signal
+
+        server = EngineServer(max_workers=args.workers)
+
+        def on_sigterm(signum, frame):
+            raise AnalysisCancelled("SIGTERM")
+
+        signal.signal(signal.SIGTERM, on_sigterm)
+        try:
+            server.serve_forever(sys.stdin)
+        except AnalysisCancelled:
+            # A second SIGTERM skips the rest of the grace period
+            signal.signal(signal.SIGTERM, lambda signum, frame: exit_cancelled())
+            server.stop("SIGTERM")
+            exit_cancelled()
     else:
         parser.print_help()
 
+    if cancel is not None and cancel.cancelled:
+        exit_cancelled()
+
+
+def _listen_for_cancel():
+    """CLI analyze: SIGTERM or {"cmd": "cancel"} on stdin cancels the run."""
+    token = CancelToken()
+    watch_for_cancel(token, sys.stdin)
+    _cancel_token.set(token)
+    return token
+
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,137 @@
+"""Structured output requests and a tolerant parser for model responses.
+
+Model calls ask for JSON through the API's structured-output mode
+(generation_config() with a declared response schema), so responses are
+plain JSON and parse on the first try. parse_model_json() still accepts
+what the free-text mode used to return, for responses from the cache,
+models without schema support, or a truncated answer:
+
+    - ```json fenced blocks and prose around the JSON
+    - trailing commas
+    - an array cut off mid-object: the complete objects are kept
+
+ArrayStream parses the same array while a streamed response arrives.
+
+Everything but ArrayStream is copied in Test_Olusturucu/src/core/model_json.py
+for the desktop app's Gemini service; a parity test there compares both.
+"""
+import json
+import re
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_DECODER = json.JSONDecoder()
+
+
+def generation_config(schema):
+    """generation_config asking for JSON that follows `schema`."""
+    return {"response_mime_type": "application/json",
+            "response_schema": schema}
+
+
+def _first_value(text):
+    """Decode the first JSON object or array found in text, or None."""
+    for match in re.finditer(r"[{\[]", text):
+        try:
+            value, _ = _DECODER.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        if isinstance(value, (dict, list)):
+            return value
+    return None
+
+
+def iter_array_items(text, start):
+    """Yield (item, end) for each complete item of the array opening at start.
+
+    text[start] must be "[". Stops quietly at the first item that does not
+    decode yet, so a truncated or still-streaming array yields its complete
+    items only.
+    """
+    return _iter_items(text, start + 1)
+
+
+def _iter_items(text, pos):
+    length = len(text)
+    while True:
+        while pos < length and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= length or text[pos] == "]":
+            return
+        try:
+            item, pos = _DECODER.raw_decode(text, pos)
+        except ValueError:
+            return
+        yield item, pos
+
+
+class ArrayStream:
+    """Incremental parser for the `key` array of a streamed JSON response.
+
+    feed() appends the next piece of the response and returns the items it
+    completed, so each object is available as soon as its closing brace
+    arrives. The whole response is kept in `text` for the final parse.
+    """
+
+    def __init__(self, key="questions"):
+        self.text = ""
+        self._opening = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._pos = None  # inside the array, after the last complete item
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self._pos is None:
+            match = self._opening.search(self.text)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        items = []
+        for item, end in _iter_items(self.text, self._pos):
+            # A number or string at the very end may still be growing
+            if end == len(self.text) and not isinstance(item, (dict, list)):
+                break
+            items.append(item)
+            self._pos = end
+        return items
+
+
+def _salvage_array(text, key):
+    match = re.search(r'"%s"\s*:\s*\[' % re.escape(key), text)
+    if match is None:
+        return None
+    items = [item for item, _ in iter_array_items(text, match.end() - 1)]
+    return {key: items} if items else None
+
+
+def parse_model_json(text, array_key="questions"):
+    """Parse a model response into a dict or list; ValueError if hopeless.
+
+    When only a truncated `array_key` array can be found, returns
+    {array_key: [complete items]}.
+    """
+    text = (text or "").strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    salvaged = None
+    if array_key:
+        salvaged = _salvage_array(_TRAILING_COMMA.sub(r"\1", text), array_key)
+
+    candidates = [m.group(1) for m in _FENCE.finditer(text)] + [text]
+    for candidate in candidates:
+        for variant in (candidate, _TRAILING_COMMA.sub(r"\1", candidate)):
+            value = _first_value(variant)
+            if value is None:
+                continue
+            # In a truncated response the first complete object is an item
+            # of the array, not the response
+            if salvaged and not (isinstance(value, dict) and array_key in value):
+                continue
+            return value
+
+    if salvaged is not None:
+        return salvaged
+    raise ValueError(f"Model yanıtı JSON olarak okunamadı: {text[:80]!r}")
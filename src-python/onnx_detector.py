@@ -0,0 +1,158 @@
+"""ONNX Runtime backend for the YOLO question detector.
+
+Runs an exported (optionally INT8-quantized) copy of models/best.pt without
+ultralytics/torch. Pre- and post-processing (letterbox, box decoding, NMS)
+are plain NumPy so the sidecar only needs onnxruntime, numpy and Pillow.
+
+Export once with:  python bench_detector.py export [--int8]
+"""
+import os
+
+import numpy as np
+
+INPUT_SIZE = 640
+CONF_THRESHOLD = 0.4
+IOU_THRESHOLD = 0.5
+PAD_VALUE = 114
+
+
+def letterbox(image, size=INPUT_SIZE):
+    """Resize keeping aspect ratio and pad to a square `size` canvas.
+
+    Returns the HWC uint8 canvas plus (ratio, pad_x, pad_y) to map boxes back.
+    """
+    from PIL import Image as PILImage
+
+    w, h = image.size
+    ratio = min(size / w, size / h)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    resized = image.resize((new_w, new_h), PILImage.BILINEAR)
+
+    canvas = np.full((size, size, 3), PAD_VALUE, dtype=np.uint8)
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = np.asarray(resized)
+    return canvas, ratio, pad_x, pad_y
+
+
+def nms(boxes, scores, iou_threshold=IOU_THRESHOLD):
+    """Greedy class-agnostic non-maximum suppression; returns kept indices."""
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    x1, y1, x2, y2 = boxes.T
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    order = scores.argsort()[::-1]
+    keep = []
+
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        inter_w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_predictions(pred, conf_threshold=CONF_THRESHOLD):
+    """Turn one raw YOLOv8 head output into (xyxy boxes, scores).
+
+    `pred` is (4 + num_classes, anchors) as exported by ultralytics with
+    nms=False; the transposed layout is accepted as well.
+    """
+    if pred.shape[0] > pred.shape[1]:
+        pred = pred.T
+
+    scores = pred[4:].max(axis=0)
+    mask = scores >= conf_threshold
+    cx, cy, w, h = pred[:4, mask]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return boxes, scores[mask]
+
+
+class OnnxQuestionDetector:
+    """Drop-in replacement for the ultralytics detector used by engine.py."""
+
+    def __init__(self, onnx_path, conf_threshold=CONF_THRESHOLD,
+                 iou_threshold=IOU_THRESHOLD, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            onnx_path, sess_options=options,
+            providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+
+        # Static exports take exactly one image per run
+        batch_dim = model_input.shape[0]
+        self.max_batch = batch_dim if isinstance(batch_dim, int) else None
+        size_dim = model_input.shape[2]
+        self.input_size = size_dim if isinstance(size_dim, int) else INPUT_SIZE
+
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    def _run(self, canvases):
+        batch = np.stack(canvases).astype(np.float32) / 255.0
+        batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+        return self.session.run(None, {self.input_name: batch})[0]
+
+    def detect(self, page_images):
+        """Return, for each page, a list of (x1, y1, x2, y2) pixel boxes."""
+        prepared = [letterbox(img, self.input_size) for img in page_images]
+        step = self.max_batch or len(prepared) or 1
+
+        outputs = []
+        for start in range(0, len(prepared), step):
+            chunk = [canvas for canvas, _, _, _ in prepared[start:start + step]]
+            outputs.extend(self._run(chunk))
+
+        detections = []
+        for pred, (_, ratio, pad_x, pad_y), img in zip(outputs, prepared, page_images):
+            boxes, scores = decode_predictions(pred, self.conf_threshold)
+            keep = nms(boxes, scores, self.iou_threshold)
+            boxes = boxes[keep]
+
+            # Undo letterbox and clamp to the page
+            boxes[:, [0, 2]] = np.clip((boxes[:, [0, 2]] - pad_x) / ratio, 0, img.size[0])
+            boxes[:, [1, 3]] = np.clip((boxes[:, [1, 3]] - pad_y) / ratio, 0, img.size[1])
+            detections.append([tuple(float(v) for v in box) for box in boxes])
+
+        return detections
+
+
+def export_onnx(pt_path, onnx_path=None, int8=False, imgsz=INPUT_SIZE):
+    """Export best.pt to ONNX (dynamic batch), optionally INT8-quantized.
+
+    Needs ultralytics (and onnxruntime for quantization) on the build machine
+    only; the exported file is what ships with the sidecar.
+    """
+    from ultralytics import YOLO
+
+    exported = YOLO(pt_path).export(
+        format="onnx", imgsz=imgsz, dynamic=True, simplify=True, nms=False)
+    if onnx_path and os.path.abspath(exported) != os.path.abspath(onnx_path):
+        os.replace(exported, onnx_path)
+        exported = onnx_path
+
+    if not int8:
+        return exported
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    root, ext = os.path.splitext(exported)
+    quantized = f"{root}.int8{ext}"
+    quantize_dynamic(exported, quantized, weight_type=QuantType.QUInt8)
+    return quantized
@@ -0,0 +1,117 @@
+"""Pick the storage format of a question crop from what is on it.
+
+Most crops are black text on white paper. Stored as full-color JPEGs they
+carry three channels of ringing noise around every glyph; as 1-bit PNGs
+they are several times smaller and pixel-sharp. classify_crop() sorts a
+crop into bilevel, grayscale or color and encode_crop() writes it in the
+cheapest format that keeps it legible:
+
+    bilevel   -> 1-bit PNG (lossless, quality does not apply)
+    grayscale -> grayscale JPEG
+    color     -> WebP (JPEG when Pillow has no WebP support)
+
+Test_Olusturucu/src/core/storage_encoder.py repeats this for the desktop
+app (extensions with a dot, plus save_crop); its test_engine_parity.py
+keeps the encodings identical.
+"""
+from io import BytesIO
+
+BILEVEL = "bilevel"
+GRAYSCALE = "gray"
+COLOR = "color"
+
+# Default target quality (1-100) for the lossy formats
+STORAGE_QUALITY = 80
+
+# A pixel is colored when its channels differ by more than this...
+CHROMA_LEVEL = 32
+# ...and the crop is color when more than this fraction of pixels are
+COLOR_FRACTION = 0.005
+# Gray levels strictly between these are midtones: anti-aliasing, shading
+# and light fills up to just below paper white. Light tints count too; a
+# pale "shaded area" binarized to white would drop part of the question
+MIDTONE_RANGE = (64, 236)
+# A crop with fewer midtone pixels than this fraction is bilevel; sharp
+# print stays well under it, shaded figures and photos go far over
+MIDTONE_FRACTION = 0.06
+# Binarization threshold for bilevel crops
+BILEVEL_THRESHOLD = 160
+
+# Crops are classified on every n-th pixel so that no side exceeds this;
+# plain subsampling, since resampling would blur text into midtones
+CLASSIFY_MAX_SIDE = 512
+
+
+def _has_webp():
+    from PIL import features
+
+    return features.check("webp")
+
+
+def classify_crop(image):
+    """Return BILEVEL, GRAYSCALE or COLOR for a PIL image."""
+    # Imported here: `export` only needs pdf_image()
+    import numpy as np
+
+    if image.mode == "1":
+        return BILEVEL
+    step = -(-max(image.size) // CLASSIFY_MAX_SIDE)
+
+    if image.mode not in ("L", "LA", "I", "I;16"):
+        rgb = np.asarray(image.convert("RGB"))[::step, ::step].astype(np.int16)
+        chroma = rgb.max(axis=2) - rgb.min(axis=2)
+        if np.mean(chroma > CHROMA_LEVEL) > COLOR_FRACTION:
+            return COLOR
+
+    gray = np.asarray(image.convert("L"))[::step, ::step]
+    low, high = MIDTONE_RANGE
+    midtones = (gray > low) & (gray < high)
+    if np.mean(midtones) < MIDTONE_FRACTION:
+        return BILEVEL
+    return GRAYSCALE
+
+
+def encode_crop(image, quality=STORAGE_QUALITY):
+    """Encode a crop for storage; return (bytes, extension, kind)."""
+    kind = classify_crop(image)
+    buffered = BytesIO()
+
+    if kind == BILEVEL:
+        bits = image.convert("L").point(
+            lambda v: 255 if v >= BILEVEL_THRESHOLD else 0, mode="1")
+        bits.save(buffered, format="PNG", optimize=True)
+        ext = "png"
+    elif kind == GRAYSCALE:
+        image.convert("L").save(buffered, format="JPEG", quality=quality,
+                                optimize=True)
+        ext = "jpg"
+    elif _has_webp():
+        image.convert("RGB").save(buffered, format="WEBP", quality=quality,
+                                  method=4)
+        ext = "webp"
+    else:
+        image.convert("RGB").save(buffered, format="JPEG", quality=quality,
+                                  optimize=True)
+        ext = "jpg"
+    return buffered.getvalue(), ext, kind
+
+
+def pdf_image(path, quality=STORAGE_QUALITY):
+    """Return what reportlab should draw for a stored crop.
+
+    reportlab embeds JPEG files as-is but inflates everything else to 8-bit
+    RGB Flate data, which would undo the savings above in every exported
+    test. JPEGs are passed through by path, 1-bit and gray crops are drawn
+    as a single gray channel, and WebP crops are re-encoded to JPEG.
+    """
+    from PIL import Image as PILImage
+
+    with PILImage.open(path) as img:
+        if img.format == "JPEG":
+            return path
+        if img.mode in ("1", "L", "LA"):
+            return img.convert("L")
+        buffered = BytesIO()
+        img.convert("RGB").save(buffered, format="JPEG", quality=quality)
+    buffered.seek(0)
+    return buffered
@@ -0,0 +1,25 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """The engine module, storing everything under tmp_path."""
+    monkeypatch.syspath_prepend(ENGINE_DIR)
+    module = importlib.import_module("engine")
+    monkeypatch.setattr(module, "APP_DATA_DIR", str(tmp_path))
+    return module
+
+
+@pytest.fixture
+def events(engine):
+    """Events emitted by the engine in this test, in order."""
+    emitted = []
+    token = engine._event_sink.set(emitted.append)
+    yield emitted
+    engine._event_sink.reset(token)
@@ -0,0 +1,121 @@
+"""ONNX detector pre/post-processing on synthetic YOLO outputs."""
+import importlib
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def onnx_detector(engine):
+    """The onnx_detector module, imported next to the engine."""
+    return importlib.import_module("onnx_detector")
+
+
+def head_output(*detections, num_classes=2, anchors=16):
+    """(4 + num_classes, anchors) prediction from (cx, cy, w, h, score) rows.
+
+    Unused anchors score 0; real heads have far more anchors than channels,
+    which is how decode_predictions tells the layouts apart.
+    """
+    pred = np.zeros((4 + num_classes, anchors), dtype=np.float32)
+    for j, (cx, cy, w, h, score) in enumerate(detections):
+        pred[:4, j] = cx, cy, w, h
+        pred[4 + j % num_classes, j] = score
+    return pred
+
+
+def fake_detector(module, outputs, max_batch=None):
+    """OnnxQuestionDetector whose session replays `outputs`, one per image."""
+    batches = []
+
+    def run(_names, feeds):
+        batch = feeds["images"]
+        batches.append(batch.shape)
+        return [np.stack([outputs.pop(0) for _ in range(len(batch))])]
+
+    detector = object.__new__(module.OnnxQuestionDetector)
+    detector.session = SimpleNamespace(run=run)
+    detector.input_name = "images"
+    detector.max_batch = max_batch
+    detector.input_size = 640
+    detector.conf_threshold = module.CONF_THRESHOLD
+    detector.iou_threshold = module.IOU_THRESHOLD
+    return detector, batches
+
+
+def test_letterbox_centers_and_pads(onnx_detector):
+    canvas, ratio, pad_x, pad_y = onnx_detector.letterbox(Image.new("L", (1280, 640), 0))
+
+    assert canvas.shape == (640, 640, 3) and canvas.dtype == np.uint8
+    assert (ratio, pad_x, pad_y) == (0.5, 0, 160)
+    assert (canvas[:160] == onnx_detector.PAD_VALUE).all()
+    assert (canvas[480:] == onnx_detector.PAD_VALUE).all()
+    assert (canvas[160:480] == 0).all()
+
+    _, ratio, pad_x, pad_y = onnx_detector.letterbox(Image.new("RGB", (300, 600)))
+    assert (ratio, pad_x, pad_y) == (640 / 600, 160, 0)
+
+
+def test_decode_predictions_filters_and_converts(onnx_detector):
+    pred = head_output((100, 200, 40, 20, 0.9), (300, 300, 10, 10, 0.1),
+                       (50, 60, 20, 40, 0.5))
+
+    boxes, scores = onnx_detector.decode_predictions(pred)
+
+    np.testing.assert_allclose(boxes, [[80, 190, 120, 210], [40, 40, 60, 80]])
+    np.testing.assert_allclose(scores, [0.9, 0.5])
+
+
+def test_decode_predictions_accepts_transposed_layout(onnx_detector):
+    pred = head_output((100, 200, 40, 20, 0.9), (300, 300, 10, 10, 0.1),
+                       (50, 60, 20, 40, 0.5))
+
+    boxes, scores = onnx_detector.decode_predictions(pred)
+    boxes_t, scores_t = onnx_detector.decode_predictions(np.ascontiguousarray(pred.T))
+
+    np.testing.assert_array_equal(boxes, boxes_t)
+    np.testing.assert_array_equal(scores, scores_t)
+    assert len(scores) == 2
+
+
+def test_nms_keeps_best_of_overlapping_boxes(onnx_detector):
+    boxes = np.array([[0, 0, 100, 100], [5, 5, 105, 105], [200, 200, 300, 300],
+                      [0, 0, 100, 40]], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.5, 0.8], dtype=np.float32)
+
+    keep = onnx_detector.nms(boxes, scores)
+
+    assert keep.tolist() == [1, 3, 2]
+    assert onnx_detector.nms(np.empty((0, 4)), np.empty(0)).tolist() == []
+
+
+def test_detect_maps_boxes_back_to_the_page(onnx_detector):
+    # 1280x640 page: ratio 0.5, 160 px of padding above and below
+    page = Image.new("RGB", (1280, 640), "white")
+    pred = head_output((320, 320, 200, 100, 0.9),   # inside the page
+                       (630, 170, 40, 40, 0.8))     # crosses the right and top edges
+    detector, _ = fake_detector(onnx_detector, [pred])
+
+    (boxes,) = detector.detect([page])
+
+    assert boxes[0] == (440.0, 220.0, 840.0, 420.0)
+    assert boxes[1] == (1220.0, 0.0, 1280.0, 60.0)
+
+
+def test_detect_runs_static_exports_one_image_at_a_time(onnx_detector):
+    pages = [Image.new("RGB", (640, 640), "white") for _ in range(3)]
+    outputs = [head_output((100 + 100 * n, 100, 50, 50, 0.9)) for n in range(3)]
+
+    detector, batches = fake_detector(onnx_detector, list(outputs), max_batch=1)
+    static = detector.detect(pages)
+    assert batches == [(1, 3, 640, 640)] * 3
+
+    detector, batches = fake_detector(onnx_detector, list(outputs))
+    dynamic = detector.detect(pages)
+    assert batches == [(3, 3, 640, 640)]
+
+    assert static == dynamic
+    assert [boxes[0][0] for boxes in static] == [75.0, 175.0, 275.0]
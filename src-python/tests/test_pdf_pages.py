@@ -0,0 +1,51 @@
+"""iter_pdf_pages: windowed rendering in contiguous pdftoppm runs."""
+from types import SimpleNamespace
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def renders(engine, monkeypatch):
+    """convert_from_path replaced by a recorder; pages are 1-pixel images."""
+    calls = []
+
+    def convert(pdf_path, dpi, first_page, last_page):
+        calls.append((first_page, last_page))
+        return [Image.new("L", (1, 1), n) for n in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(engine, "convert_from_path", convert)
+    return calls
+
+
+def page_numbers(pages):
+    return [(index, image.getpixel((0, 0))) for index, image in pages]
+
+
+def test_windows_skip_checkpointed_pages(engine, renders):
+    pages = engine.iter_pdf_pages("book.pdf", 7, window=3, skip={1})
+
+    assert page_numbers(pages) == [(0, 1), (2, 3), (3, 4), (4, 5), (5, 6), (6, 7)]
+    assert renders == [(1, 1), (3, 3), (4, 6), (7, 7)]
+
+
+def test_embedded_pages_split_runs(engine, renders, monkeypatch):
+    reader = SimpleNamespace(pages=list(range(6)))
+    monkeypatch.setattr(
+        engine, "extract_page_image",
+        lambda page: Image.new("L", (1, 1), 100 + page) if page in (2, 3) else None)
+
+    pages = engine.iter_pdf_pages("book.pdf", 6, window=6, reader=reader)
+
+    assert page_numbers(pages) == [(0, 1), (1, 2), (2, 102), (3, 103), (4, 5), (5, 6)]
+    assert renders == [(1, 2), (5, 6)]
+
+
+def test_renders_one_window_ahead_at_most(engine, renders):
+    pages = engine.iter_pdf_pages("book.pdf", 6, window=2)
+
+    assert next(pages)[0] == 0
+    assert renders == [(1, 2)]
+    assert [index for index, _ in pages] == [1, 2, 3, 4, 5]
+    assert renders == [(1, 2), (3, 4), (5, 6)]
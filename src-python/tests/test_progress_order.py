@@ -0,0 +1,41 @@
+"""Pages answered out of order are still reported in page order."""
+import threading
+import time
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("pypdf")
+pytest.importorskip("numpy")
+
+# Model latency per page: early pages are the slowest
+LATENCIES = [0.3, 0.05, 0.2, 0.0, 0.1, 0.0]
+
+
+def test_progress_follows_page_order(engine, events, monkeypatch, tmp_path):
+    answered = []
+    lock = threading.Lock()
+
+    def detect(model, page_num, page_image, cache=None, transport=None, page_stream=None):
+        time.sleep(LATENCIES[page_num])
+        with lock:
+            answered.append(page_num)
+        return [{"bbox": [100, 100, 400, 900], "text_snippet": f"p{page_num}"}]
+
+    monkeypatch.setattr(engine, "api_key", "test-key")
+    monkeypatch.setattr(engine, "get_gemini_model", lambda: object())
+    monkeypatch.setattr(engine, "_detect_page_gemini", detect)
+
+    pdf_path = tmp_path / "book.pdf"
+    pages = [Image.new("RGB", (620, 877), (255, 255, 255 - i)) for i in range(len(LATENCIES))]
+    pages[0].save(pdf_path, save_all=True, append_images=pages[1:], resolution=75)
+
+    engine.run_analysis(str(pdf_path), concurrency=4, use_cache=False)
+
+    # The stub really did answer out of order...
+    assert answered != sorted(answered)
+    # ...but progress is emitted strictly in page order, each page once
+    progress = [e for e in events if e["type"] == "progress"]
+    assert [e["current"] for e in progress] == list(range(1, len(LATENCIES) + 1))
+    assert [e["questions"][0]["text"] for e in progress] == [
+        f"p{n}..." for n in range(len(LATENCIES))]
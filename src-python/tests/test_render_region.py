@@ -0,0 +1,68 @@
+"""Two-resolution crops: model boxes become pdftoppm crop regions."""
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def pdftoppm(engine, monkeypatch):
+    """subprocess.run replaced by a fake pdftoppm; returns the recorded calls."""
+    calls = []
+
+    def run(cmd, capture_output, check):
+        args = dict(zip(cmd[1:-1:2], cmd[2:-1:2]))
+        calls.append(args)
+        region = Image.new("L", (int(args["-W"]), int(args["-H"])), 90)
+        buffered = BytesIO()
+        region.save(buffered, format="PPM")
+        return SimpleNamespace(stdout=buffered.getvalue())
+
+    monkeypatch.setattr(engine.subprocess, "run", run)
+    return calls
+
+
+def region(args):
+    return tuple(int(args[k]) for k in ("-x", "-y", "-W", "-H"))
+
+
+def test_region_options(engine, pdftoppm):
+    img = engine.render_pdf_region("book.pdf", 4, (120.4, 80.6, 620.5, 400.2), dpi=300)
+
+    assert img.size == (500, 319)
+    (args,) = pdftoppm
+    assert (args["-f"], args["-l"], args["-r"]) == ("4", "4", "300")
+    assert region(args) == (120, 81, 500, 319)
+
+
+def test_region_clamped_at_page_origin(engine, pdftoppm):
+    engine.render_pdf_region("book.pdf", 1, (-12, -3.6, 100, 50))
+
+    # The part outside the page is cut off, not shifted into the region
+    assert region(pdftoppm[0]) == (0, 0, 100, 50)
+
+
+def test_cleaned_boxes_map_to_print_resolution(engine, pdftoppm):
+    # An 8.5 x 11 in page detected at 100 dpi, cropped at PRINT_DPI
+    page = Image.new("RGB", (850, 1100), "white")
+    detected = [
+        {"bbox": [200, 100, 600, 500], "text_snippet": "1"},
+        {"bbox": [205, 100, 600, 500], "text_snippet": "1 again"},  # duplicate
+        {"bbox": [650, 1100, 900, 900], "text_snippet": "2"},       # inverted, off page
+        {"bbox": "n/a"},
+    ]
+
+    questions = engine._crop_gemini_questions(
+        page, 0, detected, pdf_path="book.pdf", detect_dpi=100)
+
+    scale = engine.PRINT_DPI / 100
+    assert [q["text"] for q in questions] == ["1...", "2..."]
+    assert questions[0]["bbox"] == pytest.approx(
+        [100 * 8.5 * scale / 10, 200 * 11 * scale / 10,
+         500 * 8.5 * scale / 10, 600 * 11 * scale / 10])
+    assert [region(args) for args in pdftoppm] == [
+        (255, 660, 1020, 1320), (2295, 2145, 255, 825)]
+    assert {args["-r"] for args in pdftoppm} == {str(engine.PRINT_DPI)}
@@ -0,0 +1,79 @@
+"""ResponseCache: key sensitivity, LRU eviction and `engine cache`."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+ENGINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "engine.py")
+
+
+def test_key_changes_with_image_prompt_and_model(engine):
+    page = Image.new("RGB", (64, 48), "white")
+    key = engine.ResponseCache.make_key(page, "prompt", "gemini-2.5-pro")
+    assert key == engine.ResponseCache.make_key(page.copy(), "prompt", "gemini-2.5-pro")
+
+    touched = page.copy()
+    touched.putpixel((10, 10), (0, 0, 0))
+    misses = [
+        engine.ResponseCache.make_key(touched, "prompt", "gemini-2.5-pro"),
+        engine.ResponseCache.make_key(page.convert("L"), "prompt", "gemini-2.5-pro"),
+        engine.ResponseCache.make_key(page, "prompt v2", "gemini-2.5-pro"),
+        engine.ResponseCache.make_key(page, "prompt", "gemini-1.5-pro"),
+    ]
+    assert key not in misses
+    assert len(set(misses)) == len(misses)
+
+    data = b"%PDF page bytes"
+    assert (engine.ResponseCache.make_key(data, "prompt", "m")
+            != engine.ResponseCache.make_key(data + b"!", "prompt", "m"))
+
+
+def test_round_trip_and_miss(engine, tmp_path):
+    cache = engine.ResponseCache(str(tmp_path / "responses"))
+    cache.put("ab" + "0" * 62, [{"bbox": [1, 2, 3, 4]}])
+
+    assert cache.get("ab" + "0" * 62) == [{"bbox": [1, 2, 3, 4]}]
+    assert cache.get("cd" + "0" * 62) is None
+
+
+def test_evicts_least_recently_used_at_size_cap(engine, tmp_path):
+    keys = [f"{i:02x}" + "0" * 62 for i in range(4)]
+    probe = engine.ResponseCache(str(tmp_path / "probe"))
+    probe.put(keys[0], [{"n": 0}])
+    entry_size = probe.stats()["bytes"]
+
+    # Room for three entries; the fourth evicts down to 90% of the cap
+    cache = engine.ResponseCache(str(tmp_path / "responses"), max_bytes=int(entry_size * 3.5))
+    for i, key in enumerate(keys[:3]):
+        cache.put(key, [{"n": i}])
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    assert cache.get(keys[0]) == [{"n": 0}]  # now the most recently used
+
+    cache.put(keys[3], [{"n": 3}])
+
+    assert cache.get(keys[1]) is None
+    assert [cache.get(k) for k in (keys[0], keys[2], keys[3])] == [
+        [{"n": 0}], [{"n": 2}], [{"n": 3}]]
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def run_engine(tmp_path, *args):
+    env = dict(os.environ, HOME=str(tmp_path), LOCALAPPDATA=str(tmp_path))
+    result = subprocess.run([sys.executable, ENGINE, *args], capture_output=True,
+                            text=True, env=env, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_cache_clear_command(engine, tmp_path):
+    cache = engine.ResponseCache(str(tmp_path / "DoclingStitch" / "cache" / "responses"))
+    for i in range(3):
+        cache.put(f"{i:02x}" + "0" * 62, [{"n": i}])
+
+    assert run_engine(tmp_path, "cache", "stats")["entries"] == 3
+    assert run_engine(tmp_path, "cache", "clear") == {"status": "success", "removed": 3}
+    assert run_engine(tmp_path, "cache", "stats")["entries"] == 0
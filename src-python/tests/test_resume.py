@@ -0,0 +1,55 @@
+"""Interrupted analyses resume from their checkpoints."""
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("pypdf")
+pytest.importorskip("numpy")
+
+PAGES = 5
+
+
+class Crash(BaseException):
+    """Stands in for the process dying mid-run."""
+
+
+@pytest.fixture
+def detector(engine, monkeypatch):
+    """Stubbed per-page model call recording the pages it was asked for."""
+    calls = []
+    crash_on = set()
+
+    def detect(model, page_num, page_image, cache=None, transport=None, page_stream=None):
+        calls.append(page_num)
+        if page_num in crash_on:
+            raise Crash()
+        return [{"bbox": [100, 100, 400, 900], "text_snippet": f"p{page_num}"}]
+
+    monkeypatch.setattr(engine, "api_key", "test-key")
+    monkeypatch.setattr(engine, "get_gemini_model", lambda: object())
+    monkeypatch.setattr(engine, "_detect_page_gemini", detect)
+    detect.calls, detect.crash_on = calls, crash_on
+    return detect
+
+
+def test_resume_skips_checkpointed_pages(engine, events, detector, tmp_path):
+    pdf_path = tmp_path / "book.pdf"
+    pages = [Image.new("RGB", (620, 877), (255, 255, 255 - i)) for i in range(PAGES)]
+    pages[0].save(pdf_path, save_all=True, append_images=pages[1:], resolution=75)
+
+    detector.crash_on.add(2)
+    with pytest.raises(Crash):
+        engine.run_analysis(str(pdf_path), concurrency=1, use_cache=False)
+    assert detector.calls == [0, 1, 2]
+    (start,) = [e for e in events if e["type"] == "start"]
+
+    detector.calls.clear()
+    detector.crash_on.clear()
+    events.clear()
+    engine.resume_analysis(start["job"])
+
+    assert detector.calls == [2, 3, 4]
+    progress = [e for e in events if e["type"] == "progress"]
+    assert [e["current"] for e in progress] == [1, 2, 3, 4, 5]
+    assert [e["questions"][0]["text"] for e in progress] == [
+        f"p{n}..." for n in range(PAGES)]
+    assert events[-1]["type"] == "finish"
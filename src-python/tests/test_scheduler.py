@@ -0,0 +1,101 @@
+"""RequestScheduler: rate limiting, retry backoff and server wait hints."""
+from types import SimpleNamespace
+
+import pytest
+
+
+class Busy(Exception):
+    code = 429
+
+    def __init__(self, message="busy", headers=None, details=None):
+        super().__init__(message)
+        self.response = SimpleNamespace(headers=headers) if headers else None
+        self.details = details
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def flaky(errors, result="ok"):
+    """A call failing with each of `errors` in turn, then returning result."""
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call
+
+
+@pytest.fixture
+def fake_time():
+    return FakeTime()
+
+
+def scheduler(engine, fake_time, **kwargs):
+    return engine.RequestScheduler(sleep=fake_time.sleep, clock=fake_time.clock, **kwargs)
+
+
+def test_token_bucket_spaces_calls_after_the_burst(engine, fake_time):
+    limiter = scheduler(engine, fake_time, rpm=60, burst=2)
+    for _ in range(4):
+        limiter.call(lambda: None)
+
+    assert fake_time.sleeps == pytest.approx([1.0, 1.0])
+
+
+def test_backoff_is_jittered_exponential_and_capped(engine, fake_time, monkeypatch):
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append((low, high))
+        return high / 2
+    monkeypatch.setattr(engine.random, "uniform", uniform)
+    limiter = scheduler(engine, fake_time, rpm=6000, max_retries=4,
+                        base_delay=1.0, max_delay=5.0)
+
+    assert limiter.call(flaky([Busy()] * 4)) == "ok"
+    assert bounds == [(0, 1.0), (0, 2.0), (0, 4.0), (0, 5.0)]
+    assert fake_time.sleeps == [0.5, 1.0, 2.0, 2.5]
+
+
+def test_gives_up_after_max_retries_and_on_other_errors(engine, fake_time):
+    limiter = scheduler(engine, fake_time, rpm=6000, max_retries=2)
+    with pytest.raises(Busy):
+        limiter.call(flaky([Busy()] * 3))
+    with pytest.raises(ValueError):
+        limiter.call(flaky([ValueError("bad request")]))
+    assert len(fake_time.sleeps) == 2
+
+
+@pytest.mark.parametrize("exc, expected", [
+    (Busy(headers={"Retry-After": "7"}), 7.0),
+    (Busy(details=[SimpleNamespace(retry_delay=SimpleNamespace(seconds=3, nanos=500000000))]), 3.5),
+    (Busy("Quota exceeded, please retry in 12.5s."), 12.5),
+    (Busy("retry_delay {\n  seconds: 9\n}"), 9.0),
+    (Busy(), None),
+    (Busy(headers={"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"}), None),
+    (Busy(headers={"Retry-After": "-3"}), None),
+    (Busy(headers={"Retry-After": "nan"}), None),
+    (Busy(headers={"Retry-After": "inf"}), None),
+])
+def test_retry_after_hint_parsing(engine, exc, expected):
+    assert engine._retry_after_seconds(exc) == expected
+
+
+def test_server_hint_is_clamped_to_max_delay(engine, fake_time):
+    limiter = scheduler(engine, fake_time, rpm=6000, max_delay=30.0)
+    hints = [Busy(headers={"Retry-After": "86400"}), Busy("retry in 2s")]
+
+    assert limiter.call(flaky(hints)) == "ok"
+    assert fake_time.sleeps == [30.0, 2.0]
@@ -0,0 +1,168 @@
+"""`engine serve` shutdown: SIGTERM lets running requests wind down.
+
+The server runs in a subprocess with the model replaced by one that never
+answers, so the analyze request is mid-call when the signal arrives.
+"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("pypdf")
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVE = """
+import sys, time
+sys.path.insert(0, {engine_dir!r})
+import engine
+
+class StuckModel:
+    model_name = "stuck"
+
+    def generate_content(self, *args, **kwargs):
+        engine.emit_event({{"type": "log", "message": "model called"}})
+        time.sleep(60)
+
+engine.get_gemini_model = lambda: StuckModel()
+engine.CANCEL_GRACE_SECONDS = 0.5
+engine.SERVE_STOP_SECONDS = 3.0
+sys.argv = ["engine", "serve"]
+engine.main()
+"""
+
+
+def read_message(proc, deadline):
+    line = proc.stdout.readline()
+    assert line, f"engine exited early: {proc.stderr.read()}"
+    assert time.monotonic() < deadline, "timed out waiting for the engine"
+    return json.loads(line)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX signals")
+def test_sigterm_cancels_running_analyze(tmp_path):
+    pdf_path = tmp_path / "scan.pdf"
+    Image.new("RGB", (620, 877), "white").save(pdf_path, resolution=75)
+
+    env = dict(os.environ, HOME=str(tmp_path), GEMINI_API_KEY="test-key")
+    proc = subprocess.Popen(
+        [sys.executable, "-c", SERVE.format(engine_dir=ENGINE_DIR)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, env=env)
+    deadline = time.monotonic() + 30
+    try:
+        proc.stdin.write(json.dumps({
+            "jsonrpc": "2.0", "id": 1, "method": "analyze",
+            "params": {"pdf_path": str(pdf_path), "use_cache": False}}) + "\n")
+        proc.stdin.flush()
+
+        # Wait until the page request is inside the (stuck) model call
+        while True:
+            message = read_message(proc, deadline)
+            event = message.get("params", {}).get("event", {})
+            if event.get("message") == "model called":
+                break
+
+        proc.send_signal(signal.SIGTERM)
+        signalled = time.monotonic()
+        messages = []
+        for line in proc.stdout:
+            messages.append(json.loads(line))
+        assert proc.wait(timeout=10) == 130
+        waited = time.monotonic() - signalled
+    finally:
+        proc.kill()
+        proc.wait()
+
+    events = [m["params"]["event"] for m in messages if m.get("method") == "event"
+              and m["params"]["id"] == 1]
+    replies = [m for m in messages if m.get("id") == 1]
+
+    assert any(e["type"] == "cancelled" and e["reason"] == "SIGTERM" for e in events)
+    assert len(replies) == 1
+    assert replies[0]["error"]["code"] == -32800
+    # The model call got its grace period, the process did not hang on it
+    assert 0.5 <= waited < 3.0
+
+
+@pytest.fixture
+def server(engine, monkeypatch):
+    """An in-process EngineServer whose `block` method runs until released."""
+    import threading
+
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(10)
+        return {"status": "ok"}
+
+    monkeypatch.setitem(engine.SERVE_METHODS, "block", block)
+    monkeypatch.setattr(engine, "_scheduler", None)
+    server = engine.EngineServer(max_workers=2)
+    server.started, server.release = started, release
+    yield server
+    release.set()
+    server.executor.shutdown(wait=True)
+
+
+def replies(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def request(server, req_id, method, **params):
+    message = {"jsonrpc": "2.0", "method": method, "params": params}
+    if req_id is not None:
+        message["id"] = req_id
+    server.handle_line(json.dumps(message))
+
+
+def test_bad_params_are_rejected_before_queueing(server, capsys):
+    request(server, 1, "export", output_path="out.pdf")
+    request(server, 2, "analyze", pdf_path="a.pdf", no_such_option=True)
+    request(server, 3, "cancel")
+    request(server, 4, "analyze", pdf_path="a.pdf", job="job-1")
+    request(server, 5, "analyze", pdf_path="a.pdf", engine_type="yolo")
+
+    assert [(r["id"], r["error"]["code"]) for r in replies(capsys)] == [
+        (1, -32602), (2, -32602), (3, -32602), (4, -32602), (5, -32602)]
+    assert server._cancel_tokens == {} and server._futures == {}
+
+
+def test_request_ids_must_be_present_and_unique(server, capsys):
+    request(server, None, "ping")
+    request(server, 1, "block")
+    assert server.started.wait(5)
+    request(server, 1, "ping")
+    server.release.set()
+    server.executor.shutdown(wait=True)
+
+    answers = replies(capsys)
+    assert answers[0] == {"jsonrpc": "2.0", "id": None, "error": {
+        "code": -32600, "message": "Invalid request: id required"}}
+    assert answers[1]["id"] == 1 and answers[1]["error"]["code"] == -32600
+    assert answers[2] == {"jsonrpc": "2.0", "id": 1, "result": {"status": "ok"}}
+
+
+def test_shared_settings_only_through_configure(engine, server, capsys):
+    request(server, 1, "analyze", pdf_path="a.pdf", rpm=5)
+    request(server, 2, "analyze", pdf_path="a.pdf", api_key="other-key")
+    request(server, 3, "configure", rpm=6)
+    rate = engine.get_scheduler()._rate
+
+    request(server, 4, "block")
+    assert server.started.wait(5)
+    request(server, 5, "configure", rpm=7)
+
+    answers = replies(capsys)
+    assert [a["error"]["code"] for a in answers[:2]] == [-32602, -32602]
+    assert answers[2]["result"] == {"status": "ok"}
+    assert rate == pytest.approx(6 / 60.0)
+    assert answers[3]["id"] == 5 and answers[3]["error"]["code"] == -32000
+    assert engine.get_scheduler()._rate == pytest.approx(6 / 60.0)
@@ -0,0 +1,103 @@
+"""Cold-start budget for the engine sidecar.
+
+`export` is a short command; it must not pay for the Gemini SDK, pdf2image
+or dotenv. The wall-clock budget can be relaxed on slow machines with
+ENGINE_EXPORT_BUDGET (seconds).
+
+Imports are checked in sys.modules of a fresh interpreter, so module-level
+imports of engine.py are covered too.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("reportlab")
+Image = pytest.importorskip("PIL.Image")
+
+ENGINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "engine.py")
+EXPORT_COLD_START_BUDGET = float(os.getenv("ENGINE_EXPORT_BUDGET", "1.0"))
+HEAVY_MODULES = ("google.generativeai", "pdf2image", "dotenv", "ultralytics",
+                 "torch", "onnxruntime", "numpy")
+
+# Runs engine.py as __main__ and reports every loaded module on stderr
+REPORT_MODULES = """
+import json, os, runpy, sys
+sys.argv = [{engine!r}] + {args!r}
+sys.path.insert(0, os.path.dirname({engine!r}))
+try:
+    runpy.run_path({engine!r}, run_name="__main__")
+except SystemExit:
+    pass
+finally:
+    print("modules: " + json.dumps(sorted(sys.modules)), file=sys.stderr)
+"""
+
+
+def engine_env(tmp_path):
+    return dict(os.environ, HOME=str(tmp_path), LOCALAPPDATA=str(tmp_path))
+
+
+def loaded_modules(tmp_path, *args):
+    """Modules in sys.modules after `engine.py <args>` (none: import only)."""
+    if args:
+        code = REPORT_MODULES.format(engine=ENGINE, args=list(args))
+    else:
+        code = ("import json, sys; sys.path.insert(0, %r); import engine; "
+                "print('modules: ' + json.dumps(sorted(sys.modules)), file=sys.stderr)"
+                % os.path.dirname(ENGINE))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                            text=True, env=engine_env(tmp_path), timeout=60)
+    assert result.returncode == 0, result.stderr
+    line = next(line for line in result.stderr.splitlines() if line.startswith("modules: "))
+    return set(json.loads(line[len("modules: "):]))
+
+
+def export_args(tmp_path):
+    image_path = tmp_path / "q_1.jpg"
+    Image.new("RGB", (400, 300), "white").save(image_path)
+    output_path = tmp_path / "out.pdf"
+    return ["export", str(output_path), "--images", str(image_path)], output_path
+
+
+def run_export(tmp_path):
+    args, output_path = export_args(tmp_path)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, ENGINE, *args],
+        capture_output=True, text=True, env=engine_env(tmp_path), timeout=60)
+    elapsed = time.perf_counter() - start
+
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == {
+        "status": "success", "path": str(output_path)}
+    return result, elapsed
+
+
+@pytest.mark.parametrize("args", [(), ("--help",)], ids=["import", "help"])
+def test_startup_skips_heavy_imports(tmp_path, args):
+    loaded = loaded_modules(tmp_path, *args)
+    for module in HEAVY_MODULES:
+        assert module not in loaded
+
+
+def test_export_skips_heavy_imports(tmp_path):
+    args, output_path = export_args(tmp_path)
+    loaded = loaded_modules(tmp_path, *args)
+
+    assert output_path.exists()
+    assert "reportlab.pdfgen" in loaded
+    for module in HEAVY_MODULES:
+        assert module not in loaded
+
+
+def test_export_cold_start_budget(tmp_path):
+    # Warm the OS file cache once so the measurement is about Python work
+    run_export(tmp_path)
+    _, elapsed = run_export(tmp_path)
+
+    assert elapsed < EXPORT_COLD_START_BUDGET, (
+        f"export cold start {elapsed:.2f}s > budget {EXPORT_COLD_START_BUDGET:.2f}s")
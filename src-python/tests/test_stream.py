@@ -0,0 +1,68 @@
+"""Streamed pages: provisional questions and the crops they leave behind."""
+from concurrent.futures import Future
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+pytest.importorskip("numpy")
+
+FIRST = {"bbox": [100, 100, 300, 900], "text_snippet": "1"}
+SECOND = {"bbox": [500, 100, 700, 900], "text_snippet": "2"}
+
+
+def page_image():
+    image = Image.new("RGB", (1000, 1000), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((150, 150, 400, 250), fill="black")
+    draw.ellipse((150, 550, 300, 650), fill="black")
+    return image
+
+
+def stored_crops(tmp_path):
+    root = tmp_path / "extracted_questions"
+    return sorted(p for p in root.rglob("*") if p.is_file()) if root.exists() else []
+
+
+def finished(result=None, error=None):
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+def test_streamed_crops_are_stored_only_when_they_survive(engine, events, tmp_path):
+    page = page_image()
+    stream = engine.PageStream(page, 0, 1)
+    stream.add(FIRST)
+    stream.add(SECOND)
+
+    provisional = [e["question"] for e in events if e["type"] == "question"]
+    assert len(provisional) == 2
+    assert all(q["image_path"] is None for q in provisional)
+    assert stored_crops(tmp_path) == []
+
+    # The final answer drops the second question
+    engine._finish_gemini_page((0, page, finished([FIRST]), stream), 1)
+
+    progress = [e for e in events if e["type"] == "progress"]
+    assert len(progress) == 1
+    (question,) = progress[0]["questions"]
+    assert question["id"] == provisional[0]["id"]
+    assert [str(p) for p in stored_crops(tmp_path)] == [question["image_path"]]
+
+
+def test_failed_streamed_page_emits_page_error(engine, events, tmp_path):
+    page = page_image()
+    stream = engine.PageStream(page, 0, 1)
+    stream.add(FIRST)
+
+    engine._finish_gemini_page(
+        (0, page, finished(error=RuntimeError("boom")), stream), 1)
+
+    page_errors = [e for e in events if e["type"] == "page_error"]
+    assert page_errors == [{"type": "page_error", "current": 1, "message": "boom"}]
+    assert not any(e["type"] == "progress" for e in events)
+    assert stored_crops(tmp_path) == []
@@ -0,0 +1,99 @@
+"""detect_questions_from_text on small born-digital PDFs."""
+import importlib
+import io
+
+import pytest
+
+pypdf = pytest.importorskip("pypdf")
+canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+
+WIDTH, HEIGHT = 595, 842
+
+
+@pytest.fixture
+def detect(engine):
+    """detect_questions_from_text, imported next to the engine."""
+    return importlib.import_module("text_layer").detect_questions_from_text
+
+
+def make_page(lines, draw=None):
+    """One-page PDF with (x, y, text) lines in 11 pt Helvetica; y from the top."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(WIDTH, HEIGHT))
+    pdf.setFont("Helvetica", 11)
+    for x, y, text in lines:
+        pdf.drawString(x, HEIGHT - y, text)
+    if draw:
+        draw(pdf)
+    pdf.showPage()
+    pdf.save()
+    return pypdf.PdfReader(io.BytesIO(buffer.getvalue())).pages[0]
+
+
+def question(number, x, y, body_lines=3):
+    """An anchor line followed by body_lines of question text, 16 pt apart."""
+    lines = [(x, y, f"{number}. Soru {number} metni burada baslar")]
+    lines += [(x, y + 16 * (i + 1), f"devam eden satir {i + 1}") for i in range(body_lines)]
+    return lines
+
+
+def test_single_column_questions_in_order(detect):
+    page = make_page(question(1, 60, 100) + question(2, 60, 300) + question(3, 60, 500))
+
+    questions = detect(page)
+
+    assert [q["number"] for q in questions] == [1, 2, 3]
+    tops = [q["bbox"][0] for q in questions]
+    assert tops == sorted(tops)
+    # Each box ends above the cap height of the next anchor line
+    for upper, next_anchor in zip(questions, (300, 500)):
+        assert upper["bbox"][2] < (next_anchor - 11) * 1000 / HEIGHT
+    assert questions[0]["text_snippet"].startswith("1. Soru 1")
+
+
+def test_two_column_layout(detect):
+    page = make_page(question(1, 50, 100) + question(2, 50, 400) +
+                     question(3, 320, 100) + question(4, 320, 400))
+
+    questions = detect(page)
+
+    assert [q["number"] for q in questions] == [1, 2, 3, 4]
+    left, right = questions[:2], questions[2:]
+    # The left column ends before the right one starts
+    assert all(q["bbox"][3] <= 320 * 1000 / WIDTH for q in left)
+    assert all(q["bbox"][1] >= 300 * 1000 / WIDTH for q in right)
+    assert questions[0]["bbox"][0] == pytest.approx(questions[2]["bbox"][0])
+
+
+def test_header_and_footer_are_ignored(detect):
+    header_footer = [(60, 30, "1. Deneme Sinavi - Matematik"), (60, 820, "2")]
+    page = make_page(header_footer + question(1, 60, 100) + question(2, 60, 300))
+
+    questions = detect(page)
+
+    assert [q["number"] for q in questions] == [1, 2]
+    assert "Deneme" not in questions[0]["text_snippet"]
+    assert questions[0]["bbox"][0] > 60 * 1000 / HEIGHT
+
+
+def test_out_of_sequence_numbers_return_none(detect):
+    page = make_page(question(1, 60, 100) + question(3, 60, 300) + question(4, 60, 500))
+
+    assert detect(page) is None
+
+
+def test_indented_numbered_lines_are_not_questions(detect):
+    items = [(90, 100 + 16 * 4, "1) birinci madde"), (90, 100 + 16 * 5, "2) ikinci madde")]
+    page = make_page(question(1, 60, 100) + items + question(2, 60, 300))
+
+    questions = detect(page)
+
+    assert [q["number"] for q in questions] == [1, 2]
+    assert "ikinci madde" in questions[0]["text_snippet"]
+
+
+def test_page_without_text_layer_returns_none(detect):
+    def scanned(pdf):
+        pdf.rect(50, 50, WIDTH - 100, HEIGHT - 100, fill=1)
+
+    assert detect(make_page([], draw=scanned)) is None
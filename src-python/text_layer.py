@@ -0,0 +1,165 @@
+"""Question boxes from the text layer of born-digital PDFs.
+
+Publisher PDFs usually carry real text, so question boundaries can be read
+off the page instead of asking a model: every question starts with a number
+anchor ("1.", "24)") at the left edge of a column, and runs down to the next
+anchor in the same column. The result uses the same shape as the Gemini
+page response (bbox = [ymin, xmin, ymax, xmax] normalized to 0-1000), so
+engine.py crops it like any other detection.
+
+Whenever the page does not look like a clean exam layout (no text, rotated
+page, numbers out of sequence, cramped boxes...) None is returned and
+the caller falls back to the AI engine.
+"""
+import math
+import re
+
+ANCHOR_RE = re.compile(r"^(\d{1,3})\s*[.)](?:\s|$)")
+
+# Fragments closer than this (in points) vertically share a line; a
+# horizontal gap wider than LINE_GAP font sizes starts a new line (column)
+LINE_TOLERANCE = 2.0
+LINE_GAP = 1.5
+# Rough glyph advance used to estimate where a fragment ends
+CHAR_WIDTH = 0.5
+# Anchors whose x differs by more than this fraction of the page width
+# belong to different columns
+COLUMN_GAP = 0.2
+MAX_COLUMNS = 3
+# Top/bottom page bands treated as running header/footer
+HEADER_BAND = 0.06
+# Padding around each question, in points
+PAD = 4.0
+MIN_QUESTION_HEIGHT = 18.0
+MIN_TEXT_LINES = 3
+SNIPPET_CHARS = 200
+
+
+def _collect_lines(page):
+    """Return text lines as dicts (x, y, size, text), y measured from the bottom."""
+    fragments = []
+
+    def visitor(text, cm, tm, font_dict, font_size):
+        if not text or not text.strip():
+            return
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        scale = math.hypot(tm[2], tm[3]) * math.hypot(cm[2], cm[3])
+        size = (font_size or 1.0) * (scale or 1.0)
+        for i, part in enumerate(text.split("\n")):
+            if part.strip():
+                fragments.append((x, y - i * size * 1.2, size, part.strip()))
+
+    page.extract_text(visitor_text=visitor)
+
+    lines = []
+    for x, y, size, text in sorted(fragments, key=lambda f: (-f[1], f[0])):
+        end = x + len(text) * size * CHAR_WIDTH
+        for line in lines:
+            if (abs(line["y"] - y) <= LINE_TOLERANCE and
+                    line["x"] - size <= x <= line["end"] + size * LINE_GAP):
+                line["parts"].append((x, text))
+                line["size"] = max(line["size"], size)
+                line["end"] = max(line["end"], end)
+                break
+        else:
+            lines.append({"x": x, "y": y, "size": size, "end": end,
+                          "parts": [(x, text)]})
+
+    for line in lines:
+        line["parts"].sort()
+        line["x"] = line["parts"][0][0]
+        line["text"] = " ".join(t for _, t in line["parts"])
+    return lines
+
+
+def _split_columns(anchors, page_width):
+    """Group anchors into columns by their x position, left to right."""
+    columns = []
+    for anchor in sorted(anchors, key=lambda a: a["x"]):
+        if columns and anchor["x"] - columns[-1][-1]["x"] <= page_width * COLUMN_GAP:
+            columns[-1].append(anchor)
+        else:
+            columns.append([anchor])
+    return columns
+
+
+def detect_questions_from_text(page):
+    """Return Gemini-style question dicts for a pypdf page, or None."""
+    if page.rotation % 360:
+        return None
+
+    box = page.mediabox
+    left, bottom = float(box.left), float(box.bottom)
+    width, height = float(box.width), float(box.height)
+    if width <= 0 or height <= 0:
+        return None
+
+    lines = _collect_lines(page)
+    if len(lines) < MIN_TEXT_LINES:
+        return None
+
+    content_top = bottom + height * (1 - HEADER_BAND)
+    content_bottom = bottom + height * HEADER_BAND
+    body = [ln for ln in lines if content_bottom <= ln["y"] <= content_top]
+
+    # A line is an anchor when it starts with "N." / "N)"
+    anchors = []
+    for line in body:
+        match = ANCHOR_RE.match(line["text"])
+        if match:
+            anchors.append(dict(line, number=int(match.group(1))))
+    if not anchors:
+        return None
+
+    columns = _split_columns(anchors, width)
+    if len(columns) > MAX_COLUMNS:
+        return None
+
+    column_lefts = [min(a["x"] for a in col) for col in columns]
+    # Assume symmetric page margins for the right edge of the last column
+    page_right = max(left + width - (column_lefts[0] - left), column_lefts[-1] + 1)
+
+    questions = []
+    for index, column in enumerate(columns):
+        col_left = column_lefts[index]
+        col_right = (column_lefts[index + 1] if index + 1 < len(columns)
+                     else page_right)
+        column_lines = [ln for ln in body if col_left - PAD <= ln["x"] < col_right - PAD]
+
+        # Numbered lines indented inside a question are list items, not anchors
+        column = sorted((a for a in column if a["x"] - col_left <= a["size"] * 2),
+                        key=lambda a: -a["y"])
+
+        for i, anchor in enumerate(column):
+            top = anchor["y"] + anchor["size"]
+            if i + 1 < len(column):
+                nxt = column[i + 1]
+                end = nxt["y"] + nxt["size"] + PAD / 2
+                inside = [ln for ln in column_lines if end < ln["y"] <= anchor["y"]]
+            else:
+                inside = [ln for ln in column_lines if ln["y"] <= anchor["y"]]
+                lowest = min(inside, key=lambda ln: ln["y"])
+                end = lowest["y"] - lowest["size"] * 0.3 - PAD
+
+            if top - end < MIN_QUESTION_HEIGHT:
+                return None
+
+            page_top = bottom + height
+            questions.append({
+                "number": anchor["number"],
+                "text_snippet": " ".join(ln["text"] for ln in inside)[:SNIPPET_CHARS],
+                "bbox": [
+                    max(0.0, (page_top - top - PAD) * 1000 / height),
+                    max(0.0, (col_left - PAD - left) * 1000 / width),
+                    min(1000.0, (page_top - end) * 1000 / height),
+                    min(1000.0, (col_right - PAD - left) * 1000 / width),
+                ],
+            })
+
+    # Reading order (column by column) must give consecutive numbers
+    numbers = [q["number"] for q in questions]
+    if any(b != a + 1 for a, b in zip(numbers, numbers[1:])):
+        return None
+
+    return questions
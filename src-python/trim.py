@@ -0,0 +1,62 @@
+"""Snap question crops to their ink.
+
+Detector boxes are padded generously so no option letter gets cut, which
+leaves wide white margins around every crop: bigger JPEGs, bigger base64
+payloads and taller rows in the exported test. ink_bounds() finds the
+printed area from the row and column ink projections of the crop in one
+NumPy pass; trim_to_ink() crops to it plus a margin.
+
+The desktop app has its own copy (Test_Olusturucu/src/core/trim.py, with
+a default margin); a parity test there compares the two.
+"""
+import numpy as np
+
+# Pixels at least this much darker than the paper count as ink, so pale
+# drawings and light shading stay inside the trim on any paper tone
+INK_CONTRAST = 16
+# Pixels whose RGB channels spread at least this far count as ink too
+# (pale colored figures and highlights that are barely darker than paper)
+MIN_CHROMA = 48
+# The paper tone is the gray level this fraction of the pixels reach
+PAPER_FRACTION = 0.9
+# A row/column holds ink when at least this fraction of it is dark; keeps
+# isolated specks and scanner noise from defeating the trim
+MIN_INK_FRACTION = 0.002
+
+
+def paper_level(gray):
+    """Gray level of the paper: brighter than PAPER_FRACTION of the pixels."""
+    counts = np.bincount(gray.ravel(), minlength=256)
+    return int(np.searchsorted(np.cumsum(counts), PAPER_FRACTION * gray.size))
+
+
+def ink_bounds(image, ink_contrast=INK_CONTRAST, min_chroma=MIN_CHROMA,
+               min_fraction=MIN_INK_FRACTION):
+    """(left, top, right, bottom) of the inked area, or None for a blank image."""
+    gray = np.asarray(image.convert("L"))
+    ink = gray < paper_level(gray) - ink_contrast
+    if image.mode not in ("1", "L", "LA"):
+        rgb = np.asarray(image.convert("RGB"))
+        ink |= rgb.max(axis=2) - rgb.min(axis=2) >= min_chroma
+
+    height, width = ink.shape
+    rows = np.flatnonzero(ink.sum(axis=1) >= max(1, width * min_fraction))
+    cols = np.flatnonzero(ink.sum(axis=0) >= max(1, height * min_fraction))
+    if not len(rows) or not len(cols):
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def trim_to_ink(image, margin):
+    """Crop `image` to its ink plus `margin` pixels; unchanged if blank."""
+    bounds = ink_bounds(image)
+    if bounds is None:
+        return image
+
+    left, top, right, bottom = bounds
+    width, height = image.size
+    box = (max(0, left - margin), max(0, top - margin),
+           min(width, right + margin), min(height, bottom + margin))
+    if box == (0, 0, width, height):
+        return image
+    return image.crop(box)
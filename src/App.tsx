@@ -236,8 +236,14 @@ function App() {
       try {
         const data = JSON.parse(event.payload);
 
+        // Provisional questions only live until their page's progress event
+        const dropProvisional = (page?: number) =>
+          setQuestions(prev => prev.filter(q =>
+            !(q.provisional && (page === undefined || q.page === page))));
+
         // Catch global errors from engine.py
         if (data.status === 'error' || data.type === 'error') {
+          dropProvisional();
           setError(data.message || data.error || "Beklenmeyen bir hata oluştu.");
           setLoading(false);
           return;
@@ -246,12 +252,21 @@ function App() {
         if (data.type === 'start') {
           setAnalysisProgress({ current: 0, total: data.total });
           setLoadingText("Analiz Başlıyor...");
+        } else if (data.type === 'question') {
+          setQuestions(prev => [...prev, { ...data.question, provisional: true }]);
         } else if (data.type === 'progress') {
           setAnalysisProgress(prev => ({ ...prev, current: data.current }));
-          if (data.questions && data.questions.length > 0) {
-            setQuestions(prev => [...prev, ...data.questions]);
-          }
+          setQuestions(prev => [
+            ...prev.filter(q => !(q.provisional && q.page === data.current)),
+            ...(data.questions || [])
+          ]);
+        } else if (data.type === 'page_error') {
+          dropProvisional(data.current);
+        } else if (data.type === 'cancelled') {
+          dropProvisional();
+          setLoading(false);
         } else if (data.type === 'finish') {
+          dropProvisional();
           setLoading(false);
           if (activeView !== 'analyze') setActiveView('analyze');
         } else if (data.type === 'error') {
@@ -69,7 +69,7 @@ export default function SettingsView() {
                         <label className="block text-sm font-medium text-slate-700 dark:text-slate-300 mb-3">
                             Varsayılan Motor
                         </label>
-                        <div className="grid grid-cols-1 md:grid-cols-2 gap-4 mb-6">
+                        <div className="grid grid-cols-1 md:grid-cols-3 gap-4 mb-6">
                             <button
                                 onClick={() => setAiEngine('gemini')}
                                 className={`p-4 rounded-xl border-2 text-left transition-all relative ${aiEngine === 'gemini'
@@ -93,6 +93,18 @@ export default function SettingsView() {
                                 <div className="text-xs text-slate-500">Sadece Görsel Kesme. Hızlı & Çevrimdışı.</div>
                                 {aiEngine === 'yolo' && <div className="absolute top-3 right-3 text-primary"><CheckCircle2 size={18} /></div>}
                             </button>
+
+                            <button
+                                onClick={() => setAiEngine('hybrid')}
+                                className={`p-4 rounded-xl border-2 text-left transition-all relative ${aiEngine === 'hybrid'
+                                    ? 'border-primary bg-primary/5 shadow-md'
+                                    : 'border-slate-200 dark:border-slate-700 hover:border-primary/50'
+                                    }`}
+                            >
+                                <div className="font-bold text-slate-800 dark:text-white mb-1">Hibrit (YOLO + Gemini)</div>
+                                <div className="text-xs text-slate-500">Yerel kesme, toplu konu/zorluk analizi. Az API çağrısı.</div>
+                                {aiEngine === 'hybrid' && <div className="absolute top-3 right-3 text-primary"><CheckCircle2 size={18} /></div>}
+                            </button>
                         </div>
 
                         <label className="block text-sm font-medium text-slate-700 dark:text-slate-300 mb-2">
@@ -22,7 +22,7 @@ export default function UploadView({
 
     if (loading) {
         return (
-            <motion.div key="loading" initial={{ opacity: 0 }} animate={{ opacity: 1 }} exit={{ opacity: 0 }} className="h-full flex flex-col items-center justify-center">
+            <motion.div key="loading" initial={{ opacity: 0 }} animate={{ opacity: 1 }} exit={{ opacity: 0 }} className={`h-full flex flex-col items-center ${!error && questions.length > 0 ? "pt-8" : "justify-center"}`}>
                 {error ? (
                     <div className="flex flex-col items-center max-w-md text-center p-8 bg-white dark:bg-slate-900 rounded-3xl border border-slate-200 dark:border-slate-800 shadow-xl">
                         <div className="w-16 h-16 bg-red-100 text-red-600 rounded-full flex items-center justify-center mb-4">
@@ -52,6 +52,8 @@ export default function UploadView({
                                 </div>
                                 <p className="text-center text-slate-500 text-sm mt-4 font-medium animate-pulse">Sorular Ayrıştırılıyor...</p>
                             </div>
+                        ) : questions.length > 0 ? (
+                            <Loader2 className="animate-spin text-primary" size={32} />
                         ) : (
                             <>
                                 <Loader2 className="animate-spin text-primary mb-4" size={48} />
@@ -59,6 +61,18 @@ export default function UploadView({
                                 <p className="text-slate-400 text-sm mt-2">Bu işlem belgenin büyüklüğüne göre vakit alabilir.</p>
                             </>
                         )}
+
+                        {/* Streamed questions show up as their pages finish; provisional ones are dimmed until confirmed */}
+                        {questions.length > 0 && (
+                            <div className="w-full max-w-2xl flex-1 min-h-0 overflow-y-auto mt-8 pr-2 space-y-4">
+                                <h3 className="font-bold text-lg">Tespit Edilen Sorular ({questions.length})</h3>
+                                {questions.map((q, i) => (
+                                    <div key={i} className={q.provisional ? "opacity-60" : undefined}>
+                                        <QuestionCard question={q} mode="analyze" />
+                                    </div>
+                                ))}
+                            </div>
+                        )}
                     </>
                 )}
             </motion.div>
@@ -9,6 +9,8 @@ export interface Question {
     created_at?: string;
     difficulty?: number;
     topic?: string;
+    // Streamed before its page finished; replaced by the page's final list
+    provisional?: boolean;
 }
 
 export interface Template {